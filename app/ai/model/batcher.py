@@ -0,0 +1,142 @@
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+from dotenv import load_dotenv
+
+from app.ai.model.onnx_backend import select_clip_text_encoder, select_gemma_text_encoder
+from app.services import metrics, profiler
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+EMBED_BATCHING = os.getenv("EMBED_BATCHING", "1") == "1"
+EMBED_BATCH_MAX_SIZE = int(os.getenv("EMBED_BATCH_MAX_SIZE", 16))
+EMBED_BATCH_MAX_WAIT_MS = float(os.getenv("EMBED_BATCH_MAX_WAIT_MS", 5))
+
+_STOP = object()
+
+
+class EmbeddingBatcher:
+    """
+    Micro-batching queue in front of a batched encode function.
+    Concurrent callers of `encode` are gathered for up to `max_wait_ms` or
+    `max_batch_size` items, encoded in one forward pass, and each caller
+    gets back its own row.
+    """
+
+    def __init__(self, name, encode_fn, max_batch_size=EMBED_BATCH_MAX_SIZE,
+                 max_wait_ms=EMBED_BATCH_MAX_WAIT_MS, enabled=EMBED_BATCHING):
+        self.name = name
+        self.encode_fn = encode_fn
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max_wait_ms / 1000.0
+        self.enabled = enabled and self.max_batch_size > 1
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def _ensure_started(self):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(
+                        target=self._run, name=f"batcher-{self.name}", daemon=True
+                    )
+                    self._thread.start()
+
+    def encode(self, text: str) -> np.ndarray:
+        """Blocking: return the embedding of one text."""
+        if not self.enabled:
+            with metrics.timer(f"embed.{self.name}.forward"):
+                return self.encode_fn([text])[0]
+        self._ensure_started()
+        future = Future()
+        start = time.perf_counter()
+        self._queue.put((text, future))
+        vector = future.result()
+        # The forward pass ran on the batcher thread; attribute it to this request
+        metrics.record_stage(f"embed.{self.name}.forward", future.encode_seconds)
+        metrics.record_stage(f"embed.{self.name}.queue", time.perf_counter() - start - future.encode_seconds)
+        return vector
+
+    def _collect(self):
+        """Block for the first item, then gather more until the batch is full or the wait expires."""
+        first = self._queue.get()
+        if first is _STOP:
+            return None
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is _STOP:
+                # Put it back so the loop exits after this batch
+                self._queue.put(_STOP)
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            if batch is None:
+                return
+            texts = [text for text, _ in batch]
+            start = time.perf_counter()
+            try:
+                with profiler.shared_work():
+                    vectors = self.encode_fn(texts)
+            except Exception as e:
+                logger.exception(f"Batched encode failed in {self.name}: {e}")
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            elapsed = time.perf_counter() - start
+            metrics.observe("embed_batch_size", len(batch), metrics.COUNT_BUCKETS, batcher=self.name)
+            for (_, future), vector in zip(batch, vectors):
+                future.encode_seconds = elapsed
+                future.set_result(vector)
+
+    def close(self):
+        if self._thread is not None:
+            self._queue.put(_STOP)
+            self._thread.join(timeout=5)
+            self._thread = None
+
+
+_clip_text_batcher = None
+_gemma_text_batcher = None
+
+
+def get_clip_text_batcher() -> EmbeddingBatcher:
+    global _clip_text_batcher
+    if _clip_text_batcher is None:
+        _clip_text_batcher = EmbeddingBatcher("clip-text", select_clip_text_encoder())
+    return _clip_text_batcher
+
+
+def get_gemma_text_batcher() -> EmbeddingBatcher:
+    global _gemma_text_batcher
+    if _gemma_text_batcher is None:
+        _gemma_text_batcher = EmbeddingBatcher("gemma-text", select_gemma_text_encoder())
+    return _gemma_text_batcher
+
+
+def close_batchers():
+    global _clip_text_batcher, _gemma_text_batcher
+    for batcher in (_clip_text_batcher, _gemma_text_batcher):
+        if batcher is not None:
+            batcher.close()
+    _clip_text_batcher = None
+    _gemma_text_batcher = None
@@ -1,9 +1,12 @@
 import torch
+import numpy as np
 from transformers import CLIPProcessor, CLIPModel
 from PIL import Image
 from dotenv import load_dotenv
 import os
 
+from app.services import metrics
+
 load_dotenv()
 
 CLIP_MODEL_ID = "openai/clip-vit-base-patch32"
@@ -17,9 +20,10 @@ def get_clip_model_cached(model_id: str = CLIP_MODEL_ID):
     global _clip_model_cache, _clip_processor_cache
     if _clip_model_cache is None:
         print("🔹 Loading CLIP model from cache...")
-        _clip_model_cache = CLIPModel.from_pretrained(model_id, cache_dir=CACHE_DIR).to(device)
-        _clip_processor_cache = CLIPProcessor.from_pretrained(model_id, cache_dir=CACHE_DIR)
-        _clip_model_cache.eval()
+        with metrics.timer("model.load.clip"):
+            _clip_model_cache = CLIPModel.from_pretrained(model_id, cache_dir=CACHE_DIR).to(device)
+            _clip_processor_cache = CLIPProcessor.from_pretrained(model_id, cache_dir=CACHE_DIR)
+            _clip_model_cache.eval()
     return _clip_processor_cache, _clip_model_cache
 
 def embed_clip(input_data, mode="image", model_tuple=None):
@@ -49,3 +53,40 @@ def embed_clip(input_data, mode="image", model_tuple=None):
         raise ValueError("mode must be 'image' or 'text'")
 
     return embeds.cpu().numpy()
+
+def embed_clip_texts(texts, model_tuple=None) -> np.ndarray:
+    """
+    Encode a batch of texts with CLIP in one padded forward pass.
+    Returns L2-normalized embeddings of shape (len(texts), dim).
+    """
+    if model_tuple is None:
+        processor, model = get_clip_model_cached()
+    else:
+        processor, model = model_tuple
+
+    with metrics.timer("clip.tokenize"):
+        inputs = processor(text=list(texts), return_tensors="pt", padding=True, truncation=True).to(device)
+    with metrics.timer("clip.text_tower"), torch.no_grad():
+        embeds = model.get_text_features(**inputs)
+
+    vectors = embeds.cpu().numpy()
+    return vectors / np.linalg.norm(vectors, axis=-1, keepdims=True)
+
+def embed_clip_pixels(pixel_values, model_tuple=None) -> np.ndarray:
+    """
+    Encode preprocessed images (see image_preprocess.preprocess_clip_image) with
+    the CLIP image tower. Returns L2-normalized embeddings of shape (n, dim).
+    """
+    if model_tuple is None:
+        _, model = get_clip_model_cached()
+    else:
+        _, model = model_tuple
+
+    pixels = torch.from_numpy(np.asarray(pixel_values, dtype=np.float32))
+    if pixels.ndim == 3:
+        pixels = pixels.unsqueeze(0)
+    with metrics.timer("clip.image_tower"), torch.no_grad():
+        embeds = model.get_image_features(pixel_values=pixels.to(device))
+
+    vectors = embeds.cpu().numpy()
+    return vectors / np.linalg.norm(vectors, axis=-1, keepdims=True)
@@ -0,0 +1,180 @@
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import Callable, Optional
+
+import numpy as np
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+EMBED_CACHE_MAX_BYTES = int(os.getenv("EMBED_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+EMBED_CACHE_DIR = os.getenv("EMBED_CACHE_DIR", "")  # empty -> in-memory tier only
+# Disk tier cap; the oldest-written rows are dropped past it (~3 KB per 768-d vector)
+EMBED_CACHE_DISK_MAX_ROWS = int(os.getenv("EMBED_CACHE_DISK_MAX_ROWS", 200_000))
+# Disk writes are buffered and written in one transaction (and the tier pruned) once per
+# this many puts, and on close; no write transaction stays open between puts
+EMBED_CACHE_DISK_COMMIT_EVERY = int(os.getenv("EMBED_CACHE_DISK_COMMIT_EVERY", 64))
+
+
+def normalize_query(text: str) -> str:
+    """Normalize a query so near-identical inputs share one cache entry."""
+    text = unicodedata.normalize("NFC", text or "")
+    return " ".join(text.split())
+
+
+class EmbeddingCache:
+    """
+    Two-tier cache of query embeddings keyed by (model id, normalized text).
+    - memory: LRU bounded by total vector bytes
+    - disk (optional): SQLite key-value file of float32 blobs, survives restarts;
+      capped at disk_max_rows (oldest written evicted first), writes committed in
+      batches of commit_every (a crash loses at most that many cached vectors);
+      forked workers share the file, so no write lock is held between batches
+    The model id is part of the key, so changing a model id never returns stale vectors.
+    """
+
+    def __init__(self, max_bytes: int = EMBED_CACHE_MAX_BYTES, cache_dir: str = EMBED_CACHE_DIR,
+                 disk_max_rows: int = EMBED_CACHE_DISK_MAX_ROWS,
+                 commit_every: int = EMBED_CACHE_DISK_COMMIT_EVERY):
+        self.max_bytes = max_bytes
+        self.disk_max_rows = max(1, disk_max_rows)
+        self.commit_every = max(1, commit_every)
+        self._pending = {}   # key -> float32 bytes not yet written to disk
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._db = None
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+            path = os.path.join(cache_dir, "embeddings.sqlite")
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL)"
+            )
+            self._db.commit()
+            logger.info(f"Embedding cache disk tier at {path}")
+
+    @staticmethod
+    def make_key(model_id: str, text: str) -> str:
+        raw = f"{model_id}\x00{normalize_query(text)}".encode("utf-8")
+        return hashlib.sha1(raw).hexdigest()
+
+    def _remember(self, key: str, vector: np.ndarray):
+        """Insert into the memory tier and evict least recently used entries. Caller holds the lock."""
+        if key in self._entries:
+            self._entries.move_to_end(key)
+            return
+        self._entries[key] = vector
+        self._bytes += vector.nbytes
+        while self._bytes > self.max_bytes and self._entries:
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= evicted.nbytes
+
+    def get(self, model_id: str, text: str) -> Optional[np.ndarray]:
+        key = self.make_key(model_id, text)
+        with self._lock:
+            vector = self._entries.get(key)
+            if vector is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return vector
+            if self._db is not None:
+                blob = self._pending.get(key)
+                row = (blob,) if blob is not None else self._db.execute(
+                    "SELECT vector FROM embeddings WHERE key=?", (key,)
+                ).fetchone()
+                if row is not None:
+                    vector = np.frombuffer(row[0], dtype=np.float32)
+                    self._remember(key, vector)
+                    self.hits += 1
+                    self.disk_hits += 1
+                    return vector
+            self.misses += 1
+            return None
+
+    def put(self, model_id: str, text: str, vector) -> np.ndarray:
+        key = self.make_key(model_id, text)
+        vector = np.ascontiguousarray(vector, dtype=np.float32).reshape(-1)
+        vector.setflags(write=False)  # shared between callers
+        with self._lock:
+            self._remember(key, vector)
+            if self._db is not None:
+                self._pending[key] = vector.tobytes()
+                if len(self._pending) >= self.commit_every:
+                    self._flush()
+        return vector
+
+    def _flush(self):
+        """Write buffered vectors and drop rows past disk_max_rows in one transaction. Caller holds the lock."""
+        if not self._pending:
+            return
+        try:
+            with self._db:
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)",
+                    list(self._pending.items()),
+                )
+                # rowids only grow (no AUTOINCREMENT, the max row is never evicted),
+                # so everything below the last disk_max_rows rowids is the oldest written
+                self._db.execute(
+                    "DELETE FROM embeddings WHERE rowid <= (SELECT MAX(rowid) FROM embeddings) - ?",
+                    (self.disk_max_rows,),
+                )
+        except sqlite3.Error as e:
+            logger.warning(f"Embedding cache disk write failed, dropped {len(self._pending)} vectors: {e}")
+        self._pending.clear()
+
+    def get_or_compute(self, model_id: str, text: str, compute_fn: Callable[[], np.ndarray]) -> np.ndarray:
+        vector = self.get(model_id, text)
+        if vector is None:
+            vector = self.put(model_id, text, compute_fn())
+        return vector
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "persistent": self._db is not None,
+                "disk_max_rows": self.disk_max_rows,
+            }
+
+    def close(self):
+        if self._db is not None:
+            with self._lock:
+                self._flush()
+                self._db.close()
+                self._db = None
+
+
+_embedding_cache = None
+
+
+def get_embedding_cache() -> EmbeddingCache:
+    global _embedding_cache
+    if _embedding_cache is None:
+        _embedding_cache = EmbeddingCache()
+    return _embedding_cache
+
+
+def close_embedding_cache():
+    global _embedding_cache
+    if _embedding_cache is not None:
+        _embedding_cache.close()
+        _embedding_cache = None
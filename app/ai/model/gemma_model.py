@@ -1,7 +1,11 @@
 import torch
+import numpy as np
 from transformers import AutoTokenizer, AutoModel
 import os
 import dotenv
+
+from app.services import metrics
+
 dotenv.load_dotenv()
 
 GEMMA_MODEL_NAME = "google/embeddinggemma-300m"
@@ -16,9 +20,10 @@ def get_gemma_model_cached(model_name: str = GEMMA_MODEL_NAME):
     global _gemma_model_cache, _gemma_tokenizer_cache
     if _gemma_model_cache is None:
         print("🔹 Loading Gemma embedding model from cache...")
-        _gemma_tokenizer_cache = AutoTokenizer.from_pretrained(model_name, token=HF_TOKEN,  cache_dir=CACHE_DIR)
-        _gemma_model_cache = AutoModel.from_pretrained(model_name,  token=HF_TOKEN, cache_dir=CACHE_DIR, low_cpu_mem_usage=True).to(device)
-        _gemma_model_cache.eval()
+        with metrics.timer("model.load.gemma"):
+            _gemma_tokenizer_cache = AutoTokenizer.from_pretrained(model_name, token=HF_TOKEN,  cache_dir=CACHE_DIR)
+            _gemma_model_cache = AutoModel.from_pretrained(model_name,  token=HF_TOKEN, cache_dir=CACHE_DIR, low_cpu_mem_usage=True).to(device)
+            _gemma_model_cache.eval()
     return _gemma_tokenizer_cache, _gemma_model_cache
 
 def embed_gemma(text: str, model_tuple=None):
@@ -36,6 +41,25 @@ def embed_gemma(text: str, model_tuple=None):
         embeddings = outputs.last_hidden_state.mean(dim=1)
     return embeddings.cpu().numpy()
 
+def embed_gemma_texts(texts, model_tuple=None) -> np.ndarray:
+    """
+    Encode a batch of texts with Gemma in one padded forward pass.
+    Mean pooling ignores padding tokens, so each row equals the single-text embedding.
+    """
+    if model_tuple is None:
+        tokenizer, model = get_gemma_model_cached()
+    else:
+        tokenizer, model = model_tuple
+
+    with metrics.timer("gemma.tokenize"):
+        inputs = tokenizer(list(texts), return_tensors="pt", truncation=True, padding=True).to(device)
+    with metrics.timer("gemma.forward"), torch.no_grad():
+        outputs = model(**inputs)
+        last_hidden_state = outputs.last_hidden_state  # (batch, seq_len, hidden)
+        mask = inputs["attention_mask"].unsqueeze(-1).to(last_hidden_state.dtype)
+        embeddings = (last_hidden_state * mask).sum(dim=1) / mask.sum(dim=1)
+    return embeddings.cpu().numpy()
+
 if __name__ == "__main__":
     # Test the embedding function
     # text = "Hello, this is a test sentence."
@@ -0,0 +1,184 @@
+import hashlib
+import logging
+import os
+import threading
+
+import numpy as np
+import torch
+from dotenv import load_dotenv
+from transformers import AutoTokenizer
+
+from app.ai.model.clip_model import CLIP_MODEL_ID, CACHE_DIR, get_clip_model_cached, embed_clip_texts
+from app.ai.model.gemma_model import GEMMA_MODEL_NAME, HF_TOKEN, get_gemma_model_cached, embed_gemma_texts
+from app.services import metrics
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# "torch" (eager PyTorch) or "onnx" (ONNX Runtime on CPU)
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch")
+ONNX_QUANTIZE = os.getenv("ONNX_QUANTIZE", "0") == "1"  # dynamic int8 weights
+ONNX_DIR = os.getenv("ONNX_DIR", os.path.join(CACHE_DIR or ".", "onnx"))
+ONNX_INTRA_OP_THREADS = int(os.getenv("ONNX_INTRA_OP_THREADS", 0))  # 0 = onnxruntime default
+ONNX_OPSET = 17
+
+_sessions = {}
+_tokenizers = {}
+_lock = threading.Lock()
+
+
+def backend_tag(backend: str = None, quantize: bool = None) -> str:
+    """Identify the active inference engine (part of the embedding-cache key)."""
+    backend = backend or EMBEDDING_BACKEND
+    quantize = ONNX_QUANTIZE if quantize is None else quantize
+    if backend == "onnx":
+        return "onnx-int8" if quantize else "onnx"
+    return "torch"
+
+
+class _ClipTextTower(torch.nn.Module):
+    """CLIP text encoder + projection, as exported to ONNX."""
+
+    def __init__(self, model):
+        super().__init__()
+        self.model = model
+
+    def forward(self, input_ids, attention_mask):
+        return self.model.get_text_features(input_ids=input_ids, attention_mask=attention_mask)
+
+
+class _GemmaMeanPool(torch.nn.Module):
+    """Gemma encoder + masked mean pooling (same pooling as embed_gemma_texts)."""
+
+    def __init__(self, model):
+        super().__init__()
+        self.model = model
+
+    def forward(self, input_ids, attention_mask):
+        hidden = self.model(input_ids=input_ids, attention_mask=attention_mask).last_hidden_state
+        mask = attention_mask.unsqueeze(-1).to(hidden.dtype)
+        return (hidden * mask).sum(dim=1) / mask.sum(dim=1)
+
+
+def _export(module, tokenizer, path):
+    sample = tokenizer(["export sample", "a longer export sample text"], return_tensors="pt", padding=True)
+    dynamic_axes = {
+        "input_ids": {0: "batch", 1: "sequence"},
+        "attention_mask": {0: "batch", 1: "sequence"},
+        "embeddings": {0: "batch"},
+    }
+    module.eval()
+    with torch.no_grad():
+        torch.onnx.export(
+            module,
+            (sample["input_ids"], sample["attention_mask"]),
+            path,
+            input_names=["input_ids", "attention_mask"],
+            output_names=["embeddings"],
+            dynamic_axes=dynamic_axes,
+            opset_version=ONNX_OPSET,
+            do_constant_folding=True,
+        )
+    logger.info(f"Exported ONNX model to {path}")
+
+
+def export_clip_text(path: str):
+    processor, model = get_clip_model_cached()
+    _export(_ClipTextTower(model), processor.tokenizer, path)
+
+
+def export_gemma(path: str):
+    tokenizer, model = get_gemma_model_cached()
+    _export(_GemmaMeanPool(model), tokenizer, path)
+
+
+def quantize(src: str, dst: str):
+    """Dynamic int8 quantization of the exported weights (activations stay float)."""
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    quantize_dynamic(src, dst, weight_type=QuantType.QInt8)
+    logger.info(f"Quantized {src} -> {dst}")
+
+
+def _model_path(name: str, model_id: str, quantized: bool) -> str:
+    """File per (model id, opset, quantization): a changed CLIP_MODEL_ID / GEMMA_MODEL_NAME never reuses an old export."""
+    digest = hashlib.sha1(f"{model_id}\x00{ONNX_OPSET}".encode("utf-8")).hexdigest()[:12]
+    suffix = ".int8.onnx" if quantized else ".onnx"
+    return os.path.join(ONNX_DIR, f"{name}-{digest}{suffix}")
+
+
+def ensure_model(name: str, model_id: str, export_fn, quantized: bool = None) -> str:
+    """Export (and quantize) on first use; later runs reuse the files in ONNX_DIR."""
+    quantized = ONNX_QUANTIZE if quantized is None else quantized
+    os.makedirs(ONNX_DIR, exist_ok=True)
+    fp32_path = _model_path(name, model_id, False)
+    if not os.path.exists(fp32_path):
+        export_fn(fp32_path)
+    if not quantized:
+        return fp32_path
+    int8_path = _model_path(name, model_id, True)
+    if not os.path.exists(int8_path):
+        quantize(fp32_path, int8_path)
+    return int8_path
+
+
+def get_session(name: str, model_id: str, export_fn, quantized: bool = None):
+    import onnxruntime as ort
+
+    quantized = ONNX_QUANTIZE if quantized is None else quantized
+    key = (name, model_id, quantized)
+    if key not in _sessions:
+        with _lock:
+            if key not in _sessions:
+                path = ensure_model(name, model_id, export_fn, quantized)
+                options = ort.SessionOptions()
+                options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+                if ONNX_INTRA_OP_THREADS:
+                    options.intra_op_num_threads = ONNX_INTRA_OP_THREADS
+                print(f"🔹 Loading ONNX session {path}...")
+                _sessions[key] = ort.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+    return _sessions[key]
+
+
+def _get_tokenizer(model_id: str, **kwargs):
+    # Only the tokenizer is needed at inference time, not the torch weights
+    if model_id not in _tokenizers:
+        _tokenizers[model_id] = AutoTokenizer.from_pretrained(model_id, cache_dir=CACHE_DIR, **kwargs)
+    return _tokenizers[model_id]
+
+
+def _run(session, tokenizer, texts) -> np.ndarray:
+    with metrics.timer("onnx.tokenize"):
+        inputs = tokenizer(list(texts), return_tensors="np", padding=True, truncation=True)
+    feeds = {
+        "input_ids": inputs["input_ids"].astype(np.int64),
+        "attention_mask": inputs["attention_mask"].astype(np.int64),
+    }
+    with metrics.timer("onnx.forward"):
+        return session.run(["embeddings"], feeds)[0]
+
+
+def embed_clip_texts_onnx(texts, quantized: bool = None) -> np.ndarray:
+    """ONNX Runtime counterpart of clip_model.embed_clip_texts (L2-normalized)."""
+    session = get_session("clip-text", CLIP_MODEL_ID, export_clip_text, quantized)
+    vectors = _run(session, _get_tokenizer(CLIP_MODEL_ID), texts)
+    return vectors / np.linalg.norm(vectors, axis=-1, keepdims=True)
+
+
+def embed_gemma_texts_onnx(texts, quantized: bool = None) -> np.ndarray:
+    """ONNX Runtime counterpart of gemma_model.embed_gemma_texts."""
+    session = get_session("gemma", GEMMA_MODEL_NAME, export_gemma, quantized)
+    return _run(session, _get_tokenizer(GEMMA_MODEL_NAME, token=HF_TOKEN), texts)
+
+
+def select_clip_text_encoder():
+    if EMBEDDING_BACKEND == "onnx":
+        return embed_clip_texts_onnx
+    return embed_clip_texts
+
+
+def select_gemma_text_encoder():
+    if EMBEDDING_BACKEND == "onnx":
+        return embed_gemma_texts_onnx
+    return embed_gemma_texts
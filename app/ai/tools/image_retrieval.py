@@ -7,16 +7,30 @@ from llama_index.core.tools import FunctionTool
 import numpy as np
 # --- your embedding + vector search imports ---
 from app.ai.model.gemma_model import get_gemma_model_cached, embed_gemma
-from app.ai.model.clip_model import get_clip_model_cached, embed_clip
-from app.ai.vectordatabase.vectorsearch import text_vectorsearch, image_vectorsearch
+from app.ai.model.clip_model import get_clip_model_cached, embed_clip, CLIP_MODEL_ID
+from app.ai.model.batcher import get_clip_text_batcher
+from app.ai.model.embedding_cache import get_embedding_cache
+from app.ai.model.onnx_backend import backend_tag
+from app.services import metrics
+from app.ai.vectordatabase.vectorsearch import text_vectorsearch, image_vectorsearch, image_nearvector_search
 
-def _pack_results(results) -> Dict[Any, Any]:
+@metrics.timed("pack_results")
+def _pack_results(results, explain: bool = False) -> Dict[Any, Any]:
     """Chuẩn hoá kết quả từ LlamaIndex Retriever -> JSON nhẹ nhàng."""
+    metrics.observe("search_candidates", len(results.objects), metrics.COUNT_BUCKETS, modality="image")
     object_property: List[Dict[Any]] = []
     object_metadata: List[Any] = []
     for r in results.objects:
-        object_property.append(r.properties)
-        object_metadata.append(r.metadata.score)
+        if explain:
+            # explain_score chỉ trả về khi client yêu cầu (chuỗi dài, không hiển thị trên grid)
+            object_property.append({**r.properties, "explain_score": r.metadata.explain_score})
+        else:
+            object_property.append(r.properties)
+        score = r.metadata.score
+        if score is None and getattr(r.metadata, "distance", None) is not None:
+            # near_vector chỉ trả distance (cosine) -> đổi sang similarity
+            score = 1.0 - r.metadata.distance
+        object_metadata.append(score)
         # node = getattr(r, "node", None)
         # meta = getattr(node, "metadata", {}) if node else {}
         # kid = (
@@ -34,31 +48,29 @@ def _pack_results(results) -> Dict[Any, Any]:
 # ---------- IMAGE RETRIEVAL (SigLIP) ----------
 
 # --- 2. Hàm tạo embedding từ text ---
+@metrics.timed("embed.clip_text")
 def embed_text(text: str) -> np.ndarray:
     """
     Tạo embedding vector cho một câu text sử dụng CLIP
+    (đi qua micro-batcher: các request đồng thời được gộp thành một forward pass)
+    Cache theo (CLIP_MODEL_ID + backend, query đã chuẩn hoá) nên query lặp lại không phải encode lại.
     """
-    processor, model = get_clip_model_cached()  # ✅ Only two values
-
-    inputs = processor(text=[text], return_tensors="pt", padding=True)
-    inputs = {k: v.to("cpu") for k, v in inputs.items()}
-
-    with torch.no_grad():
-        outputs = model.get_text_features(**inputs)
-
-    vector = outputs.cpu().numpy()
-    vector = vector / np.linalg.norm(vector, axis=-1, keepdims=True)  # normalize
-    return vector[0]
+    return get_embedding_cache().get_or_compute(
+        f"{CLIP_MODEL_ID}|{backend_tag()}", text, lambda: get_clip_text_batcher().encode(text)
+    )
 
 
 def image_retrieval(
     image_query: Optional[str] = None,
-    top_k: int = 300
+    top_k: int = 300,
+    return_properties: Optional[List[str]] = None,
+    explain: bool = False,
 ) -> Dict[str, Any]:
     """
     Tool: image_retrieval
     Use when the user asks to find **keyframes/images** similar to:
       - a text description (set `text`)
+    `return_properties` limits the returned properties (None = all), `explain` adds explain_score.
     Output: {"keyframe_ids": [..], "matches": [{"id": "...","score": float,"metadata": {...}}, ...]}
     """
     query_embedding = embed_text(image_query)
@@ -73,7 +85,21 @@ def image_retrieval(
     #     img = Image.open(io.BytesIO(resp.content)).convert("RGB")
     #     emb = embed_siglip(img, mode="image", model_tuple=(tokenizer, processor, model))
 
-    results = image_vectorsearch(image_query, query_embedding, top_k=top_k)
+    results = image_vectorsearch(
+        image_query, query_embedding, top_k=top_k, return_properties=return_properties, explain=explain
+    )
+    return _pack_results(results, explain=explain)
+
+
+def image_example_retrieval(
+    query_embedding,
+    top_k: int = 300,
+    return_properties: Optional[List[str]] = None,
+) -> Dict[str, Any]:
+    """Query-by-example: tìm keyframe gần nhất với embedding ảnh (CLIP image tower)."""
+    results = image_nearvector_search(
+        np.asarray(query_embedding, dtype=np.float32).tolist(), top_k=top_k, return_properties=return_properties
+    )
     return _pack_results(results)
 
 
@@ -6,16 +6,26 @@ import torch
 from llama_index.core.tools import FunctionTool
 
 # --- your embedding + vector search imports ---
-from app.ai.model.gemma_model import get_gemma_model_cached, embed_gemma
+from app.ai.model.gemma_model import get_gemma_model_cached, embed_gemma, GEMMA_MODEL_NAME
 from app.ai.model.siglip_model import get_siglip_model_cached, embed_siglip
+from app.ai.model.batcher import get_gemma_text_batcher
+from app.ai.model.embedding_cache import get_embedding_cache
+from app.ai.model.onnx_backend import backend_tag
+from app.services import metrics
 from app.ai.vectordatabase.vectorsearch import text_vectorsearch, image_vectorsearch
 
-def _pack_results(results) -> Dict[Any, Any]:
+@metrics.timed("pack_results")
+def _pack_results(results, explain: bool = False) -> Dict[Any, Any]:
     """Chuẩn hoá kết quả từ LlamaIndex Retriever -> JSON nhẹ nhàng."""
+    metrics.observe("search_candidates", len(results.objects), metrics.COUNT_BUCKETS, modality="text")
     object_property: List[Dict[Any]] = []
     object_metadata: List[Any] = []
     for r in results.objects:
-        object_property.append(r.properties)
+        if explain:
+            # explain_score chỉ trả về khi client yêu cầu (chuỗi dài, không hiển thị trên grid)
+            object_property.append({**r.properties, "explain_score": r.metadata.explain_score})
+        else:
+            object_property.append(r.properties)
         object_metadata.append(r.metadata.score)
         # node = getattr(r, "node", None)
         # meta = getattr(node, "metadata", {}) if node else {}
@@ -31,39 +41,38 @@ def _pack_results(results) -> Dict[Any, Any]:
     return {"property": object_property, "score": object_metadata}
 
 
+@metrics.timed("embed.gemma_text")
 def get_text_embedding(text: str):
-    tokenizer, model = get_gemma_model_cached()
-    inputs = tokenizer(text, return_tensors="pt", truncation=True, padding=True)
-    with torch.no_grad():
-        outputs = model(**inputs)
-        last_hidden_state = outputs.last_hidden_state  # (batch, seq_len, hidden)
-
-        # Attention mask để bỏ padding
-        mask = inputs["attention_mask"].unsqueeze(-1).expand(last_hidden_state.size())
-        masked_embeddings = last_hidden_state * mask
-
-        # Mean pooling
-        sum_embeddings = masked_embeddings.sum(dim=1)
-        sum_mask = mask.sum(dim=1)
-        embeddings = sum_embeddings / sum_mask
-
-        emb = embeddings[0].cpu().numpy().tolist()
-    return emb
+    # Masked mean pooling over Gemma hidden states, batched with concurrent requests
+    # and cached per (GEMMA_MODEL_NAME + backend, normalized text)
+    emb = get_embedding_cache().get_or_compute(
+        f"{GEMMA_MODEL_NAME}|{backend_tag()}", text, lambda: get_gemma_text_batcher().encode(text)
+    )
+    return emb.tolist()
 
 
 # ---------- TEXT RETRIEVAL (Gemma) ----------
-def text_retrieval(query_text: str, top_k: int = 300) -> Dict[str, Any]:
+def text_retrieval(
+    query_text: str,
+    top_k: int = 300,
+    return_properties: Optional[List[str]] = None,
+    explain: bool = False,
+) -> Dict[str, Any]:
     """
     Tool: text_retrieval
     Use when the user asks to search **text-only** content.
     Input:
       - query: natural language text (en/vi)
       - top_k: number of results
+      - return_properties: properties to return (None = all)
+      - explain: include explain_score per result
     Output: {"keyframe_ids": [..], "matches": [{"id": "...","score": float,"metadata": {...}}, ...]}
     """
     query_vector = get_text_embedding(query_text)
-    results = text_vectorsearch(query_text, query_vector, top_k=top_k)
-    return _pack_results(results)
+    results = text_vectorsearch(
+        query_text, query_vector, top_k=top_k, return_properties=return_properties, explain=explain
+    )
+    return _pack_results(results, explain=explain)
 
 # Wrap thành LlamaIndex tools với mô tả rõ ràng (prompt cho tool)
 TEXT_RETRIEVAL_TOOL = FunctionTool.from_defaults(
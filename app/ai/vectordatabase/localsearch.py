@@ -0,0 +1,295 @@
+"""
+In-process vector search backend, a drop-in for the Weaviate hybrid queries.
+
+Each collection lives in LOCAL_INDEX_DIR/<collection>/:
+    vectors.npy       float32 (N, dim), memory-mapped
+    properties.jsonl  one JSON object per row
+    offsets.npy       int64 (N + 1,) byte offsets into properties.jsonl
+    hnsw.bin          optional hnswlib index (LOCAL_ANN=hnsw)
+
+Build it from the live Weaviate collections with:
+    python -m app.ai.vectordatabase.localsearch export image
+    python -m app.ai.vectordatabase.localsearch export text
+"""
+import json
+import logging
+import math
+import mmap
+import os
+import re
+import sys
+import threading
+from collections import Counter
+from types import SimpleNamespace
+
+import numpy as np
+from dotenv import load_dotenv
+
+from app.services.fusion import FRAME_ID_PROPERTY, extract_frame_id
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+LOCAL_INDEX_DIR = os.getenv("LOCAL_INDEX_DIR", "local_index")
+LOCAL_ANN = os.getenv("LOCAL_ANN", "exact")  # exact | hnsw
+HNSW_EF_SEARCH = int(os.getenv("HNSW_EF_SEARCH", 512))
+
+# Weaviate's BM25 defaults
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def tokenize(text):
+    return _TOKEN_RE.findall((text or "").lower())
+
+
+class BM25Index:
+    """BM25 over one text property, postings stored as CSR numpy arrays."""
+
+    def __init__(self, texts):
+        vocab = {}
+        doc_ids, term_ids, tfs = [], [], []
+        doc_len = np.zeros(len(texts), dtype=np.float32)
+        for doc_id, text in enumerate(texts):
+            counts = Counter(tokenize(text))
+            doc_len[doc_id] = sum(counts.values())
+            for term, tf in counts.items():
+                doc_ids.append(doc_id)
+                term_ids.append(vocab.setdefault(term, len(vocab)))
+                tfs.append(tf)
+
+        term_ids = np.asarray(term_ids, dtype=np.int64)
+        order = np.argsort(term_ids, kind="stable")
+        self.vocab = vocab
+        self.postings_doc = np.asarray(doc_ids, dtype=np.int64)[order]
+        self.postings_tf = np.asarray(tfs, dtype=np.float32)[order]
+        self.indptr = np.zeros(len(vocab) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(term_ids, minlength=len(vocab)), out=self.indptr[1:])
+
+        n_docs = max(len(texts), 1)
+        df = np.diff(self.indptr).astype(np.float32)
+        self.idf = np.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+        avgdl = float(doc_len.mean()) if len(texts) else 0.0
+        self.norm = BM25_K1 * (1 - BM25_B + BM25_B * doc_len / (avgdl or 1.0))
+        self.n_docs = len(texts)
+
+    def scores(self, query):
+        """Dense BM25 score per document."""
+        scores = np.zeros(self.n_docs, dtype=np.float32)
+        for term in set(tokenize(query)):
+            term_id = self.vocab.get(term)
+            if term_id is None:
+                continue
+            start, end = self.indptr[term_id], self.indptr[term_id + 1]
+            docs = self.postings_doc[start:end]
+            tf = self.postings_tf[start:end]
+            scores[docs] += self.idf[term_id] * tf * (BM25_K1 + 1) / (tf + self.norm[docs])
+        return scores
+
+
+class LocalCollection:
+    def __init__(self, path, text_property="text"):
+        self.path = path
+        self.vectors = np.load(os.path.join(path, "vectors.npy"), mmap_mode="r")
+        self.offsets = np.load(os.path.join(path, "offsets.npy"))
+        self._file = open(os.path.join(path, "properties.jsonl"), "rb")
+        self._props = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        norms = np.linalg.norm(self.vectors, axis=1)
+        self.inv_norms = (1.0 / np.where(norms == 0, 1.0, norms)).astype(np.float32)
+        texts, self.frame_rows = [], {}
+        for i in range(len(self)):
+            props = self.properties(i)
+            texts.append(props.get(text_property, ""))
+            frame_id = extract_frame_id(props)
+            self.frame_rows[i if frame_id is None else frame_id] = i
+        self.bm25 = BM25Index(texts)
+        self.hnsw = self._load_hnsw() if LOCAL_ANN == "hnsw" else None
+        logger.info(f"Loaded local collection {path}: {len(self)} objects, dim={self.vectors.shape[1]}")
+
+    def __len__(self):
+        return self.vectors.shape[0]
+
+    def properties(self, row, return_properties=None):
+        start, end = self.offsets[row], self.offsets[row + 1]
+        props = json.loads(self._props[start:end])
+        if return_properties is not None:
+            props = {k: props[k] for k in return_properties if k in props}
+        return props
+
+    def find(self, key, value):
+        """Properties of the object whose `key` property equals `value`, or None."""
+        if key in (FRAME_ID_PROPERTY, "frame_id"):
+            row = self.frame_rows.get(value)
+            return self.properties(row) if row is not None else None
+        for row in range(len(self)):
+            props = self.properties(row)
+            if props.get(key) == value:
+                return props
+        return None
+
+    def _load_hnsw(self):
+        import hnswlib
+
+        index = hnswlib.Index(space="cosine", dim=self.vectors.shape[1])
+        index_path = os.path.join(self.path, "hnsw.bin")
+        if os.path.exists(index_path):
+            index.load_index(index_path, max_elements=len(self))
+        else:
+            logger.info(f"Building HNSW index for {self.path}")
+            index.init_index(max_elements=len(self), ef_construction=200, M=32)
+            index.add_items(np.asarray(self.vectors), np.arange(len(self)))
+            index.save_index(index_path)
+        # Set once: set_ef mutates the shared index and is not safe while other
+        # threads query it. hnswlib searches with max(ef, k), so k > ef still works.
+        index.set_ef(max(HNSW_EF_SEARCH, 1))
+        return index
+
+    def vector_topk(self, query_vector, k):
+        """(rows, cosine similarities) of the k nearest vectors."""
+        query = np.asarray(query_vector, dtype=np.float32).reshape(-1)
+        query = query / (np.linalg.norm(query) or 1.0)
+        k = min(k, len(self))
+        if self.hnsw is not None:
+            labels, distances = self.hnsw.knn_query(query, k=k)
+            return labels[0].astype(np.int64), 1.0 - distances[0]
+        sims = (self.vectors @ query) * self.inv_norms
+        return _topk(sims, k)
+
+    def keyword_topk(self, query, k):
+        scores = self.bm25.scores(query)
+        rows, values = _topk(scores, min(k, len(self)))
+        keep = values > 0
+        return rows[keep], values[keep]
+
+    def close(self):
+        self._props.close()
+        self._file.close()
+
+
+def _topk(scores, k):
+    if k <= 0:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+    if k < len(scores):
+        rows = np.argpartition(-scores, k - 1)[:k]
+    else:
+        rows = np.arange(len(scores))
+    rows = rows[np.argsort(-scores[rows], kind="stable")]
+    return rows, scores[rows]
+
+
+def _min_max(values):
+    if len(values) == 0:
+        return values
+    low, high = values.min(), values.max()
+    if high == low:
+        return np.ones_like(values)
+    return (values - low) / (high - low)
+
+
+def hybrid_search(collection_name, text_query, query_embedding, alpha, top_k=300, return_properties=None):
+    """
+    Same semantics as Weaviate hybrid(fusion_type=RELATIVE_SCORE): the vector and
+    BM25 result sets are min-max normalized separately and combined as
+    alpha * vector + (1 - alpha) * keyword. Returns a response-shaped object
+    (`.objects[i].properties`, `.objects[i].metadata.score`).
+    """
+    collection = get_collection(collection_name)
+    vec_rows, vec_scores = (
+        collection.vector_topk(query_embedding, top_k) if alpha > 0 else (np.empty(0, np.int64), np.empty(0))
+    )
+    kw_rows, kw_scores = (
+        collection.keyword_topk(text_query, top_k) if alpha < 1 and text_query else (np.empty(0, np.int64), np.empty(0))
+    )
+
+    rows = np.union1d(vec_rows, kw_rows)
+    fused = np.zeros(len(rows), dtype=np.float32)
+    fused[np.searchsorted(rows, vec_rows)] += alpha * _min_max(vec_scores)
+    fused[np.searchsorted(rows, kw_rows)] += (1 - alpha) * _min_max(kw_scores)
+
+    order, scores = _topk(fused, min(top_k, len(rows)))
+    objects = [
+        SimpleNamespace(
+            uuid=None,
+            properties=collection.properties(int(rows[i]), return_properties),
+            metadata=SimpleNamespace(score=float(score), explain_score=None, distance=None),
+        )
+        for i, score in zip(order, scores)
+    ]
+    return SimpleNamespace(objects=objects)
+
+
+def vector_search(collection_name, query_embedding, top_k=300, return_properties=None):
+    """Same shape as Weaviate near_vector: `.metadata.distance` is the cosine distance."""
+    collection = get_collection(collection_name)
+    rows, sims = collection.vector_topk(query_embedding, top_k)
+    objects = [
+        SimpleNamespace(
+            uuid=None,
+            properties=collection.properties(int(row), return_properties),
+            metadata=SimpleNamespace(score=None, explain_score=None, distance=float(1.0 - sim)),
+        )
+        for row, sim in zip(rows, sims)
+    ]
+    return SimpleNamespace(objects=objects)
+
+
+_collections = {}
+_collections_lock = threading.Lock()
+
+
+def get_collection(collection_name) -> LocalCollection:
+    collection = _collections.get(collection_name)
+    if collection is None:
+        with _collections_lock:
+            collection = _collections.get(collection_name)
+            if collection is None:
+                collection = LocalCollection(os.path.join(LOCAL_INDEX_DIR, collection_name))
+                _collections[collection_name] = collection
+    return collection
+
+
+def close_collections():
+    with _collections_lock:
+        for collection in _collections.values():
+            collection.close()
+        _collections.clear()
+
+
+def export_collection(collection, out_dir):
+    """Dump a Weaviate collection (vectors + properties) into the local index layout."""
+    os.makedirs(out_dir, exist_ok=True)
+    vectors = []
+    offsets = [0]
+    with open(os.path.join(out_dir, "properties.jsonl"), "wb") as f:
+        for obj in collection.iterator(include_vector=True):
+            vector = obj.vector["default"] if isinstance(obj.vector, dict) else obj.vector
+            vectors.append(np.asarray(vector, dtype=np.float32))
+            line = json.dumps(obj.properties, ensure_ascii=False, default=str).encode("utf-8") + b"\n"
+            f.write(line)
+            offsets.append(offsets[-1] + len(line))
+    np.save(os.path.join(out_dir, "vectors.npy"), np.vstack(vectors) if vectors else np.zeros((0, 0), np.float32))
+    np.save(os.path.join(out_dir, "offsets.npy"), np.asarray(offsets, dtype=np.int64))
+    logger.info(f"Exported {len(vectors)} objects to {out_dir}")
+
+
+if __name__ == "__main__":
+    # python -m app.ai.vectordatabase.localsearch export image|text
+    from app.ai.vectordatabase import vectorsearch
+
+    logging.basicConfig(level=logging.INFO)
+    if len(sys.argv) != 3 or sys.argv[1] != "export" or sys.argv[2] not in ("image", "text"):
+        print("usage: python -m app.ai.vectordatabase.localsearch export image|text")
+        sys.exit(1)
+    type_retrieval = sys.argv[2]
+    name = (
+        vectorsearch.get_image_collection_name() if type_retrieval == "image"
+        else vectorsearch.get_text_collection_name()
+    )
+    client = vectorsearch._connect(type_retrieval)
+    try:
+        export_collection(client.collections.use(name), os.path.join(LOCAL_INDEX_DIR, name))
+    finally:
+        client.close()
@@ -3,88 +3,282 @@ from dotenv import load_dotenv
 from weaviate.classes.query import HybridFusion
 
 import os
+import threading
 import weaviate
 import logging
 from llama_index.core import StorageContext
 from llama_index.vector_stores.weaviate import WeaviateVectorStore
-from weaviate.classes.query import MetadataQuery
+from weaviate.classes.query import MetadataQuery, Filter
+from weaviate.exceptions import WeaviateBaseError
+from app.ai.vectordatabase import localsearch
+from app.services import metrics
+from app.services.fusion import FRAME_ID_PROPERTY
 load_dotenv()
 
 logger = logging.getLogger(__name__)
 
 # credentials = service_account.Credentials.from_service_account_file(CREDENTIALS_PATH)
 
-def _get_client(type_retrieval) -> weaviate.WeaviateClient:
-    """Helper to create a WeaviateVectorStore from index and endpoint names."""
-    if type_retrieval == "image":
-        logger.info("Connecting to Weaviate image vector DB")
-        client = weaviate.connect_to_weaviate_cloud(
-            cluster_url=os.getenv("WEAVIATE_CLIP_IMG_URL"),
-            auth_credentials=weaviate.auth.AuthApiKey(os.getenv("WEAVIATE_CLIP_IMG_API_KEY")),
-            skip_init_checks=True
-        )
-    elif type_retrieval == "text":
-        logger.info("Connecting to Weaviate text vector DB")
-        client = weaviate.connect_to_weaviate_cloud(
-            cluster_url=os.getenv("WEAVIATE_TEXT_URL"),
-            auth_credentials=weaviate.auth.AuthApiKey(os.getenv("WEAVIATE_TEXT_API_KEY")),
-            skip_init_checks=True
-        )
-    else:
+# "weaviate" (remote clusters) or "local" (in-process index, see localsearch.py)
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "weaviate")
+
+# Hybrid search weight of vector similarity vs BM25, per retrieval type
+IMAGE_HYBRID_ALPHA = float(os.getenv("IMAGE_HYBRID_ALPHA", 0.8))
+TEXT_HYBRID_ALPHA = float(os.getenv("TEXT_HYBRID_ALPHA", 0.2))
+
+# Default projection; empty (the default) returns every property, as before projections existed.
+# The frame key property (fusion.FRAME_ID_PROPERTY) is always added to an explicit projection.
+DEFAULT_RETURN_PROPERTIES = [p.strip() for p in os.getenv("DEFAULT_RETURN_PROPERTIES", "").split(",") if p.strip()]
+
+# One Weaviate cluster per retrieval type: (cluster url env, api key env)
+_CLUSTERS = {
+    "image": ("WEAVIATE_CLIP_IMG_URL", "WEAVIATE_CLIP_IMG_API_KEY"),
+    "text": ("WEAVIATE_TEXT_URL", "WEAVIATE_TEXT_API_KEY"),
+}
+
+# -------------------------
+# Long-lived clients (one per cluster), reused across requests
+# -------------------------
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+@metrics.timed("weaviate.connect")
+def _connect(type_retrieval) -> weaviate.WeaviateClient:
+    """Open a new sync client to the cluster of the given retrieval type."""
+    if type_retrieval not in _CLUSTERS:
         logger.warning(f"Unknown type_retrieval: {type_retrieval}")
-        client = None
+        return None
+    url_env, key_env = _CLUSTERS[type_retrieval]
+    logger.info(f"Connecting to Weaviate {type_retrieval} vector DB")
+    return weaviate.connect_to_weaviate_cloud(
+        cluster_url=os.getenv(url_env),
+        auth_credentials=weaviate.auth.AuthApiKey(os.getenv(key_env)),
+        skip_init_checks=True
+    )
+
+
+def _get_client(type_retrieval) -> weaviate.WeaviateClient:
+    """Return the pooled client for a cluster, (re)connecting if needed."""
+    client = _clients.get(type_retrieval)
+    if client is not None and client.is_connected():
+        return client
+    with _clients_lock:
+        client = _clients.get(type_retrieval)
+        if client is None or not client.is_connected():
+            client = _connect(type_retrieval)
+            if client is not None:
+                _clients[type_retrieval] = client
+    return client
+
+
+def reconnect_client(type_retrieval) -> weaviate.WeaviateClient:
+    """Drop the pooled client of a cluster and open a fresh one."""
+    with _clients_lock:
+        old = _clients.pop(type_retrieval, None)
+        if old is not None:
+            try:
+                old.close()
+            except Exception as e:
+                logger.warning(f"Error closing stale Weaviate {type_retrieval} client: {e}")
+        client = _connect(type_retrieval)
+        if client is not None:
+            _clients[type_retrieval] = client
     return client
 
 
-def run_vector_search_img(client, text_query, query_embedding, collection, top_k=300):
+def init_clients():
+    """Create the image and text clients (called at startup); returns {type_retrieval: ready}."""
+    if VECTOR_BACKEND == "local":
+        for name in (get_image_collection_name(), get_text_collection_name()):
+            localsearch.get_collection(name)
+        return {"local": True}
+    status = {}
+    for type_retrieval in _CLUSTERS:
+        try:
+            client = _get_client(type_retrieval)
+            # skip_init_checks=True means connecting proves nothing; ask the cluster
+            status[type_retrieval] = bool(client is not None and client.is_ready())
+        except Exception as e:
+            # Not fatal here: the caller decides (warm-up retries, searches reconnect lazily)
+            logger.error(f"Failed to connect Weaviate {type_retrieval} client: {e}")
+            status[type_retrieval] = False
+    return status
+
+
+def close_clients():
+    localsearch.close_collections()
+    with _clients_lock:
+        for type_retrieval, client in list(_clients.items()):
+            try:
+                client.close()
+            except Exception as e:
+                logger.warning(f"Error closing Weaviate {type_retrieval} client: {e}")
+        _clients.clear()
+    logger.info("Weaviate clients closed")
+
+
+def check_clients():
+    """Health probe: {type_retrieval: ready} for every pooled client."""
+    if VECTOR_BACKEND == "local":
+        return {"local": True}
+    status = {}
+    for type_retrieval in _CLUSTERS:
+        client = _clients.get(type_retrieval)
+        try:
+            status[type_retrieval] = bool(client is not None and client.is_ready())
+        except Exception as e:
+            logger.warning(f"Weaviate {type_retrieval} health probe failed: {e}")
+            status[type_retrieval] = False
+    return status
+
+
+def _with_reconnect(type_retrieval, search_fn):
+    """Run search_fn(client); on a Weaviate/connection error reconnect once and retry."""
+    client = _get_client(type_retrieval)
+    try:
+        return search_fn(client)
+    except WeaviateBaseError as e:
+        logger.warning(f"Weaviate {type_retrieval} search failed ({e}), reconnecting")
+        client = reconnect_client(type_retrieval)
+        return search_fn(client)
+
+
+def resolve_return_properties(fields=None):
+    """
+    Projection for a search: None/[] -> DEFAULT_RETURN_PROPERTIES (unset: all
+    properties), ["*"] -> all properties (returned as None, Weaviate's
+    "everything"), otherwise the given fields plus FRAME_ID_PROPERTY, the key
+    fusion dedupes on.
+    """
+    if fields and "*" in fields:
+        return None
+    props = list(fields) if fields else list(DEFAULT_RETURN_PROPERTIES)
+    if not props or "*" in props:
+        return None
+    if FRAME_ID_PROPERTY not in props:
+        props.insert(0, FRAME_ID_PROPERTY)
+    return props
+
+
+def get_image_collection_name():
+    return os.getenv("CLIP_IMG_COLLECTION", "ImageRetrieval")
+
+
+def get_text_collection_name():
+    return os.getenv("TEXT_COLLECTION", "TextRetrieval")
+
+
+def run_vector_search_img(text_query, query_embedding, collection, top_k=300,
+                          return_properties=None, explain=False):
     """Generic vector search function."""
     logger.info(f"Running image vector search: text_query='{text_query}', top_k={top_k}")
     response = collection.query.hybrid(
         query=text_query,
         query_properties=["text"],
         vector=query_embedding,
-        alpha=0.8,  # weight for vector similarity
+        alpha=IMAGE_HYBRID_ALPHA,  # weight for vector similarity
         limit=top_k,
         fusion_type=HybridFusion.RELATIVE_SCORE,
-        return_metadata=MetadataQuery(score=True, explain_score=True),
+        return_properties=return_properties,
+        return_metadata=MetadataQuery(score=True, explain_score=explain),
     )
     # logger.info(f"Image vector search response: {response}")
-    client.close()
     return response
 
-def run_vector_search_text(client, text_query, query_embedding, collection, top_k=300):
+def run_vector_search_text(text_query, query_embedding, collection, top_k=300,
+                          return_properties=None, explain=False):
     """Generic vector search function."""
     logger.info(f"Running text vector search: text_query='{text_query}', top_k={top_k}")
     response = collection.query.hybrid(
         query=text_query,
         query_properties=["text"],
         vector=query_embedding,
-        alpha=0.2,  # weight for vector similarity
+        alpha=TEXT_HYBRID_ALPHA,  # weight for vector similarity
         limit=top_k,
         fusion_type=HybridFusion.RELATIVE_SCORE,
-        return_metadata=MetadataQuery(score=True, explain_score=True),
+        return_properties=return_properties,
+        return_metadata=MetadataQuery(score=True, explain_score=explain),
     )
     # logger.info(f"Text vector search response: {response}")
-    client.close()
     return response
 
-def text_vectorsearch(query_text, query_embedding, top_k=300):
+@metrics.timed("vector_search.text")
+def text_vectorsearch(query_text, query_embedding, top_k=300, return_properties=None, explain=False):
     """Search text vector DB using Qwen embeddings."""
     type_retrieval = "text"
     logger.info(f"text_vectorsearch called with query_text='{query_text}', top_k={top_k}")
-    client = _get_client(type_retrieval)
-    text_collection_name = os.getenv("TEXT_COLLECTION", "TextRetrieval")
+    text_collection_name = get_text_collection_name()
     logger.info(f"Using text collection: {text_collection_name}")
-    text_collection = client.collections.use(text_collection_name)
-    return run_vector_search_text(client, query_text, query_embedding, text_collection, top_k)
+    if VECTOR_BACKEND == "local":
+        return localsearch.hybrid_search(
+            text_collection_name, query_text, query_embedding, TEXT_HYBRID_ALPHA, top_k, return_properties
+        )
+    return _with_reconnect(
+        type_retrieval,
+        lambda client: run_vector_search_text(
+            query_text, query_embedding, client.collections.use(text_collection_name), top_k,
+            return_properties, explain,
+        ),
+    )
 
 
-def image_vectorsearch(text_query, query_embedding, top_k=300):
+@metrics.timed("vector_search.image")
+def image_vectorsearch(text_query, query_embedding, top_k=300, return_properties=None, explain=False):
     """Search image vector DB using CLIP embeddings."""
     type_retrieval = "image"
     logger.info(f"image_vectorsearch called with text_query='{text_query}', top_k={top_k}")
-    client = _get_client(type_retrieval)
-    image_collection_name = os.getenv("CLIP_IMG_COLLECTION", "ImageRetrieval")
+    image_collection_name = get_image_collection_name()
     logger.info(f"Using image collection: {image_collection_name}")
-    image_collection = client.collections.use(image_collection_name)
-    return run_vector_search_img(client, text_query, query_embedding, image_collection, top_k)
+    if VECTOR_BACKEND == "local":
+        return localsearch.hybrid_search(
+            image_collection_name, text_query, query_embedding, IMAGE_HYBRID_ALPHA, top_k, return_properties
+        )
+    return _with_reconnect(
+        type_retrieval,
+        lambda client: run_vector_search_img(
+            text_query, query_embedding, client.collections.use(image_collection_name), top_k,
+            return_properties, explain,
+        ),
+    )
+
+
+def run_near_vector_img(query_embedding, collection, top_k=300, return_properties=None):
+    """Pure vector search (query-by-example): no BM25 part, scored by cosine distance."""
+    logger.info(f"Running image near-vector search: top_k={top_k}")
+    return collection.query.near_vector(
+        near_vector=query_embedding,
+        limit=top_k,
+        return_properties=return_properties,
+        return_metadata=MetadataQuery(distance=True),
+    )
+
+
+@metrics.timed("vector_search.near_vector")
+def image_nearvector_search(query_embedding, top_k=300, return_properties=None):
+    """Search the image collection by a CLIP image embedding."""
+    image_collection_name = get_image_collection_name()
+    if VECTOR_BACKEND == "local":
+        return localsearch.vector_search(image_collection_name, query_embedding, top_k, return_properties)
+    return _with_reconnect(
+        "image",
+        lambda client: run_near_vector_img(
+            query_embedding, client.collections.use(image_collection_name), top_k, return_properties
+        ),
+    )
+
+
+@metrics.timed("vector_search.fetch")
+def fetch_keyframe(type_retrieval, frame_id):
+    """Full properties of one keyframe (lazy detail view), or None if not found."""
+    name = get_image_collection_name() if type_retrieval == "image" else get_text_collection_name()
+    if VECTOR_BACKEND == "local":
+        return localsearch.get_collection(name).find(FRAME_ID_PROPERTY, frame_id)
+    response = _with_reconnect(
+        type_retrieval,
+        lambda client: client.collections.use(name).query.fetch_objects(
+            filters=Filter.by_property(FRAME_ID_PROPERTY).equal(frame_id),
+            limit=1,
+        ),
+    )
+    return response.objects[0].properties if response.objects else None
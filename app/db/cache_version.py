@@ -0,0 +1,89 @@
+# app/db/cache_version.py
+"""
+Result-cache invalidation across worker processes.
+
+Each worker (app.serve forks several) has its own in-process ResultCache, so a
+clear on one worker is not enough. Invalidations are published to the
+`result_cache_version` row (migration 0004); a background task in every worker
+polls it every RESULT_CACHE_VERSION_POLL_SECONDS and clears the local cache
+when the generation changed. Other workers therefore drop stale rankings
+within one poll interval instead of at TTL expiry.
+"""
+import asyncio
+import logging
+import os
+from typing import Optional
+
+from dotenv import load_dotenv
+
+from app.db import database
+from app.services.result_cache import get_result_cache
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+RESULT_CACHE_VERSION_POLL_SECONDS = float(os.getenv("RESULT_CACHE_VERSION_POLL_SECONDS", 5))
+
+SELECT_VERSION_SQL = "SELECT version, generation FROM result_cache_version"
+BUMP_VERSION_SQL = """
+UPDATE result_cache_version
+SET version = COALESCE($1, version), generation = generation + 1, updated_at = now()
+RETURNING version, generation
+"""
+
+_generation = None
+_task = None
+
+
+def _apply(version: Optional[str], generation: int):
+    """Clear the local cache if the shared generation moved since the last look."""
+    global _generation
+    cache = get_result_cache()
+    target = version if version is not None else cache.version
+    if (_generation is not None and generation != _generation) or target != cache.version:
+        cache.invalidate(target)
+    _generation = generation
+
+
+async def sync_version():
+    async with database.get_async_pool().acquire() as conn:
+        row = await conn.fetchrow(SELECT_VERSION_SQL)
+    if row is not None:
+        _apply(row["version"], row["generation"])
+
+
+async def publish_invalidation(version: Optional[str] = None):
+    """Bump the shared generation (and version); this worker clears at once, the others on their next poll."""
+    async with database.get_async_pool().acquire() as conn:
+        row = await conn.fetchrow(BUMP_VERSION_SQL, version)
+    if row is None:
+        raise RuntimeError("result_cache_version row missing (apply migration 0004)")
+    _apply(row["version"], row["generation"])
+
+
+async def _run():
+    while True:
+        try:
+            await sync_version()
+        except Exception as e:
+            logger.warning(f"Result cache version sync failed: {e}")
+        await asyncio.sleep(RESULT_CACHE_VERSION_POLL_SECONDS)
+
+
+def start_version_sync():
+    global _task
+    if _task is None:
+        _task = asyncio.create_task(_run())
+        logger.info(f"Result cache version sync every {RESULT_CACHE_VERSION_POLL_SECONDS}s")
+
+
+async def stop_version_sync():
+    global _task
+    if _task is not None:
+        _task.cancel()
+        try:
+            await _task
+        except asyncio.CancelledError:
+            pass
+        _task = None
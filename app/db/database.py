@@ -4,6 +4,7 @@ import logging
 from dotenv import load_dotenv
 import sqlalchemy
 import asyncpg
+import orjson
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -45,6 +46,17 @@ def get_sync_engine():
 # -------------------------
 # Asynchronous asyncpg pool
 # -------------------------
+def _encode_json(value):
+    # Writers may pass JSON text they already serialised (query_results.keyframe_row)
+    return value if isinstance(value, str) else orjson.dumps(value).decode("utf-8")
+
+async def init_connection(conn):
+    """Per-connection setup: json/jsonb columns are decoded to Python objects by orjson."""
+    for typename in ("json", "jsonb"):
+        await conn.set_type_codec(
+            typename, schema="pg_catalog", encoder=_encode_json, decoder=orjson.loads, format="text"
+        )
+
 async def init_async_pool():
     """Initialize asyncpg pool if not exists"""
     global _async_pool
@@ -56,7 +68,8 @@ async def init_async_pool():
             password=DB_PASSWORD,
             database=DB_NAME,
             min_size=1,
-            max_size=10
+            max_size=10,
+            init=init_connection,
         )
         print("Connecting with:", DB_USER, DB_PASSWORD, DB_HOST, DB_PORT, DB_NAME)
         logger.info("Asyncpg pool created successfully")
@@ -0,0 +1,116 @@
+# app/db/keyframe_cache.py
+"""
+In-process LRU of decoded `keyframes` rows, keyed by keyframe_id.
+
+Complete keyframe rows never change (keyframe_id is derived from the frame id;
+a row written from projected properties is replaced once by the first complete
+write, see query_results.UPSERT_KEYFRAME_SQL), so history endpoints read only
+(keyframe_id, rank, score) from `query_results` and resolve the keyframe
+columns here. Only complete rows are cached. Misses are fetched in one `= ANY($1)` query; the metadata JSONB
+arrives already decoded by the pool's codec (database.init_connection).
+Only touched from the event loop, so no locking is needed.
+"""
+import json
+import logging
+import os
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, NamedTuple
+from uuid import UUID
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+KEYFRAME_CACHE_MAX_ENTRIES = int(os.getenv("KEYFRAME_CACHE_MAX_ENTRIES", 200_000))
+
+FETCH_KEYFRAMES_SQL = """
+SELECT keyframe_id, video_id, frame_number, timestamp_ms, image_url, metadata, complete
+FROM keyframes
+WHERE keyframe_id = ANY($1::uuid[])
+"""
+
+
+class Keyframe(NamedTuple):
+    video_id: str
+    frame_number: int
+    timestamp_ms: int
+    image_url: str
+    metadata: Dict[str, Any]
+
+
+class KeyframeCache:
+    def __init__(self, max_entries: int = KEYFRAME_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[UUID, Keyframe]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.fetches = 0
+
+    def put(self, keyframe_id: UUID, keyframe: Keyframe):
+        if self.max_entries <= 0:
+            return
+        self._entries[keyframe_id] = keyframe
+        self._entries.move_to_end(keyframe_id)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def get_many(self, conn, keyframe_ids: Iterable[UUID]) -> Dict[UUID, Keyframe]:
+        """keyframe_id -> Keyframe for every id that exists; one query for all misses."""
+        found, missing = {}, []
+        for keyframe_id in dict.fromkeys(keyframe_ids):
+            keyframe = self._entries.get(keyframe_id)
+            if keyframe is None:
+                missing.append(keyframe_id)
+            else:
+                self._entries.move_to_end(keyframe_id)
+                found[keyframe_id] = keyframe
+        self.hits += len(found)
+        self.misses += len(missing)
+        if missing:
+            self.fetches += 1
+            for r in await conn.fetch(FETCH_KEYFRAMES_SQL, missing):
+                keyframe = Keyframe(
+                    r["video_id"], r["frame_number"], r["timestamp_ms"], r["image_url"],
+                    parse_metadata(r["metadata"]),
+                )
+                found[r["keyframe_id"]] = keyframe
+                if r["complete"]:
+                    self.put(r["keyframe_id"], keyframe)
+        return found
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "fetches": self.fetches,
+        }
+
+
+def parse_metadata(meta) -> Dict[str, Any]:
+    """Metadata as a dict; the JSONB codec already decodes, plain text is parsed as a fallback."""
+    if isinstance(meta, str):
+        try:
+            return json.loads(meta)
+        except json.JSONDecodeError:
+            logger.warning(f"Invalid metadata JSON: {meta}")
+            return {}
+    return meta or {}
+
+
+_keyframe_cache = None
+
+
+def get_keyframe_cache() -> KeyframeCache:
+    global _keyframe_cache
+    if _keyframe_cache is None:
+        _keyframe_cache = KeyframeCache()
+    return _keyframe_cache
@@ -0,0 +1,111 @@
+# app/db/migrate.py
+"""
+Plain-SQL schema migrations.
+
+Files in app/db/migrations named `NNNN_description.sql` are applied in order,
+each in its own transaction, and recorded in `schema_migrations`. A session
+advisory lock serialises concurrent runners (several workers starting at once).
+
+    python -m app.db.migrate            # apply pending migrations
+    python -m app.db.migrate --status   # list applied / pending
+
+With DB_MIGRATE_ON_STARTUP=1 the API applies pending migrations at startup.
+"""
+import argparse
+import asyncio
+import logging
+import os
+import re
+from typing import List, Tuple
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(__file__), "migrations")
+DB_MIGRATE_ON_STARTUP = os.getenv("DB_MIGRATE_ON_STARTUP", "0") == "1"
+MIGRATION_LOCK_ID = 7_310_023  # arbitrary, shared by every runner
+
+_MIGRATION_RE = re.compile(r"^(?P<version>\d{4})_[\w-]+\.sql$")
+
+CREATE_MIGRATIONS_TABLE_SQL = """
+CREATE TABLE IF NOT EXISTS schema_migrations (
+    version    TEXT PRIMARY KEY,
+    name       TEXT NOT NULL,
+    applied_at TIMESTAMPTZ NOT NULL DEFAULT now()
+)
+"""
+
+
+def list_migrations(directory: str = MIGRATIONS_DIR) -> List[Tuple[str, str, str]]:
+    """(version, file name, path) of every migration file, sorted by version."""
+    migrations = []
+    for name in sorted(os.listdir(directory)):
+        match = _MIGRATION_RE.match(name)
+        if match:
+            migrations.append((match.group("version"), name, os.path.join(directory, name)))
+    return migrations
+
+
+async def applied_versions(conn) -> set:
+    await conn.execute(CREATE_MIGRATIONS_TABLE_SQL)
+    return {r["version"] for r in await conn.fetch("SELECT version FROM schema_migrations")}
+
+
+async def migrate(conn, directory: str = MIGRATIONS_DIR, target: str = None) -> List[str]:
+    """Apply pending migrations (up to `target`, inclusive) on `conn`; returns the applied file names."""
+    applied = []
+    await conn.execute("SELECT pg_advisory_lock($1)", MIGRATION_LOCK_ID)
+    try:
+        done = await applied_versions(conn)
+        for version, name, path in list_migrations(directory):
+            if target is not None and version > target:
+                break
+            if version in done:
+                continue
+            with open(path, encoding="utf-8") as f:
+                sql = f.read()
+            async with conn.transaction():
+                await conn.execute(sql)
+                await conn.execute(
+                    "INSERT INTO schema_migrations (version, name) VALUES ($1, $2)", version, name
+                )
+            logger.info(f"Applied migration {name}")
+            applied.append(name)
+    finally:
+        await conn.execute("SELECT pg_advisory_unlock($1)", MIGRATION_LOCK_ID)
+    return applied
+
+
+async def migrate_pool(pool) -> List[str]:
+    async with pool.acquire() as conn:
+        return await migrate(conn)
+
+
+async def _main():
+    from app.db import database
+
+    parser = argparse.ArgumentParser(description="Apply app/db/migrations to DB_* database")
+    parser.add_argument("--status", action="store_true", help="only list applied / pending migrations")
+    parser.add_argument("--target", help="apply up to this version (e.g. 0001)")
+    args = parser.parse_args()
+
+    pool = await database.init_async_pool()
+    try:
+        async with pool.acquire() as conn:
+            if args.status:
+                done = await applied_versions(conn)
+                for version, name, _ in list_migrations():
+                    print(f"{'applied' if version in done else 'pending':<8} {name}")
+                return
+            applied = await migrate(conn, target=args.target)
+            print(f"Applied {len(applied)} migration(s)" + (": " + ", ".join(applied) if applied else ""))
+    finally:
+        await database.close_async_pool()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(_main())
@@ -0,0 +1,42 @@
+-- Tables used by the API. IF NOT EXISTS: a no-op on databases created before
+-- migrations were tracked, a full schema on a fresh one (tests, benchmarks).
+-- gen_random_uuid() is built in since PostgreSQL 13.
+
+CREATE TABLE IF NOT EXISTS sessions (
+    session_id   UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    created_at   TIMESTAMPTZ NOT NULL DEFAULT now(),
+    last_updated TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+CREATE TABLE IF NOT EXISTS queries (
+    query_id    UUID PRIMARY KEY,
+    session_id  UUID NOT NULL REFERENCES sessions (session_id) ON DELETE CASCADE,
+    text_query  TEXT,
+    image_query TEXT,
+    created_at  TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+CREATE TABLE IF NOT EXISTS messages (
+    message_id BIGSERIAL PRIMARY KEY,
+    session_id UUID NOT NULL REFERENCES sessions (session_id) ON DELETE CASCADE,
+    query_id   UUID REFERENCES queries (query_id) ON DELETE CASCADE,
+    role       TEXT NOT NULL,
+    content    TEXT,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+CREATE TABLE IF NOT EXISTS keyframes (
+    keyframe_id  UUID PRIMARY KEY,
+    video_id     TEXT NOT NULL,
+    frame_number INTEGER NOT NULL,
+    timestamp_ms BIGINT NOT NULL DEFAULT 0,
+    image_url    TEXT NOT NULL DEFAULT '',
+    metadata     JSONB NOT NULL DEFAULT '{}'::jsonb
+);
+
+CREATE TABLE IF NOT EXISTS query_results (
+    query_id    UUID NOT NULL REFERENCES queries (query_id) ON DELETE CASCADE,
+    keyframe_id UUID NOT NULL REFERENCES keyframes (keyframe_id),
+    rank        INTEGER NOT NULL,
+    score       DOUBLE PRECISION NOT NULL
+);
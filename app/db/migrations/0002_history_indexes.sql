@@ -0,0 +1,16 @@
+-- Indexes behind the session history statement (app/router/history.py).
+
+-- Keyset page of a session's queries: session_id = $1 AND (created_at, query_id) < cursor,
+-- ORDER BY created_at DESC, query_id DESC -> backward index scan, stops at LIMIT.
+CREATE INDEX IF NOT EXISTS idx_queries_session_created
+    ON queries (session_id, created_at, query_id);
+
+-- Top results of one query ordered by rank (the LATERAL join), and the
+-- (query_id, rank) keyset of /history/all. INCLUDE makes both index-only
+-- up to the keyframes lookup.
+CREATE INDEX IF NOT EXISTS idx_query_results_query_rank
+    ON query_results (query_id, rank) INCLUDE (keyframe_id, score);
+
+-- Messages of a session, in order.
+CREATE INDEX IF NOT EXISTS idx_messages_session_created
+    ON messages (session_id, created_at);
@@ -0,0 +1,6 @@
+-- Keyframe rows written from a projected search (fields=[...], batch runs) hold
+-- only part of the properties. `complete` marks rows written from the full
+-- property set; partial rows are replaced once by the first complete write
+-- (app/db/query_results.py UPSERT_KEYFRAME_SQL) and are never cached.
+-- Rows that predate the column are of unknown origin, so they start as partial.
+ALTER TABLE keyframes ADD COLUMN IF NOT EXISTS complete BOOLEAN NOT NULL DEFAULT FALSE;
@@ -0,0 +1,12 @@
+-- Shared result-cache version. POST /api/query-cache/invalidate bumps
+-- `generation` (and sets `version` when one is given); every API worker polls
+-- this row and clears its own in-process result cache when the generation
+-- changes (app/db/cache_version.py). NULL version = keep COLLECTION_VERSION.
+CREATE TABLE IF NOT EXISTS result_cache_version (
+    singleton  BOOLEAN PRIMARY KEY DEFAULT TRUE CHECK (singleton),
+    version    TEXT,
+    generation BIGINT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+INSERT INTO result_cache_version (singleton) VALUES (TRUE) ON CONFLICT DO NOTHING;
@@ -0,0 +1,123 @@
+# app/db/query_results.py
+import json
+import math
+import re
+import uuid
+from typing import Any, Dict, List, Optional, Tuple
+
+# keyframe_id is derived from the Weaviate frame_id, so the same frame always maps to one row
+KEYFRAME_NAMESPACE = uuid.uuid5(uuid.NAMESPACE_URL, "ai-challenge/keyframes")
+
+QUERY_RESULT_COLUMNS = ["query_id", "keyframe_id", "rank", "score"]
+
+# A row written from a projected (partial) property dict has complete = FALSE and
+# is replaced once by the first complete write; complete rows never change, which
+# is what the keyframe cache relies on (it only caches complete rows).
+UPSERT_KEYFRAME_SQL = """
+INSERT INTO keyframes (keyframe_id, video_id, frame_number, timestamp_ms, image_url, metadata, complete)
+VALUES ($1, $2, $3, $4, $5, $6, $7)
+ON CONFLICT (keyframe_id) DO UPDATE
+SET video_id = EXCLUDED.video_id,
+    frame_number = EXCLUDED.frame_number,
+    timestamp_ms = EXCLUDED.timestamp_ms,
+    image_url = EXCLUDED.image_url,
+    metadata = EXCLUDED.metadata,
+    complete = TRUE
+WHERE EXCLUDED.complete AND NOT keyframes.complete
+"""
+
+# Added to the properties per search (Weaviate explain output), not part of the keyframe
+PER_QUERY_PROPERTIES = ("explain_score",)
+
+_FRAME_ID_RE = re.compile(r"^(?P<video>.+)_F(?P<n>\d+)$")
+
+
+def keyframe_uuid(frame_id) -> uuid.UUID:
+    return uuid.uuid5(KEYFRAME_NAMESPACE, str(frame_id))
+
+
+def parse_int(value) -> Optional[int]:
+    """int from an int / float / numeric string ("12", "12.5" -> 12), None if it is not a finite number."""
+    if value is None or isinstance(value, bool):
+        return None
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return None
+    return int(number) if math.isfinite(number) else None
+
+
+def parse_timestamp_ms(prop: Dict[str, Any]) -> int:
+    """Timestamp in ms from `timestamp` ("HH:MM:SS" or seconds) or `pts_time` (seconds)."""
+    value = prop.get("timestamp", prop.get("pts_time"))
+    if value is None:
+        return 0
+    if isinstance(value, (int, float)):
+        return parse_int(value * 1000) or 0
+    try:
+        seconds = 0.0
+        for part in str(value).split(":"):
+            seconds = seconds * 60 + float(part)
+    except ValueError:
+        return 0
+    return parse_int(seconds * 1000) or 0
+
+
+def frame_position(frame_id, prop: Dict[str, Any]) -> Tuple[str, int]:
+    """(video_id, frame number) from the properties, falling back to the `<video>_F<n>` frame id."""
+    prop = prop if isinstance(prop, dict) else {}
+    match = _FRAME_ID_RE.match(str(frame_id))
+    video_id = prop.get("video_id") or (match.group("video") if match else "")
+    frame_number = parse_int(prop.get("frame_idx"))
+    if frame_number is None:
+        frame_number = parse_int(prop.get("n_keyframe"))
+    if frame_number is None and match:
+        frame_number = int(match.group("n"))
+    return str(video_id), frame_number or 0
+
+
+def keyframe_row(frame_id, prop: Dict[str, Any], complete: bool = True) -> tuple:
+    """Map a Weaviate keyframe property dict onto a `keyframes` row (`complete` = every property returned)."""
+    prop = prop if isinstance(prop, dict) else {}
+    video_id, frame_number = frame_position(frame_id, prop)
+    metadata = {k: v for k, v in prop.items() if k not in PER_QUERY_PROPERTIES}
+    return (
+        keyframe_uuid(frame_id),
+        video_id,
+        frame_number,
+        parse_timestamp_ms(prop),
+        prop.get("image_url") or "",
+        json.dumps(metadata, ensure_ascii=False, default=str),
+        complete,
+    )
+
+
+def build_rows(query_id, results: List[Dict[str, Any]], complete: bool = True):
+    """(keyframe rows, query_result rows) for a fused ranking; rank is 1-based."""
+    keyframes = {}
+    query_results = []
+    for rank, r in enumerate(results, start=1):
+        frame_id = r.get("frame_id")
+        if frame_id is None:
+            continue
+        row = keyframes.get(frame_id)
+        if row is None:
+            row = keyframes[frame_id] = keyframe_row(frame_id, r.get("property"), complete)
+        query_results.append((query_id, row[0], rank, float(r.get("total_score") or 0.0)))
+    return list(keyframes.values()), query_results
+
+
+async def save_rows(conn, keyframe_rows, result_rows):
+    """Batched upsert into `keyframes`, then one binary COPY into `query_results`."""
+    if not result_rows:
+        return 0
+    if keyframe_rows:
+        await conn.executemany(UPSERT_KEYFRAME_SQL, keyframe_rows)
+    await conn.copy_records_to_table("query_results", records=result_rows, columns=QUERY_RESULT_COLUMNS)
+    return len(result_rows)
+
+
+async def save_query_results(conn, query_id, results: List[Dict[str, Any]], complete: bool = True):
+    """Persist one query's ranked keyframes. Run inside a transaction."""
+    keyframe_rows, result_rows = build_rows(query_id, results, complete)
+    return await save_rows(conn, keyframe_rows, result_rows)
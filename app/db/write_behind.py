@@ -0,0 +1,251 @@
+# app/db/write_behind.py
+"""
+Write-behind logging of queries, user messages and ranked results.
+
+Handlers enqueue records and return; a single background task drains the queue
+in batches, one pooled connection and one transaction per flush. Queries are
+written before messages and results, and flushes run one at a time, so foreign
+keys always resolve. When a batch fails, its records are retried one
+transaction each so a single bad record does not take the rest with it.
+Sessions are checked when a query is logged (`session_exists`), since a
+foreign-key error at flush time can no longer reach the caller.
+"""
+import asyncio
+import logging
+import os
+import time
+from typing import Any, Dict, List
+
+from dotenv import load_dotenv
+
+from app.db import database
+from app.db.query_results import build_rows, save_rows
+from app.services import metrics
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+WRITE_BEHIND_QUEUE_SIZE = int(os.getenv("WRITE_BEHIND_QUEUE_SIZE", 10000))
+WRITE_BEHIND_BATCH_SIZE = int(os.getenv("WRITE_BEHIND_BATCH_SIZE", 500))
+WRITE_BEHIND_FLUSH_INTERVAL_MS = float(os.getenv("WRITE_BEHIND_FLUSH_INTERVAL_MS", 50))
+WRITE_BEHIND_ENQUEUE_TIMEOUT_MS = float(os.getenv("WRITE_BEHIND_ENQUEUE_TIMEOUT_MS", 200))
+KNOWN_SESSIONS_MAX = int(os.getenv("KNOWN_SESSIONS_MAX", 10000))
+
+INSERT_QUERY_SQL = """
+INSERT INTO queries (query_id, session_id, text_query, image_query, created_at)
+VALUES ($1, $2, $3, $4, $5)
+"""
+INSERT_MESSAGE_SQL = """
+INSERT INTO messages (session_id, query_id, role, content) VALUES ($1, $2, $3, $4)
+"""
+SESSION_EXISTS_SQL = "SELECT 1 FROM sessions WHERE session_id = $1"
+
+_STOP = object()
+
+
+class WriteBehindLogger:
+    def __init__(self, maxsize=WRITE_BEHIND_QUEUE_SIZE, batch_size=WRITE_BEHIND_BATCH_SIZE,
+                 flush_interval_ms=WRITE_BEHIND_FLUSH_INTERVAL_MS,
+                 enqueue_timeout_ms=WRITE_BEHIND_ENQUEUE_TIMEOUT_MS):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval_ms / 1000.0
+        self.enqueue_timeout = enqueue_timeout_ms / 1000.0
+        self._queue = asyncio.Queue(maxsize=maxsize)
+        self._task = None
+        # Sessions are never deleted, so a session seen once stays valid
+        self._known_sessions = set()
+        # metrics
+        self.enqueued = 0
+        self.dropped = 0
+        self.flushed_records = 0
+        self.flushes = 0
+        self.failed_flushes = 0
+        self.failed_records = 0
+        self.skipped_records = 0
+        self.last_flush_ms = 0.0
+        self.total_flush_ms = 0.0
+        self.max_flush_ms = 0.0
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+            logger.info("Write-behind logger started")
+
+    async def stop(self):
+        """Flush everything still queued, then stop the background task."""
+        if self._task is None:
+            return
+        await self._queue.put(_STOP)
+        await self._task
+        self._task = None
+        logger.info("Write-behind logger stopped")
+
+    async def session_exists(self, session) -> bool:
+        """Checked before a query is queued; hits only the database for sessions not seen yet."""
+        if session in self._known_sessions:
+            return True
+        async with database.get_async_pool().acquire() as conn:
+            found = await conn.fetchval(SESSION_EXISTS_SQL, session) is not None
+        if found:
+            if len(self._known_sessions) >= KNOWN_SESSIONS_MAX:
+                self._known_sessions.clear()
+            self._known_sessions.add(session)
+        return found
+
+    async def enqueue(self, kind: str, payload) -> bool:
+        """Queue a record; waits briefly when full, then drops it (counted in `dropped`)."""
+        try:
+            await asyncio.wait_for(self._queue.put((kind, payload)), timeout=self.enqueue_timeout)
+        except asyncio.TimeoutError:
+            self.dropped += 1
+            logger.warning(f"Write-behind queue full, dropped {kind} record")
+            return False
+        self.enqueued += 1
+        return True
+
+    async def _collect(self):
+        first = await self._queue.get()
+        if first is _STOP:
+            return None, True
+        # Let concurrent requests pile up, then take what is queued (up to batch_size)
+        await asyncio.sleep(self.flush_interval)
+        batch = [first]
+        while len(batch) < self.batch_size and not self._queue.empty():
+            item = self._queue.get_nowait()
+            if item is _STOP:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    async def _run(self):
+        while True:
+            batch, stopping = await self._collect()
+            if batch:
+                await self._flush(batch)
+            if stopping:
+                # Drain whatever was queued behind the stop marker
+                rest = []
+                while not self._queue.empty():
+                    item = self._queue.get_nowait()
+                    if item is not _STOP:
+                        rest.append(item)
+                if rest:
+                    await self._flush(rest)
+                return
+
+    def _prepare(self, batch: List[tuple]) -> List[tuple]:
+        """Build the rows of every record; a record that cannot be turned into rows is skipped."""
+        records = []
+        for kind, payload in batch:
+            try:
+                if kind == "results":
+                    query_id, ranked, complete = payload
+                    payload = build_rows(query_id, ranked, complete)
+                elif kind not in ("query", "message"):
+                    raise ValueError(f"unknown record kind {kind!r}")
+            except Exception as e:
+                self.skipped_records += 1
+                logger.warning(f"Write-behind skipped a malformed {kind} record: {e}")
+                continue
+            records.append((kind, payload))
+        return records
+
+    @staticmethod
+    async def _write(conn, records: List[tuple]):
+        """Write prepared records in one transaction (queries, then messages, then results)."""
+        queries, messages, keyframes, results = [], [], {}, []
+        for kind, payload in records:
+            if kind == "query":
+                queries.append(payload)
+            elif kind == "message":
+                messages.append(payload)
+            else:
+                keyframe_rows, result_rows = payload
+                for row in keyframe_rows:
+                    keyframes.setdefault(row[0], row)
+                results.extend(result_rows)
+        async with conn.transaction():
+            if queries:
+                await conn.executemany(INSERT_QUERY_SQL, queries)
+            if messages:
+                await conn.executemany(INSERT_MESSAGE_SQL, messages)
+            await save_rows(conn, list(keyframes.values()), results)
+
+    async def _write_each(self, conn, records: List[tuple]) -> int:
+        """Fallback after a failed batch: one transaction per record, so one bad record only loses itself."""
+        written = 0
+        for kind, payload in records:
+            try:
+                await self._write(conn, [(kind, payload)])
+            except Exception as e:
+                self.failed_records += 1
+                logger.warning(f"Write-behind could not write {kind} record: {e}")
+                continue
+            written += 1
+        return written
+
+    async def _flush(self, batch: List[tuple]):
+        records = self._prepare(batch)
+        if not records:
+            return
+        start = time.perf_counter()
+        try:
+            async with database.get_async_pool().acquire() as conn:
+                try:
+                    await self._write(conn, records)
+                    written = len(records)
+                except Exception as e:
+                    self.failed_flushes += 1
+                    logger.warning(f"Write-behind flush of {len(records)} records failed ({e}), retrying per record")
+                    written = await self._write_each(conn, records)
+        except Exception as e:
+            self.failed_flushes += 1
+            self.failed_records += len(records)
+            logger.exception(f"Write-behind flush of {len(records)} records failed: {e}")
+            return
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        metrics.observe("stage_duration_seconds", elapsed_ms / 1000, stage="db.flush")
+        metrics.observe("write_behind_batch_size", len(records), metrics.COUNT_BUCKETS)
+        self.flushes += 1
+        self.flushed_records += written
+        self.last_flush_ms = elapsed_ms
+        self.total_flush_ms += elapsed_ms
+        self.max_flush_ms = max(self.max_flush_ms, elapsed_ms)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "queue_depth": self._queue.qsize(),
+            "queue_max": self._queue.maxsize,
+            "enqueued": self.enqueued,
+            "dropped": self.dropped,
+            "flushes": self.flushes,
+            "failed_flushes": self.failed_flushes,
+            "failed_records": self.failed_records,
+            "skipped_records": self.skipped_records,
+            "flushed_records": self.flushed_records,
+            "last_flush_ms": self.last_flush_ms,
+            "avg_flush_ms": self.total_flush_ms / self.flushes if self.flushes else 0.0,
+            "max_flush_ms": self.max_flush_ms,
+        }
+
+
+_writer = None
+
+
+def get_writer() -> WriteBehindLogger:
+    global _writer
+    if _writer is None:
+        _writer = WriteBehindLogger()
+    return _writer
+
+
+async def start_writer():
+    get_writer().start()
+
+
+async def stop_writer():
+    global _writer
+    if _writer is not None:
+        await _writer.stop()
+        _writer = None
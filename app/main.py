@@ -1,8 +1,14 @@
+import asyncio
 import logging
-from fastapi import FastAPI
+import time
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from app.db import database
-from app.router import health, history, query, session
+from fastapi.responses import JSONResponse
+from app.db import cache_version, database, migrate, write_behind
+from app.ai.vectordatabase import vectorsearch
+from app.ai.model import batcher, embedding_cache
+from app.router import health, history, profiling, query, session
+from app.services import admission, retrieval_service, warmup, image_query, metrics, profiler
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -19,21 +25,65 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.middleware("http")
+async def server_timing_middleware(request: Request, call_next):
+    """Per-request stage timings -> Server-Timing header; request latency -> /api/metrics."""
+    token = metrics.start_request()
+    start = time.perf_counter()
+    try:
+        response = await call_next(request)
+    finally:
+        timings = metrics.end_request(token)
+    elapsed = time.perf_counter() - start
+    route = request.scope.get("route")
+    path = getattr(route, "path", "unmatched")
+    metrics.observe("http_request_duration_seconds", elapsed, route=path, method=request.method)
+    metrics.inc("http_requests_total", route=path, method=request.method, status=str(response.status_code))
+    response.headers["Server-Timing"] = metrics.server_timing_header(timings, elapsed * 1000)
+    return response
+
+@app.middleware("http")
+async def profiling_middleware(request: Request, call_next):
+    """`X-Profile: 1` + admin token on /api/query-img|text -> sampled profile, see /api/profiles."""
+    if not profiler.profile_requested(request):
+        return await call_next(request)
+    if not profiler.is_authorized(request.headers.get("x-admin-token")):
+        return JSONResponse(status_code=403, content={"detail": "Profiling requires a valid admin token"})
+    return await profiler.run_profiled(request, call_next)
+
 # -------------------------------
 # Startup / Shutdown Events
 # -------------------------------
 @app.on_event("startup")
 async def startup_event():
     logger.info("🚀 Initializing DB pool...")
-    await database.init_async_pool()
+    pool = await database.init_async_pool()
+    if migrate.DB_MIGRATE_ON_STARTUP:
+        logger.info("🔹 Applying DB migrations...")
+        await migrate.migrate_pool(pool)
+    await write_behind.start_writer()
+    cache_version.start_version_sync()
+    admission.configure_torch_threads()
+    # Models + Weaviate clients warm up in the background; /api/ready flips once done
+    app.state.warmup_task = asyncio.create_task(warmup.run_warmup())
 
 @app.on_event("shutdown")
 async def shutdown_event():
+    logger.info("🛑 Flushing write-behind queue...")
+    await write_behind.stop_writer()
+    await cache_version.stop_version_sync()
     logger.info("🛑 Closing DB pool...")
     await database.close_async_pool()
+    await image_query.close_image_query()
+    retrieval_service.shutdown_executor()
+    batcher.close_batchers()
+    embedding_cache.close_embedding_cache()
+    logger.info("🛑 Closing Weaviate clients...")
+    await asyncio.to_thread(vectorsearch.close_clients)
 
 # Routers
 app.include_router(session.router, prefix="/api", tags=["Sessions"])
 app.include_router(query.router, prefix="/api", tags=["Queries"])
 app.include_router(history.router, prefix="/api", tags=["History"])
 app.include_router(health.router, prefix="/api", tags=["Health"])
+app.include_router(profiling.router, prefix="/api", tags=["Profiling"])
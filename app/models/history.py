@@ -5,6 +5,7 @@ from uuid import UUID
 from datetime import datetime
 
 class HistoryResult(BaseModel):
+    query_id: Optional[UUID] = None
     keyframe_id: UUID
     video_id: str          # đổi từ UUID sang str
     frame_number: int
@@ -19,12 +20,17 @@ class HistoryItem(BaseModel):
     session_id: UUID
     text_query: Optional[str]
     image_query: Optional[str]
-    od_json: Optional[str]
-    ocr_text: Optional[str]
-    asr_text: Optional[str]
+    od_json: Optional[str] = None
+    ocr_text: Optional[str] = None
+    asr_text: Optional[str] = None
     query_time: datetime
     results: List[HistoryResult] = []
 
 class HistoryResponse(BaseModel):
     session_id: UUID
     queries: List[HistoryItem]
+    next_cursor: Optional[str] = None   # pass back as ?cursor= for the next page
+
+class HistoryPage(BaseModel):
+    results: List[HistoryResult]
+    next_cursor: Optional[str] = None
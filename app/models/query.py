@@ -1,10 +1,36 @@
-from pydantic import BaseModel
-from typing import List, Optional, Dict, Any
+from pydantic import BaseModel, Field
+from typing import List, Optional, Dict, Any, Literal
 from uuid import UUID
 
 class QueryRequest(BaseModel):
     text_query: Optional[str] = None
     image_query: Optional[str] = None
+    # Score fusion (see app/services/fusion.py); defaults keep the raw-sum ranking
+    fusion: Literal["sum", "minmax", "zscore", "rrf"] = "sum"
+    image_weight: float = 1.0
+    text_weight: float = 1.0
+    top_k: Optional[int] = Field(None, ge=1, le=1000)   # None = return every fused candidate
+    # Property projection: None = DEFAULT_RETURN_PROPERTIES (unset: everything), ["*"] = everything
+    fields: Optional[List[str]] = None
+    explain: bool = False         # include Weaviate explain_score per result
+    # Local re-ranking against stored CLIP vectors (see app/services/rerank.py)
+    rerank: bool = False
+    rerank_queries: Optional[List[str]] = None   # extra phrasings for query expansion
+    rerank_aggregate: Literal["mean", "max"] = "mean"
+    rerank_weight: Optional[float] = Field(None, ge=0, le=1)   # None = RERANK_WEIGHT
+
+class TemporalQueryRequest(BaseModel):
+    # Ordered sub-queries: events[0] happens first, events[-1] last, all in the same video
+    events: List[QueryRequest] = Field(..., min_length=1, max_length=8)
+    max_gap_seconds: float = Field(30.0, gt=0)   # max time between consecutive events
+    min_gap_seconds: float = Field(0.0, ge=0)
+    top_k: int = Field(100, ge=1, le=1000)       # number of sequences returned
+
+class BatchQueryRequest(BaseModel):
+    # Evaluation / submission runs: many queries in one request, streamed back as they finish
+    queries: List[QueryRequest] = Field(..., min_length=1, max_length=1000)
+    top_k: int = Field(100, ge=1, le=1000)                   # submission rows per query
+    concurrency: Optional[int] = Field(None, ge=1, le=32)    # None = BATCH_QUERY_CONCURRENCY
 
 class QueryResult(BaseModel):
     keyframe_id: UUID
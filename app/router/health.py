@@ -1,5 +1,15 @@
 from fastapi import APIRouter
+from fastapi.responses import JSONResponse, PlainTextResponse
 from app.db import database
+from app.db.write_behind import get_writer
+from app.db.keyframe_cache import get_keyframe_cache
+from app.ai.vectordatabase import vectorsearch
+from app.ai.model.embedding_cache import get_embedding_cache
+from app.services.result_cache import get_result_cache
+from app.services import warmup
+from app.services.admission import get_admission_controller
+from app.services import metrics
+import asyncio
 import logging
 
 router = APIRouter()
@@ -7,12 +17,68 @@ logger = logging.getLogger(__name__)
 
 @router.get("/health")
 async def health_check():
+    weaviate_status = await asyncio.to_thread(vectorsearch.check_clients)
     try:
         if hasattr(database, "async_pool") and database.async_pool:
             async with database.async_pool.acquire() as conn:
                 await conn.fetchval("SELECT 1")
-            return {"status": "healthy", "database": "connected"}
-        return {"status": "unhealthy", "database": "disconnected"}
+            return {"status": "healthy", "database": "connected", "weaviate": weaviate_status}
+        return {"status": "unhealthy", "database": "disconnected", "weaviate": weaviate_status}
     except Exception as e:
         logger.error(f"Health check failed: {e}")
-        return {"status": "unhealthy", "database": "error", "error": str(e)}
\ No newline at end of file
+        return {"status": "unhealthy", "database": "error", "error": str(e), "weaviate": weaviate_status}
+
+@router.get("/ready")
+async def readiness_check():
+    """Readiness probe: 200 only after warm-up, with the DB pool up and every vector search client healthy."""
+    status = warmup.status()
+    status["database"] = database._async_pool is not None
+    status["weaviate"] = await asyncio.to_thread(vectorsearch.check_clients)
+    if status["ready"] and status["database"] and all(status["weaviate"].values()):
+        return status
+    return JSONResponse(status_code=503, content=status)
+
+
+@router.get("/health/cache")
+async def cache_stats():
+    """Hit/miss counters of the query-embedding, search-result and keyframe caches."""
+    return {
+        "embedding_cache": get_embedding_cache().stats(),
+        "result_cache": get_result_cache().stats(),
+        "keyframe_cache": get_keyframe_cache().stats(),
+    }
+
+
+@router.get("/health/write-behind")
+async def write_behind_stats():
+    """Queue depth and flush latency of the write-behind query logger."""
+    return get_writer().stats()
+
+
+@router.get("/health/admission")
+async def admission_stats():
+    """Inference slots in use, queue depth and rejections of the admission controller."""
+    return get_admission_controller().stats()
+
+
+def _gauges(prefix, stats):
+    """Numeric entries of a stats() dict as unlabelled gauges named <prefix>_<key>."""
+    return {
+        f"{prefix}_{key}": {(): value}
+        for key, value in stats.items()
+        if isinstance(value, (int, float))
+    }
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics():
+    """Prometheus scrape endpoint: stage histograms, counters, and cache / queue gauges."""
+    gauges = {}
+    gauges.update(_gauges("embedding_cache", get_embedding_cache().stats()))
+    gauges.update(_gauges("result_cache", get_result_cache().stats()))
+    gauges.update(_gauges("keyframe_cache", get_keyframe_cache().stats()))
+    gauges.update(_gauges("admission", get_admission_controller().stats()))
+    gauges.update(_gauges("write_behind", get_writer().stats()))
+    return PlainTextResponse(
+        metrics.get_registry().render(gauges), media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
@@ -1,119 +1,240 @@
 from fastapi import APIRouter, Depends, Query, HTTPException
-from pydantic import BaseModel
-from typing import List, Dict, Any
+from fastapi.responses import StreamingResponse
+from typing import Optional, Literal
 from uuid import UUID
+from datetime import datetime
+import base64
 import json
 import logging
 
 from app.db import database
+from app.db.keyframe_cache import Keyframe, get_keyframe_cache, parse_metadata
+from app.models.history import HistoryResult, HistoryItem, HistoryResponse, HistoryPage
+from app.services.compact import CompactJSONResponse, compact_history_results
+from app.services import metrics
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
+HISTORY_MAX_PAGE_SIZE = 1000          # rows per /history/all page
+HISTORY_MAX_QUERIES_PER_PAGE = 100    # queries per /history page
+HISTORY_MAX_RESULTS_PER_QUERY = 1000  # results per query in /history
+EXPORT_PREFETCH = 1000                # rows per server-side cursor fetch
 
-class HistoryResult(BaseModel):
-    keyframe_id: UUID
-    video_id: str
-    frame_number: int
-    timestamp_ms: int
-    image_url: str
-    metadata: Dict[str, Any]
-    rank: int
-    score: float
 
+def encode_cursor(values: dict) -> str:
+    """Opaque keyset cursor (url-safe base64 of JSON)."""
+    raw = json.dumps(values, default=str).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii")
 
-def parse_metadata(meta):
-    """Parse metadata safely from string to dict."""
-    if isinstance(meta, str):
-        try:
-            return json.loads(meta)
-        except json.JSONDecodeError:
-            logger.warning(f"Invalid metadata JSON: {meta}")
-            return {}
-    return meta or {}
+
+def decode_cursor(cursor: str) -> dict:
+    try:
+        return json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+    except (ValueError, UnicodeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def to_history_result(r, keyframe: Keyframe) -> HistoryResult:
+    return HistoryResult(
+        query_id=r["query_id"],
+        keyframe_id=r["keyframe_id"],
+        video_id=keyframe.video_id,
+        frame_number=keyframe.frame_number,
+        timestamp_ms=keyframe.timestamp_ms,
+        image_url=keyframe.image_url,
+        metadata=keyframe.metadata,
+        rank=r["rank"],
+        score=r["score"],
+    )
+
+
+async def load_keyframes(db, rows):
+    """keyframe_id -> Keyframe for the result rows, served from the keyframe cache."""
+    with metrics.timer("db.keyframes"):
+        return await get_keyframe_cache().get_many(
+            db, (r["keyframe_id"] for r in rows if r["keyframe_id"] is not None)
+        )
 
 
-@router.get("/history", response_model=List[HistoryResult])
+# One round-trip: a keyset page of the session's queries, each joined (LATERAL)
+# with its top results ordered by rank. Keyframe columns are not joined here:
+# they come from the keyframe cache (one extra query only for uncached frames). The SQL text is constant, so asyncpg's
+# per-connection statement cache prepares it once and re-executes it by name.
+# The first page uses a sentinel cursor instead of `$2 IS NULL OR ...`, which
+# keeps the row comparison an index condition on idx_queries_session_created
+# (app/db/migrations/0002_history_indexes.sql) in the generic plan too.
+SESSION_HISTORY_SQL = """
+WITH page AS (
+    SELECT query_id, session_id, text_query, image_query, created_at
+    FROM queries
+    WHERE session_id = $1
+      AND (created_at, query_id) < (COALESCE($2::timestamptz, 'infinity'::timestamptz),
+                                    COALESCE($3::uuid, 'ffffffff-ffff-ffff-ffff-ffffffffffff'::uuid))
+    ORDER BY created_at DESC, query_id DESC
+    LIMIT $4
+)
+SELECT p.query_id, p.session_id, p.text_query, p.image_query, p.created_at,
+       r.keyframe_id, r.rank, r.score
+FROM page p
+LEFT JOIN LATERAL (
+    SELECT qr.keyframe_id, qr.rank, qr.score
+    FROM query_results qr
+    WHERE qr.query_id = p.query_id
+    ORDER BY qr.rank ASC
+    LIMIT $5
+) r ON TRUE
+ORDER BY p.created_at DESC, p.query_id DESC, r.rank ASC
+"""
+
+
+# Keyset page over all results. As above, the first page uses a sentinel cursor
+# (all-zero uuid, rank 0: before every row in ascending order) so the row
+# comparison stays an index range on idx_query_results_query_rank.
+ALL_HISTORY_SQL = """
+SELECT qr.query_id, qr.keyframe_id, qr.rank, qr.score
+FROM query_results qr
+WHERE (qr.query_id, qr.rank) > (COALESCE($1::uuid, '00000000-0000-0000-0000-000000000000'::uuid),
+                                COALESCE($2::int, 0))
+ORDER BY qr.query_id ASC, qr.rank ASC
+LIMIT $3
+"""
+
+
+@router.get("/history", response_model=HistoryResponse)
 async def get_history(
     session: UUID = Query(..., description="Session ID"),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    limit: int = Query(20, ge=1, le=HISTORY_MAX_QUERIES_PER_PAGE, description="Queries per page"),
+    results_per_query: int = Query(300, ge=1, le=HISTORY_MAX_RESULTS_PER_QUERY),
+    format: Literal["full", "compact"] = Query("full", description="compact = columnar arrays"),
     db=Depends(database.get_db),
 ):
-    """Get search history for a specific session."""
-    try:
-        # Lấy danh sách query_id theo session
-        queries = await db.fetch(
-            "SELECT query_id FROM queries WHERE session_id=$1 ORDER BY created_at DESC",
-            session,
-        )
-        if not queries:
-            return []
-
-        query_ids = [q["query_id"] for q in queries]
-
-        # Lấy kết quả từ query_results, join keyframes để lấy thêm thông tin
-        results = await db.fetch(
-            """
-            SELECT qr.keyframe_id, k.video_id, k.frame_number, k.timestamp_ms,
-                   k.image_url, k.metadata, qr.rank, qr.score
-            FROM query_results qr
-            JOIN keyframes k ON qr.keyframe_id = k.keyframe_id
-            WHERE qr.query_id = ANY($1::uuid[])
-            ORDER BY qr.rank ASC
-            """,
-            query_ids,
-        )
+    """Get search history for a specific session, grouped per query (newest first)."""
+    after_time, after_id = None, None
+    if cursor:
+        values = decode_cursor(cursor)
+        try:
+            after_time = datetime.fromisoformat(values["created_at"])
+            after_id = UUID(values["query_id"])
+        except (KeyError, TypeError, ValueError):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
 
-        parsed_results = [
-            HistoryResult(
-                keyframe_id=r["keyframe_id"],
-                video_id=r["video_id"],
-                frame_number=r["frame_number"],
-                timestamp_ms=r["timestamp_ms"],
-                image_url=r["image_url"],
-                metadata=parse_metadata(r["metadata"]),
-                rank=r["rank"],
-                score=r["score"],
-            )
-            for r in results
-        ]
-        return parsed_results
+    try:
+        with metrics.timer("db.history"):
+            rows = await db.fetch(SESSION_HISTORY_SQL, session, after_time, after_id, limit, results_per_query)
+        keyframes = await load_keyframes(db, rows)
+
+        items = {}
+        for r in rows:
+            item = items.get(r["query_id"])
+            if item is None:
+                item = items[r["query_id"]] = HistoryItem(
+                    query_id=r["query_id"],
+                    session_id=r["session_id"],
+                    text_query=r["text_query"],
+                    image_query=r["image_query"],
+                    query_time=r["created_at"],
+                )
+            keyframe = keyframes.get(r["keyframe_id"])
+            if keyframe is not None:
+                item.results.append(to_history_result(r, keyframe))
+
+        queries = list(items.values())
+        next_cursor = None
+        if len(queries) == limit:
+            last = queries[-1]
+            next_cursor = encode_cursor({"created_at": last.query_time.isoformat(), "query_id": str(last.query_id)})
+        if format == "compact":
+            return CompactJSONResponse({
+                "session_id": session,
+                "next_cursor": next_cursor,
+                "queries": [
+                    {
+                        **item.model_dump(exclude={"results"}),
+                        "results": compact_history_results(item.results),
+                    }
+                    for item in queries
+                ],
+            })
+        return HistoryResponse(session_id=session, queries=queries, next_cursor=next_cursor)
 
     except Exception as e:
         logger.exception(f"Error in /history: {e}")
         raise HTTPException(status_code=500, detail="Failed to fetch history")
 
 
-@router.get("/history/all", response_model=List[HistoryResult])
+@router.get("/history/all", response_model=HistoryPage)
 async def get_all_history(
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    limit: int = Query(200, ge=1, le=HISTORY_MAX_PAGE_SIZE, description="Rows per page"),
+    format: Literal["full", "compact"] = Query("full", description="compact = columnar arrays"),
     db=Depends(database.get_db),
 ):
-    """Get all search history."""
+    """Get all search history, keyset-paginated on (query_id, rank)."""
+    after_query, after_rank = None, None
+    if cursor:
+        values = decode_cursor(cursor)
+        try:
+            after_query = UUID(values["query_id"])
+            after_rank = int(values["rank"])
+        except (KeyError, TypeError, ValueError):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+
     try:
         results = await db.fetch(
-            """
-            SELECT qr.keyframe_id, k.video_id, k.frame_number, k.timestamp_ms,
-                   k.image_url, k.metadata, qr.rank, qr.score
-            FROM query_results qr
-            JOIN keyframes k ON qr.keyframe_id = k.keyframe_id
-            ORDER BY qr.rank ASC
-            """
+            ALL_HISTORY_SQL,
+            after_query,
+            after_rank,
+            limit,
         )
 
+        keyframes = await load_keyframes(db, results)
         parsed_results = [
-            HistoryResult(
-                keyframe_id=r["keyframe_id"],
-                video_id=r["video_id"],
-                frame_number=r["frame_number"],
-                timestamp_ms=r["timestamp_ms"],
-                image_url=r["image_url"],
-                metadata=parse_metadata(r["metadata"]),
-                rank=r["rank"],
-                score=r["score"],
-            )
-            for r in results
+            to_history_result(r, keyframes[r["keyframe_id"]]) for r in results if r["keyframe_id"] in keyframes
         ]
-        return parsed_results
+        next_cursor = None
+        if len(results) == limit:
+            last = results[-1]
+            next_cursor = encode_cursor({"query_id": str(last["query_id"]), "rank": last["rank"]})
+        if format == "compact":
+            return CompactJSONResponse(
+                {"results": compact_history_results(parsed_results), "next_cursor": next_cursor}
+            )
+        return HistoryPage(results=parsed_results, next_cursor=next_cursor)
 
     except Exception as e:
         logger.exception(f"Error in /history/all: {e}")
         raise HTTPException(status_code=500, detail="Failed to fetch all history")
+
+
+async def _export_rows(session: Optional[UUID]):
+    # The request-scoped connection is released before the body streams,
+    # so the export holds its own connection for the server-side cursor.
+    pool = database.get_async_pool()
+    async with pool.acquire() as conn:
+        async with conn.transaction():
+            async for r in conn.cursor(
+                """
+                SELECT qr.query_id, qr.keyframe_id, k.video_id, k.frame_number, k.timestamp_ms,
+                       k.image_url, k.metadata, qr.rank, qr.score
+                FROM query_results qr
+                JOIN keyframes k ON qr.keyframe_id = k.keyframe_id
+                WHERE $1::uuid IS NULL
+                   OR qr.query_id IN (SELECT query_id FROM queries WHERE session_id = $1)
+                ORDER BY qr.query_id ASC, qr.rank ASC
+                """,
+                session,
+                prefetch=EXPORT_PREFETCH,
+            ):
+                row = dict(r)
+                row["metadata"] = parse_metadata(row["metadata"])
+                yield json.dumps(row, ensure_ascii=False, default=str) + "\n"
+
+
+@router.get("/history/export")
+async def export_history(
+    session: Optional[UUID] = Query(None, description="Only this session (default: everything)"),
+):
+    """Stream the full history as NDJSON without loading it into memory."""
+    return StreamingResponse(_export_rows(session), media_type="application/x-ndjson")
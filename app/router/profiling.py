@@ -0,0 +1,45 @@
+from fastapi import APIRouter, Header, HTTPException
+from fastapi.responses import PlainTextResponse
+from typing import Optional
+from app.services import profiler
+import logging
+
+router = APIRouter()
+logger = logging.getLogger(__name__)
+
+
+def require_admin(token: Optional[str]):
+    if not profiler.is_authorized(token):
+        raise HTTPException(status_code=403, detail="Profiling requires a valid admin token")
+
+
+def get_profile_or_404(profile_id: str):
+    profile = profiler.load_profile(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return profile
+
+
+@router.get("/profiles")
+async def list_profiles(x_admin_token: Optional[str] = Header(None)):
+    """Stored request profiles, newest first."""
+    require_admin(x_admin_token)
+    return {"profiles": profiler.list_profiles(), "max_files": profiler.PROFILE_MAX_FILES}
+
+
+@router.get("/profiles/{profile_id}")
+async def get_profile(profile_id: str, x_admin_token: Optional[str] = Header(None)):
+    """Full profile: stage spans + collapsed stacks."""
+    require_admin(x_admin_token)
+    return get_profile_or_404(profile_id)
+
+
+@router.get("/profiles/{profile_id}/collapsed")
+async def get_profile_collapsed(profile_id: str, x_admin_token: Optional[str] = Header(None)):
+    """Collapsed stacks only, for flamegraph.pl / speedscope."""
+    require_admin(x_admin_token)
+    profile = get_profile_or_404(profile_id)
+    return PlainTextResponse(
+        profile["collapsed"] + "\n",
+        headers={"Content-Disposition": f'attachment; filename="{profile_id}.folded"'},
+    )
@@ -1,107 +1,129 @@
-from fastapi import APIRouter, Depends, Query, HTTPException
+from fastapi import APIRouter, Query, Header, HTTPException, File, Form, UploadFile
+from fastapi.responses import StreamingResponse
 from uuid import UUID
-from app.db import database
-from app.models.query import QueryRequest
+from datetime import datetime, timezone
+from typing import Optional, Literal
+from app.db import cache_version
+from app.db.write_behind import get_writer
+from app.models.query import QueryRequest, TemporalQueryRequest, BatchQueryRequest
+import asyncio
+import json
 import logging
+import time
+import uuid
 
-# 🔥 Import your agent
-from app.ai.tools.image_retrieval import image_retrieval
-from app.ai.tools.text_retrieval import text_retrieval
+from app.services import retrieval_service, fusion, rerank, temporal, image_query, metrics, batch_query, profiler
+from app.services.admission import AdmissionRejected, get_admission_controller
+from app.ai.tools.image_retrieval import image_example_retrieval
+from app.services.compact import CompactJSONResponse, compact_search_results
+from app.services.result_cache import get_result_cache
+from app.ai.vectordatabase import vectorsearch
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
-def safe_get_list(d, key):
-    v = d.get(key, [])
-    return v if isinstance(v, list) else []
-
-def safe_get_score_list(d):
-    """Extract scores from retrieval results (already packed by _pack_results)."""
-    scores = d.get("score", [])
-    props = d.get("property", [])
-
-    # đảm bảo scores là list
-    if not isinstance(scores, list):
-        scores = [scores]
-
-    # pad nếu thiếu
-    while len(scores) < len(props):
-        scores.append(None)
-
-    return scores
-
-def get_search_results(query_data: QueryRequest, query_type="both"):
-    text_query = query_data.text_query
-    image_query = query_data.image_query
-
-    result_1 = image_retrieval(image_query=image_query) if query_type in ["image", "both"] and image_query else {"property": [], "score": []}
-    result_2 = text_retrieval(query_text=text_query) if query_type in ["text", "both"] and text_query else {"property": [], "score": []}
-
-    prop1 = result_1.get("property", [])
-    dist1 = safe_get_score_list(result_1)
-
-    prop2 = result_2.get("property", [])
-    dist2 = safe_get_score_list(result_2)
-
-    results = []
-
-    def extract_frame_id(prop):
-        if isinstance(prop, dict):
-            for k in ["frame_id", "id", "keyframe_id"]:
-                if k in prop:
-                    return prop[k]
-        elif isinstance(prop, (list, tuple)) and prop:
-            return prop[0]
-        return None
-
-    # gom image
-    for prop, dist in zip(prop1, dist1):
-        frame_id = extract_frame_id(prop)
-        results.append({"frame_id": frame_id, "property": prop, "score": dist, "source": "image"})
-
-    # gom text
-    for prop, dist in zip(prop2, dist2):
-        frame_id = extract_frame_id(prop)
-        results.append({"frame_id": frame_id, "property": prop, "score": dist, "source": "text"})
-
-    # merge
-    unique_results = {}
-    for r in results:
-        fid = r["frame_id"]
-        if fid not in unique_results:
-            unique_results[fid] = {
-                "frame_id": fid,
-                "property": r["property"],
-                "image_score": 0.0,
-                "text_score": 0.0,
-                "total_score": 0.0
-            }
-        if r["source"] == "image":
-            unique_results[fid]["image_score"] = r["score"] or 0.0
-        elif r["source"] == "text":
-            unique_results[fid]["text_score"] = r["score"] or 0.0
-
-        if not unique_results[fid]["property"]:
-            unique_results[fid]["property"] = r["property"]
-
-    # compute + sort
-    for r in unique_results.values():
-        r["total_score"] = (r["image_score"] or 0.0) + (r["text_score"] or 0.0)
-
-    return sorted(unique_results.values(), key=lambda x: x["total_score"], reverse=True)
-
-async def insert_query_and_log(db, session: UUID, query_data: QueryRequest):
-    """Insert query and log user messages safely, return query_id."""
-    insert_query = """
-    INSERT INTO queries (session_id, text_query, image_query)
-    VALUES ($1, $2, $3)
-    RETURNING query_id
-    """
-    query_id = await db.fetchval(
-        insert_query,
-        session,
+def result_cache_key(query_data: QueryRequest, query_type="both"):
+    """Everything that changes the fused ranking goes into the result-cache key."""
+    return (
+        query_type,
         query_data.text_query,
         query_data.image_query,
+        retrieval_service.retrieval_top_k(query_data),
+        vectorsearch.IMAGE_HYBRID_ALPHA,
+        vectorsearch.TEXT_HYBRID_ALPHA,
+        query_data.fusion,
+        query_data.image_weight,
+        query_data.text_weight,
+        query_data.top_k,
+        tuple(vectorsearch.resolve_return_properties(query_data.fields) or ("*",)),
+        query_data.explain,
+        query_data.rerank,
+        tuple(query_data.rerank_queries or ()),
+        query_data.rerank_aggregate,
+        query_data.rerank_weight,
+        vectorsearch.VECTOR_BACKEND,
+        vectorsearch.get_image_collection_name(),
+        vectorsearch.get_text_collection_name(),
+    )
+
+def _elapsed_ms(start):
+    return round((time.perf_counter() - start) * 1000, 3)
+
+async def get_search_results(query_data: QueryRequest, query_type="both", timings=None):
+    """Fused (and optionally re-ranked) results; per-stage milliseconds go into `timings`."""
+    timings = {} if timings is None else timings
+    cache = get_result_cache()
+    with metrics.timer("result_cache") as t:
+        key = result_cache_key(query_data, query_type)
+        cached = cache.get(key)
+    if cached is not None:
+        timings["cache"] = t.ms
+        return cached
+
+    # Cache misses need an inference slot (429/503 with Retry-After when saturated).
+    # Image and text retrieval then run concurrently in the retrieval thread pool,
+    # so latency is max(image, text) and the event loop stays free.
+    start = time.perf_counter()
+    async with get_admission_controller().slot():
+        timings["admission"] = _elapsed_ms(start)
+        metrics.record_stage("admission_wait", timings["admission"] / 1000)
+        with metrics.timer("retrieval") as t:
+            result_1, result_2 = await retrieval_service.retrieve(query_data, query_type)
+        timings["retrieval"] = t.ms
+        results = await rank_for_request(query_data, result_1, result_2, timings)
+    cache.put(key, results)
+    return results
+
+def fuse_for_request(query_data: QueryRequest, result_1, result_2):
+    return fusion.fuse(
+        result_1,
+        result_2,
+        method=query_data.fusion,
+        image_weight=query_data.image_weight,
+        text_weight=query_data.text_weight,
+        # The re-rank stage sees every candidate and applies top_k itself
+        top_k=None if query_data.rerank else query_data.top_k,
+    )
+
+async def rank_for_request(query_data: QueryRequest, result_1, result_2, timings=None):
+    """Fusion, then the optional local re-rank stage (CLIP encode + mmap reads run in the pool)."""
+    timings = {} if timings is None else timings
+    with metrics.timer("fusion") as t:
+        results = fuse_for_request(query_data, result_1, result_2)
+    timings["fusion"] = t.ms
+    if not query_data.rerank:
+        return results
+
+    query_texts = [query_data.image_query or query_data.text_query, *(query_data.rerank_queries or [])]
+    with metrics.timer("rerank") as t:
+        results = await retrieval_service.run_in_pool(
+            rerank.rerank,
+            results,
+            query_texts,
+            weight=rerank.RERANK_WEIGHT if query_data.rerank_weight is None else query_data.rerank_weight,
+            aggregate=query_data.rerank_aggregate,
+            top_k=query_data.top_k,
+        )
+    timings["rerank"] = t.ms
+    return results
+
+def query_response(query_id, session: UUID, search_results, format: str = "full", timings=None):
+    body = {"query_id": query_id, "session_id": session}
+    if timings:
+        body["timings_ms"] = timings
+    if format == "compact":
+        return CompactJSONResponse({**body, "results": compact_search_results(search_results)})
+    return {**body, "results": search_results}
+
+async def log_query(session: UUID, query_data: QueryRequest) -> UUID:
+    """Queue the query and user message for write-behind logging, return the client-side query_id."""
+    writer = get_writer()
+    if not await writer.session_exists(session):
+        raise HTTPException(status_code=404, detail="Session not found")
+    query_id = uuid.uuid4()
+    await writer.enqueue(
+        "query",
+        (query_id, session, query_data.text_query, query_data.image_query, datetime.now(timezone.utc)),
     )
 
     # Log user message if present
@@ -112,29 +134,34 @@ async def insert_query_and_log(db, session: UUID, query_data: QueryRequest):
         user_content.append(f"Image: {query_data.image_query}")
 
     if user_content:
-        await db.execute(
-            "INSERT INTO messages (session_id, query_id, role, content) VALUES ($1, $2, 'user', $3)",
-            session,
-            query_id,
-            " | ".join(user_content),
-        )
+        await writer.enqueue("message", (session, query_id, "user", " | ".join(user_content)))
 
     return query_id
 
 
+async def log_results(query_id, query_data: QueryRequest, results):
+    """Queue the ranked results; their keyframe rows are complete only if every property was returned."""
+    complete = vectorsearch.resolve_return_properties(query_data.fields) is None
+    await get_writer().enqueue("results", (query_id, results, complete))
+
+
 @router.post("/query-img")
 async def create_query_img(
     query_data: QueryRequest,
     session: UUID = Query(..., description="Session ID"),
-    db=Depends(database.get_db),
+    format: Literal["full", "compact"] = Query("full", description="compact = columnar arrays"),
 ):
     """Create a new query and perform search using text+image."""
     try:
-        async with db.transaction():
-            query_id = await insert_query_and_log(db, session, query_data)
-            search_results = get_search_results(query_data, query_type="both")
+        query_id = await log_query(session, query_data)
+        timings = {}
+        search_results = await get_search_results(query_data, query_type="both", timings=timings)
+        await log_results(query_id, query_data, search_results)
 
-            return {"query_id": query_id, "session_id": session, "results": search_results}
+        # Stage timings are returned when the re-rank stage is requested
+        return query_response(query_id, session, search_results, format, timings if query_data.rerank else None)
+    except HTTPException:
+        raise
     except Exception as e:
         logger.exception(f"Error in /query-img: {e}")
         raise HTTPException(status_code=500, detail="Failed to create query")
@@ -144,15 +171,360 @@ async def create_query_img(
 async def create_query_text(
     query_data: QueryRequest,
     session: UUID = Query(..., description="Session ID"),
-    db=Depends(database.get_db),
+    format: Literal["full", "compact"] = Query("full", description="compact = columnar arrays"),
 ):
     """Create a new query and perform search using text only."""
     try:
-        async with db.transaction():
-            query_id = await insert_query_and_log(db, session, query_data)
-            search_results = get_search_results(query_data, query_type="both")
+        query_id = await log_query(session, query_data)
+        timings = {}
+        search_results = await get_search_results(query_data, query_type="both", timings=timings)
+        await log_results(query_id, query_data, search_results)
 
-            return {"query_id": query_id, "session_id": session, "results": search_results}
+        # Stage timings are returned when the re-rank stage is requested
+        return query_response(query_id, session, search_results, format, timings if query_data.rerank else None)
+    except HTTPException:
+        raise
     except Exception as e:
         logger.exception(f"Error in /query-text: {e}")
         raise HTTPException(status_code=500, detail="Failed to create query")
+
+
+@router.post("/query-by-image")
+async def create_query_by_image(
+    session: UUID = Query(..., description="Session ID"),
+    file: Optional[UploadFile] = File(None, description="Example image"),
+    image_url: Optional[str] = Form(None, description="Or: URL of the example image"),
+    text_query: Optional[str] = Form(None, description="Optional text query fused with the image hits"),
+    fusion_method: Literal["sum", "minmax", "zscore", "rrf"] = Form("sum"),
+    top_k: Optional[int] = Form(None, ge=1, le=1000),
+    format: Literal["full", "compact"] = Query("full", description="compact = columnar arrays"),
+):
+    """Query-by-example: keyframes closest to an uploaded image or image URL (CLIP image tower)."""
+    if (file is None) == (image_url is None):
+        raise HTTPException(status_code=400, detail="Provide exactly one of file or image_url")
+    # Before any download or admission slot: an unknown session must not hold either
+    if not await get_writer().session_exists(session):
+        raise HTTPException(status_code=404, detail="Session not found")
+    query_data = QueryRequest(text_query=text_query, fusion=fusion_method, top_k=top_k)
+    try:
+        data = await image_query.read_upload(file) if file is not None else await image_query.fetch_image(image_url)
+        async with get_admission_controller().slot():
+            digest, embedding = await image_query.embed_image_bytes(data)
+            image_result, text_result = await asyncio.gather(
+                retrieval_service.run_in_pool(
+                    image_example_retrieval,
+                    embedding,
+                    top_k=retrieval_service.RETRIEVAL_TOP_K,
+                    return_properties=vectorsearch.resolve_return_properties(None),
+                ),
+                retrieval_service.run_text_retrieval(query_data),
+            )
+        # Logged image_query is the URL, or the content hash for uploads
+        query_data.image_query = image_url or f"sha256:{digest}"
+        query_id = await log_query(session, query_data)
+        search_results = fuse_for_request(query_data, image_result, text_result)
+        await log_results(query_id, query_data, search_results)
+        return query_response(query_id, session, search_results, format)
+    except image_query.ImageQueryError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.exception(f"Error in /query-by-image: {e}")
+        raise HTTPException(status_code=500, detail="Failed to create query")
+
+
+@router.post("/query-temporal")
+async def create_query_temporal(request: TemporalQueryRequest):
+    """Ordered multi-event search: sequences of hits in the same video, each within max_gap_seconds of the previous."""
+    if request.min_gap_seconds > request.max_gap_seconds:
+        raise HTTPException(status_code=400, detail="min_gap_seconds must not exceed max_gap_seconds")
+    try:
+        start = time.perf_counter()
+        # Sub-queries run concurrently and share the result cache with /query-text
+        event_results = await asyncio.gather(
+            *(get_search_results(event, query_type="both") for event in request.events)
+        )
+        timings = {"search": _elapsed_ms(start)}
+
+        with metrics.timer("temporal_join") as t:
+            sequences = temporal.temporal_join(
+                event_results,
+                max_gap=request.max_gap_seconds,
+                min_gap=request.min_gap_seconds,
+                top_k=request.top_k,
+            )
+        timings["join"] = t.ms
+        return {
+            "hits_per_event": [len(r) for r in event_results],
+            "sequences": sequences,
+            "timings_ms": timings,
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.exception(f"Error in /query-temporal: {e}")
+        raise HTTPException(status_code=500, detail="Failed to run temporal query")
+
+
+@router.get("/keyframes/{frame_id}")
+async def get_keyframe(
+    frame_id: str,
+    source: Literal["image", "text"] = Query("image", description="Collection to read from"),
+):
+    """Full properties of one keyframe, for the detail view (search results only carry the grid fields)."""
+    try:
+        properties = await retrieval_service.run_in_pool(vectorsearch.fetch_keyframe, source, frame_id)
+    except Exception as e:
+        logger.exception(f"Error in /keyframes/{frame_id}: {e}")
+        raise HTTPException(status_code=500, detail="Failed to fetch keyframe")
+    if properties is None:
+        raise HTTPException(status_code=404, detail="Keyframe not found")
+    return {"frame_id": frame_id, "source": source, "property": properties}
+
+
+@router.post("/query-cache/invalidate")
+async def invalidate_query_cache(
+    version: Optional[str] = Query(None, description="New collection version / ingestion timestamp"),
+    x_admin_token: Optional[str] = Header(None),
+):
+    """
+    Clear cached search results on every worker, e.g. after re-indexing a
+    collection (admin token required). This worker clears at once, the others
+    within RESULT_CACHE_VERSION_POLL_SECONDS; `shared` is false if the shared
+    version row could not be written and only this worker was cleared.
+    """
+    if not profiler.is_authorized(x_admin_token):
+        raise HTTPException(status_code=403, detail="Cache invalidation requires a valid admin token")
+    cache = get_result_cache()
+    try:
+        await cache_version.publish_invalidation(version)
+        shared = True
+    except Exception as e:
+        logger.exception(f"Could not publish result cache invalidation, clearing this worker only: {e}")
+        cache.invalidate(version)
+        shared = False
+    return {**cache.stats(), "shared": shared}
+
+
+# -------------------------------
+# Streaming (NDJSON / SSE) variants
+# -------------------------------
+def _encode_event(event: str, payload: dict, fmt: str) -> str:
+    data = json.dumps({"event": event, **payload}, ensure_ascii=False, default=str)
+    if fmt == "sse":
+        return f"event: {event}\ndata: {data}\n\n"
+    return data + "\n"
+
+
+async def stream_search_results(query_data: QueryRequest, query_id, session: UUID, fmt: str, query_type="both"):
+    """
+    Emit `query` first, a `partial` ranking per modality as soon as it returns,
+    then the `fused` ranking once both are done.
+    """
+    yield _encode_event("query", {"query_id": query_id, "session_id": session}, fmt)
+
+    cache = get_result_cache()
+    key = result_cache_key(query_data, query_type)
+    cached = cache.get(key)
+    if cached is not None:
+        yield _encode_event("fused", {"results": cached}, fmt)
+        await log_results(query_id, query_data, cached)
+        return
+
+    # Retrieval runs in its own task and hands events over a queue, so the
+    # admission slot is released once results are computed, not when a slow
+    # client has read them
+    events = asyncio.Queue()
+
+    async def produce():
+        try:
+            async with get_admission_controller().slot():
+                async for event in _stream_retrieval(query_data, query_id, fmt, query_type):
+                    events.put_nowait(event)
+        except AdmissionRejected as e:
+            # Headers are already sent, so the rejection goes out as an error event
+            events.put_nowait(_encode_event(
+                "error",
+                {"detail": e.detail, "status": e.status_code, "retry_after": int(e.headers["Retry-After"])},
+                fmt,
+            ))
+        except Exception as e:
+            logger.exception(f"Error while streaming search results: {e}")
+            events.put_nowait(_encode_event("error", {"detail": "Search failed"}, fmt))
+        finally:
+            events.put_nowait(None)
+
+    producer = asyncio.create_task(produce())
+    try:
+        while (event := await events.get()) is not None:
+            yield event
+    finally:
+        # Client went away: stop searching for nobody
+        producer.cancel()
+
+
+async def _stream_retrieval(query_data: QueryRequest, query_id, fmt: str, query_type="both"):
+    async def tagged(source, coro):
+        return source, await coro
+
+    tasks = [
+        asyncio.create_task(tagged("image", retrieval_service.run_image_retrieval(query_data, query_type))),
+        asyncio.create_task(tagged("text", retrieval_service.run_text_retrieval(query_data, query_type))),
+    ]
+    results = {}
+    try:
+        for done in asyncio.as_completed(tasks):
+            source, result = await done
+            results[source] = result
+            if result.get("property"):
+                partial = (
+                    fuse_for_request(query_data, result, retrieval_service.EMPTY_RESULT)
+                    if source == "image"
+                    else fuse_for_request(query_data, retrieval_service.EMPTY_RESULT, result)
+                )
+                yield _encode_event("partial", {"source": source, "results": partial}, fmt)
+    except Exception as e:
+        logger.exception(f"Error while streaming search results: {e}")
+        for task in tasks:
+            task.cancel()
+        yield _encode_event("error", {"detail": "Search failed"}, fmt)
+        return
+
+    fused = await rank_for_request(query_data, results["image"], results["text"])
+    get_result_cache().put(result_cache_key(query_data, query_type), fused)
+    yield _encode_event("fused", {"results": fused}, fmt)
+    await log_results(query_id, query_data, fused)
+
+
+def _streaming_response(generator, fmt: str) -> StreamingResponse:
+    media_type = "text/event-stream" if fmt == "sse" else "application/x-ndjson"
+    return StreamingResponse(generator, media_type=media_type, headers={"Cache-Control": "no-cache"})
+
+
+@router.post("/query-img/stream")
+async def create_query_img_stream(
+    query_data: QueryRequest,
+    session: UUID = Query(..., description="Session ID"),
+    format: Literal["ndjson", "sse"] = Query("ndjson", description="Stream framing"),
+):
+    """Streaming variant of /query-img: partial results per modality, then the fused ranking."""
+    query_id = await log_query(session, query_data)
+    return _streaming_response(stream_search_results(query_data, query_id, session, format), format)
+
+
+@router.post("/query-text/stream")
+async def create_query_text_stream(
+    query_data: QueryRequest,
+    session: UUID = Query(..., description="Session ID"),
+    format: Literal["ndjson", "sse"] = Query("ndjson", description="Stream framing"),
+):
+    """Streaming variant of /query-text: partial results per modality, then the fused ranking."""
+    query_id = await log_query(session, query_data)
+    return _streaming_response(stream_search_results(query_data, query_id, session, format), format)
+
+
+# -------------------------------
+# Batch queries (evaluation / submission runs)
+# -------------------------------
+async def _retry_admission(make_coro):
+    """Await make_coro(), waiting out 429/503 from the admission controller instead of failing."""
+    for attempt in range(batch_query.BATCH_MAX_RETRIES + 1):
+        try:
+            return await make_coro()
+        except AdmissionRejected as e:
+            if attempt == batch_query.BATCH_MAX_RETRIES:
+                raise
+            await asyncio.sleep(int(e.headers["Retry-After"]))
+
+
+async def _prefetch_batch_embeddings(queries):
+    async with get_admission_controller().slot():
+        return await retrieval_service.run_in_pool(batch_query.prefetch_embeddings, queries)
+
+
+async def stream_batch_results(request: BatchQueryRequest, session: Optional[UUID], fmt: str):
+    """
+    Embed every query text in large batches, then run the searches with bounded
+    concurrency and emit each query's submission rows as soon as it finishes
+    (completion order; `index` refers to the position in the request).
+    """
+    start = time.perf_counter()
+    queries = [batch_query.submission_query(q, request.top_k) for q in request.queries]
+    try:
+        with metrics.timer("batch_embed") as t:
+            encoded = await _retry_admission(lambda: _prefetch_batch_embeddings(queries))
+    except Exception as e:
+        # Searches still embed on demand, just one text at a time
+        logger.exception(f"Batch embedding failed, falling back to per-query encoding: {e}")
+        encoded = {}
+    if fmt == "ndjson":
+        yield _encode_event("batch", {"queries": len(queries), "encoded": encoded, "embed_ms": t.ms}, fmt)
+
+    semaphore = asyncio.Semaphore(request.concurrency or batch_query.BATCH_QUERY_CONCURRENCY)
+
+    async def run(index, query_data):
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                results = await _retry_admission(lambda: get_search_results(query_data, query_type="both"))
+            except HTTPException as e:
+                return index, None, e.detail, _elapsed_ms(started)
+            except Exception as e:
+                logger.exception(f"Batch query {index} failed: {e}")
+                return index, None, "Search failed", _elapsed_ms(started)
+            query_id = None
+            if session is not None:
+                query_id = await log_query(session, query_data)
+                await log_results(query_id, query_data, results)
+            return index, query_id, results, _elapsed_ms(started)
+
+    tasks = [asyncio.create_task(run(i, q)) for i, q in enumerate(queries)]
+    failed = 0
+    try:
+        for done in asyncio.as_completed(tasks):
+            index, query_id, results, elapsed = await done
+            if isinstance(results, str):
+                failed += 1
+                if fmt == "ndjson":
+                    yield _encode_event("error", {"index": index, "detail": results}, fmt)
+                continue
+            try:
+                rows = batch_query.submission_rows(results, request.top_k)
+            except ValueError as e:
+                # A row without video_id would be an invalid submission line
+                failed += 1
+                logger.error(f"Batch query {index}: {e}")
+                if fmt == "ndjson":
+                    yield _encode_event("error", {"index": index, "detail": str(e)}, fmt)
+                continue
+            if fmt == "csv":
+                yield "".join(f"{index},{video_id},{frame_idx}\n" for video_id, frame_idx in rows)
+            else:
+                yield _encode_event("result", {"index": index, "query_id": query_id, "rows": rows, "ms": elapsed}, fmt)
+    finally:
+        # Client went away: do not keep searching for nobody
+        for task in tasks:
+            task.cancel()
+
+    logger.info(f"Batch of {len(queries)} queries done in {_elapsed_ms(start)} ms ({failed} failed)")
+    if fmt == "ndjson":
+        yield _encode_event("done", {"queries": len(queries), "failed": failed, "ms": _elapsed_ms(start)}, fmt)
+
+
+@router.post("/query-batch")
+async def create_query_batch(
+    request: BatchQueryRequest,
+    session: Optional[UUID] = Query(None, description="Log every query to this session (default: not logged)"),
+    format: Literal["ndjson", "csv"] = Query("ndjson", description="csv = `index,video_id,frame_idx` lines"),
+):
+    """Many queries at once (evaluation runs): batched embedding, concurrent search, streamed submission rows."""
+    for i, q in enumerate(request.queries):
+        if not (q.text_query or q.image_query):
+            raise HTTPException(status_code=400, detail=f"Query {i} has neither text_query nor image_query")
+    if session is not None and not await get_writer().session_exists(session):
+        raise HTTPException(status_code=404, detail="Session not found")
+    media_type = "text/csv" if format == "csv" else "application/x-ndjson"
+    return StreamingResponse(
+        stream_batch_results(request, session, format), media_type=media_type, headers={"Cache-Control": "no-cache"}
+    )
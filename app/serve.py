@@ -0,0 +1,123 @@
+# app/serve.py
+"""
+Preload-and-fork server: load the model weights once, then fork the uvicorn
+workers so they share the weight pages copy-on-write instead of each holding
+its own copy (which is what `uvicorn --workers N` does, since its workers are
+spawned and re-import everything).
+
+    python -m app.serve                      # SERVE_WORKERS workers on SERVE_HOST:SERVE_PORT
+    SERVE_WORKERS=4 python -m app.serve
+
+Only weights are loaded before the fork: no inference runs in the master (torch's
+intra-op pool must not be started before forking), and Weaviate clients, the DB
+pool and the retrieval pools are created per worker by the normal startup hooks.
+gc.freeze() moves everything loaded so far out of the collector's reach, so GC
+passes in the workers do not write to (and un-share) those pages.
+See benchmarks/memory_report.py for RSS/PSS per worker in both modes.
+"""
+import gc
+import logging
+import os
+import signal
+import socket
+import sys
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+SERVE_HOST = os.getenv("SERVE_HOST", "0.0.0.0")
+SERVE_PORT = int(os.getenv("SERVE_PORT", 8000))
+SERVE_WORKERS = int(os.getenv("SERVE_WORKERS", 2))
+SERVE_PRELOAD = os.getenv("SERVE_PRELOAD", "1") == "1"
+
+
+def _bind_socket(host, port) -> socket.socket:
+    sock = socket.socket(socket.AF_INET6 if ":" in host else socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+def _run_worker(app, sock):
+    """Child process: reset signals, serve on the shared socket (the startup hook sizes torch's threads)."""
+    import uvicorn
+
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    server = uvicorn.Server(uvicorn.Config(app, log_level="info", lifespan="on"))
+    server.run(sockets=[sock])
+
+
+def _fork_worker(app, sock) -> int:
+    pid = os.fork()
+    if pid == 0:
+        code = 0
+        try:
+            _run_worker(app, sock)
+        except BaseException:
+            logger.exception("Worker crashed")
+            code = 1
+        finally:
+            os._exit(code)
+    logger.info(f"👷 Started worker {pid}")
+    return pid
+
+
+def main():
+    logging.basicConfig(level=logging.INFO)
+
+    if SERVE_PRELOAD:
+        from app.services.warmup import preload_weights
+
+        logger.info("🔹 Preloading model weights in the master process...")
+        preload_weights()
+    from app.main import app
+    from app.services import admission
+
+    admission.set_worker_processes(SERVE_WORKERS)
+    gc.collect()
+    gc.freeze()
+
+    sock = _bind_socket(SERVE_HOST, SERVE_PORT)
+    logger.info(f"🚀 Serving on {SERVE_HOST}:{SERVE_PORT} with {SERVE_WORKERS} workers "
+                f"({admission.torch_threads()} torch threads each)")
+    workers = {_fork_worker(app, sock) for _ in range(SERVE_WORKERS)}
+
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in list(workers):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+
+    while workers:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        except InterruptedError:
+            continue
+        workers.discard(pid)
+        if not stopping:
+            logger.warning(f"Worker {pid} exited with status {status}, restarting")
+            workers.add(_fork_worker(app, sock))
+
+    sock.close()
+    logger.info("🛑 All workers stopped")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,176 @@
+# app/services/admission.py
+"""
+Admission control in front of the inference + search stages.
+
+At most ADMISSION_MAX_CONCURRENCY requests run the embedding / vector search
+stages at once; the rest wait in a FIFO queue of at most ADMISSION_QUEUE_SIZE
+entries, each with its own deadline (ADMISSION_QUEUE_TIMEOUT_MS). A full queue
+is rejected immediately with 429, an expired wait with 503; both carry a
+Retry-After estimated from the recent service time. Torch intra-op threads are
+sized here, in one place: forward passes run on the batcher threads, not per
+slot, so the cores are split between worker processes and batcher threads.
+
+The controller lives on the event loop (no locks); slots are handed directly to
+the next waiter on release, so a burst cannot starve queued requests.
+"""
+import asyncio
+import logging
+import math
+import os
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+
+from dotenv import load_dotenv
+from fastapi import HTTPException
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+ADMISSION_MAX_CONCURRENCY = int(os.getenv("ADMISSION_MAX_CONCURRENCY", 4))
+ADMISSION_QUEUE_SIZE = int(os.getenv("ADMISSION_QUEUE_SIZE", 64))
+ADMISSION_QUEUE_TIMEOUT_MS = float(os.getenv("ADMISSION_QUEUE_TIMEOUT_MS", 2000))
+# 0 = cpu_count // (worker processes * TORCH_FORWARD_THREADS); SERVE_TORCH_THREADS is the old name
+ADMISSION_TORCH_THREADS = int(os.getenv("ADMISSION_TORCH_THREADS", os.getenv("SERVE_TORCH_THREADS", 0)))
+# Threads running forward passes at the same time in one process: the CLIP and Gemma text batchers
+TORCH_FORWARD_THREADS = int(os.getenv("TORCH_FORWARD_THREADS", 2))
+# Worker processes when not started through app.serve (which uses SERVE_WORKERS). uvicorn
+# and gunicorn take their default worker count from it; with `--workers N` or several
+# containers per host, set it (or ADMISSION_TORCH_THREADS) to match, or every process
+# assumes it owns all the cores.
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", 1))
+
+
+class AdmissionRejected(HTTPException):
+    """429 (queue full) or 503 (queue deadline passed), with Retry-After."""
+
+    def __init__(self, status_code: int, detail: str, retry_after: int):
+        super().__init__(status_code=status_code, detail=detail, headers={"Retry-After": str(retry_after)})
+
+
+class AdmissionController:
+    def __init__(self, max_concurrency=ADMISSION_MAX_CONCURRENCY, queue_size=ADMISSION_QUEUE_SIZE,
+                 queue_timeout_ms=ADMISSION_QUEUE_TIMEOUT_MS):
+        self.max_concurrency = max(1, max_concurrency)
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout_ms / 1000.0
+        self._active = 0
+        self._waiters = deque()
+        # metrics
+        self.admitted = 0
+        self.rejected_full = 0
+        self.timed_out = 0
+        self.service_ewma = 0.0   # seconds a slot is held, exponentially weighted
+        self.wait_ewma = 0.0
+
+    def retry_after(self) -> int:
+        """Seconds until a new request would likely get a slot."""
+        backlog = len(self._waiters) + 1
+        estimate = self.service_ewma * backlog / self.max_concurrency
+        return max(1, math.ceil(estimate))
+
+    async def acquire(self, timeout: float = None):
+        timeout = self.queue_timeout if timeout is None else timeout
+        if self._active < self.max_concurrency and not self._waiters:
+            self._active += 1
+            self.admitted += 1
+            return
+        if len(self._waiters) >= self.queue_size:
+            self.rejected_full += 1
+            raise AdmissionRejected(429, "Too many requests, inference queue is full", self.retry_after())
+
+        start = time.perf_counter()
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if waiter.done() and not waiter.cancelled():
+                # The slot was handed over just as we gave up: pass it on
+                self.release()
+            else:
+                waiter.cancel()
+                try:
+                    self._waiters.remove(waiter)
+                except ValueError:
+                    pass
+            if isinstance(e, asyncio.CancelledError):
+                raise
+            self.timed_out += 1
+            raise AdmissionRejected(503, "Inference queue deadline exceeded", self.retry_after())
+        self.admitted += 1
+        self.wait_ewma = 0.9 * self.wait_ewma + 0.1 * (time.perf_counter() - start)
+
+    def release(self):
+        # Hand the slot straight to the oldest live waiter, else free it
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self._active -= 1
+
+    @asynccontextmanager
+    async def slot(self, timeout: float = None):
+        await self.acquire(timeout)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.service_ewma = 0.9 * self.service_ewma + 0.1 * (time.perf_counter() - start)
+            self.release()
+
+    def stats(self):
+        return {
+            "max_concurrency": self.max_concurrency,
+            "active": self._active,
+            "queued": len(self._waiters),
+            "queue_size": self.queue_size,
+            "queue_timeout_ms": self.queue_timeout * 1000,
+            "admitted": self.admitted,
+            "rejected_full": self.rejected_full,
+            "timed_out": self.timed_out,
+            "avg_service_ms": self.service_ewma * 1000,
+            "avg_wait_ms": self.wait_ewma * 1000,
+            "retry_after": self.retry_after(),
+        }
+
+
+_controller = None
+
+
+def get_admission_controller() -> AdmissionController:
+    global _controller
+    if _controller is None:
+        _controller = AdmissionController()
+    return _controller
+
+
+_worker_processes = max(1, WEB_CONCURRENCY)
+
+
+def set_worker_processes(n: int):
+    """Number of server processes sharing the cores (app.serve sets it before forking)."""
+    global _worker_processes
+    _worker_processes = max(1, n)
+
+
+def torch_threads(workers=None) -> int:
+    """Intra-op threads per process: the cores split between worker processes and forward threads."""
+    if ADMISSION_TORCH_THREADS:
+        return ADMISSION_TORCH_THREADS
+    workers = _worker_processes if workers is None else max(1, workers)
+    return max(1, (os.cpu_count() or 1) // (workers * max(1, TORCH_FORWARD_THREADS)))
+
+
+def configure_torch_threads():
+    """Size torch's intra-op pool for this process (the only place torch.set_num_threads is called)."""
+    import torch
+
+    threads = torch_threads()
+    torch.set_num_threads(threads)
+    logger.info(
+        f"torch intra-op threads: {threads} ({_worker_processes} workers x {TORCH_FORWARD_THREADS} forward threads)"
+    )
+    return threads
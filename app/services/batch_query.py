@@ -0,0 +1,97 @@
+# app/services/batch_query.py
+"""
+Helpers for /api/query-batch (evaluation / submission runs).
+
+Before any search runs, every distinct query text is embedded in large batches
+(one forward pass per BATCH_EMBED_SIZE texts and model) and put in the
+embedding cache. The per-query retrieval that follows then finds its vectors
+there instead of queueing single texts on the micro-batchers. Results are
+turned into submission rows `video_id,frame_idx`.
+"""
+import logging
+import os
+from typing import Any, Dict, Iterable, List, Tuple
+
+from dotenv import load_dotenv
+
+from app.ai.model.batcher import get_clip_text_batcher, get_gemma_text_batcher
+from app.ai.model.clip_model import CLIP_MODEL_ID
+from app.ai.model.embedding_cache import get_embedding_cache
+from app.ai.model.gemma_model import GEMMA_MODEL_NAME
+from app.ai.model.onnx_backend import backend_tag
+from app.db.query_results import frame_position, parse_int
+from app.models.query import QueryRequest
+from app.services import metrics
+from app.services.admission import ADMISSION_MAX_CONCURRENCY
+from app.services.fusion import FRAME_ID_PROPERTY
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+BATCH_EMBED_SIZE = int(os.getenv("BATCH_EMBED_SIZE", 64))
+# Searches in flight per batch; the default leaves half the admission slots to interactive queries
+BATCH_QUERY_CONCURRENCY = int(os.getenv("BATCH_QUERY_CONCURRENCY", max(1, ADMISSION_MAX_CONCURRENCY // 2)))
+BATCH_MAX_RETRIES = int(os.getenv("BATCH_MAX_RETRIES", 5))   # per query, on 429/503 from admission
+# Only what the submission needs comes back from the vector DB: the frame key
+# (video_id is derived from it) and frame_idx
+SUBMISSION_FIELDS = [FRAME_ID_PROPERTY, "frame_idx"]
+
+
+def _embed_missing(batcher, model_id: str, texts: Iterable[str], batch_size: int) -> int:
+    """Encode the texts not yet in the embedding cache, `batch_size` per forward pass."""
+    cache = get_embedding_cache()
+    missing = [t for t in dict.fromkeys(t for t in texts if t) if cache.get(model_id, t) is None]
+    for i in range(0, len(missing), batch_size):
+        chunk = missing[i:i + batch_size]
+        with metrics.timer(f"embed.{batcher.name}.batch"):
+            vectors = batcher.encode_fn(chunk)
+        metrics.observe("embed_batch_size", len(chunk), metrics.COUNT_BUCKETS, batcher=f"{batcher.name}-bulk")
+        for text, vector in zip(chunk, vectors):
+            cache.put(model_id, text, vector)
+    return len(missing)
+
+
+def prefetch_embeddings(queries: List[QueryRequest], batch_size: int = BATCH_EMBED_SIZE) -> Dict[str, int]:
+    """Blocking: fill the embedding cache for every text the searches will encode."""
+    clip_texts, gemma_texts = [], []
+    for q in queries:
+        clip_texts.append(q.image_query)
+        if q.rerank:
+            clip_texts.extend([q.image_query or q.text_query, *(q.rerank_queries or [])])
+        gemma_texts.append(q.text_query)
+    return {
+        "clip": _embed_missing(get_clip_text_batcher(), f"{CLIP_MODEL_ID}|{backend_tag()}", clip_texts, batch_size),
+        "gemma": _embed_missing(
+            get_gemma_text_batcher(), f"{GEMMA_MODEL_NAME}|{backend_tag()}", gemma_texts, batch_size
+        ),
+    }
+
+
+def submission_query(query: QueryRequest, top_k: int) -> QueryRequest:
+    """The query as searched in a batch: submission-sized top_k and a minimal projection by default."""
+    update = {}
+    if query.top_k is None:
+        update["top_k"] = top_k
+    if query.fields is None:
+        update["fields"] = SUBMISSION_FIELDS
+    return query.model_copy(update=update) if update else query
+
+
+def submission_rows(results: List[Dict[str, Any]], top_k: int) -> List[Tuple[str, int]]:
+    """
+    (video_id, frame_idx) per fused result, best first. frame_idx must come from
+    the `frame_idx` property: the keyframe ordinal in the frame id is not a video
+    frame index, so it is never used here. ValueError if either is missing.
+    """
+    rows = []
+    for rank, r in enumerate(results[:top_k], start=1):
+        prop = r.get("property") if isinstance(r.get("property"), dict) else {}
+        video_id, _ = frame_position(r.get("frame_id"), prop)
+        if not video_id:
+            raise ValueError(f"Could not resolve video_id of result {rank} (frame_id={r.get('frame_id')!r})")
+        frame_idx = parse_int(prop.get("frame_idx"))
+        if frame_idx is None:
+            raise ValueError(f"Result {rank} has no frame_idx property (frame_id={r.get('frame_id')!r})")
+        rows.append((video_id, frame_idx))
+    return rows
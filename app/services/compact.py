@@ -0,0 +1,115 @@
+# app/services/compact.py
+"""
+Compact (columnar) response format for search results and history.
+
+`format=compact` replaces the list of per-result dicts with parallel arrays
+(one entry per result) and moves properties that are the same for every frame
+of a video (VIDEO_PROPERTIES) into a per-video table, so they are sent once.
+Search results always carry a `timestamps` column (seconds, None if unknown),
+derived like the temporal search does: `timestamp` / `pts_time`, else frame_idx / fps.
+Responses are encoded with orjson through CompactJSONResponse instead of
+jsonable_encoder + json.
+"""
+import os
+from typing import Any, Dict, Iterable, List
+
+import orjson
+from dotenv import load_dotenv
+from fastapi.responses import JSONResponse
+
+from app.db.query_results import frame_position
+from app.services import metrics
+from app.services.fusion import FRAME_ID_PROPERTY
+from app.services.temporal import hit_time_seconds
+
+load_dotenv()
+
+VIDEO_PROPERTIES = [
+    p.strip() for p in os.getenv("COMPACT_VIDEO_PROPERTIES", "video_url,fps").split(",") if p.strip()
+]
+
+ORJSON_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+
+class CompactJSONResponse(JSONResponse):
+    """JSONResponse rendered with orjson (UUID, datetime and numpy handled natively)."""
+
+    def render(self, content: Any) -> bytes:
+        with metrics.timer("serialize"):
+            return orjson.dumps(content, option=ORJSON_OPTIONS)
+
+
+def split_columns(props: List[Dict[str, Any]], video_ids: List[Any], skip: Iterable[str] = ()):
+    """
+    Turn a list of property dicts into ({key: [value per row]}, {video_id: {key: value}}).
+    Keys in VIDEO_PROPERTIES go to the per-video table; keys in `skip` are dropped
+    (already sent as their own column). Missing values are None.
+    """
+    skip = set(skip)
+    columns: Dict[str, List[Any]] = {}
+    videos: Dict[Any, Dict[str, Any]] = {}
+    for i, prop in enumerate(props):
+        if not isinstance(prop, dict):
+            prop = {}
+        for key, value in prop.items():
+            if key in skip:
+                continue
+            if key in VIDEO_PROPERTIES:
+                videos.setdefault(video_ids[i], {}).setdefault(key, value)
+                continue
+            column = columns.get(key)
+            if column is None:
+                column = columns[key] = [None] * i
+            column.append(value)
+        for column in columns.values():
+            if len(column) <= i:
+                column.append(None)
+    return columns, videos
+
+
+def compact_search_results(results: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Columnar form of fusion.fuse() output."""
+    props = [r.get("property") or {} for r in results]
+    # video_id is not a stored property: derive it from the frame key like the DB rows do
+    video_ids = [frame_position(r.get("frame_id"), p)[0] or None for r, p in zip(results, props)]
+    columns, videos = split_columns(props, video_ids, skip=("frame_id", "video_id", FRAME_ID_PROPERTY))
+    return {
+        "count": len(results),
+        "frame_ids": [r.get("frame_id") for r in results],
+        "video_ids": video_ids,
+        # fps lives in the per-video table, so resolve it per row before it moves there
+        "timestamps": [hit_time_seconds(p) for p in props],
+        "scores": [r.get("total_score") for r in results],
+        "image_scores": [r.get("image_score") for r in results],
+        "text_scores": [r.get("text_score") for r in results],
+        "columns": columns,
+        "videos": videos,
+    }
+
+
+# HistoryResult field -> column name
+_HISTORY_COLUMNS = {
+    "keyframe_id": "keyframe_ids",
+    "video_id": "video_ids",
+    "frame_number": "frame_numbers",
+    "timestamp_ms": "timestamps_ms",
+    "image_url": "image_urls",
+    "rank": "ranks",
+    "score": "scores",
+}
+
+
+def compact_history_results(results: List[Any]) -> Dict[str, Any]:
+    """Columnar form of a list of HistoryResult; metadata keys become extra columns."""
+    rows = [r.model_dump() if hasattr(r, "model_dump") else dict(r) for r in results]
+    out = {"count": len(rows)}
+    for key, column in _HISTORY_COLUMNS.items():
+        out[column] = [row[key] for row in rows]
+    if rows and rows[0].get("query_id") is not None:
+        out["query_ids"] = [row["query_id"] for row in rows]
+    out["columns"], out["videos"] = split_columns(
+        [row.get("metadata") or {} for row in rows],
+        out["video_ids"],
+        skip=("frame_id", "video_id", "image_url"),
+    )
+    return out
@@ -0,0 +1,135 @@
+# app/services/fusion.py
+"""
+Score fusion of the image and text retrieval results.
+
+Both modalities come from separate RELATIVE_SCORE hybrid searches, so their raw
+scores are not on the same scale; the normalizing methods fix that:
+  - sum     weighted sum of raw scores (legacy behaviour with weights 1/1)
+  - minmax  per-modality min-max to [0, 1], then weighted sum
+  - zscore  per-modality z-score, then weighted sum
+  - rrf     reciprocal rank fusion: sum of weight / (RRF_K + rank)
+Ids are mapped to slots once; everything else runs on NumPy arrays and the
+top-k is selected with argpartition, so cost stays flat as top_k grows.
+"""
+import os
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from dotenv import load_dotenv
+
+load_dotenv()
+
+FUSION_METHODS = ("sum", "minmax", "zscore", "rrf")
+RRF_K = 60
+
+# Property holding the keyframe key ("L30_V001_F043") in the ingested collections
+FRAME_ID_PROPERTY = os.getenv("FRAME_ID_PROPERTY", "id")
+# Keys extract_frame_id looks at, in order
+FRAME_ID_KEYS = tuple(dict.fromkeys(["frame_id", "id", "keyframe_id", FRAME_ID_PROPERTY]))
+
+
+def extract_frame_id(prop):
+    if isinstance(prop, dict):
+        for k in FRAME_ID_KEYS:
+            if k in prop:
+                return prop[k]
+    elif isinstance(prop, (list, tuple)) and prop:
+        return prop[0]
+    return None
+
+
+def _scores_array(result, n):
+    """Raw scores as float64, missing / None -> 0.0, padded to the number of properties."""
+    scores = result.get("score", [])
+    if not isinstance(scores, list):
+        scores = [scores]
+    out = np.zeros(n, dtype=np.float64)
+    m = min(n, len(scores))
+    if m:
+        out[:m] = np.array([s if s is not None else 0.0 for s in scores[:m]], dtype=np.float64)
+    return out
+
+
+def _normalize(scores, method):
+    if len(scores) == 0:
+        return scores
+    if method == "minmax":
+        low, high = scores.min(), scores.max()
+        return np.ones_like(scores) if high == low else (scores - low) / (high - low)
+    if method == "zscore":
+        std = scores.std()
+        return np.zeros_like(scores) if std == 0 else (scores - scores.mean()) / std
+    if method == "rrf":
+        # Results arrive ranked by the search engine; rank is 1-based
+        return 1.0 / (RRF_K + np.arange(1, len(scores) + 1, dtype=np.float64))
+    return scores
+
+
+def _topk_order(total, top_k):
+    n = len(total)
+    if top_k is not None and 0 < top_k < n:
+        idx = np.argpartition(-total, top_k - 1)[:top_k]
+    else:
+        idx = np.arange(n)
+    return idx[np.argsort(-total[idx], kind="stable")]
+
+
+def fuse(
+    result_image: Dict[str, Any],
+    result_text: Dict[str, Any],
+    method: str = "sum",
+    image_weight: float = 1.0,
+    text_weight: float = 1.0,
+    top_k: Optional[int] = None,
+) -> List[Dict[str, Any]]:
+    """Merge packed retrieval results by frame_id and rank them by fused score."""
+    if method not in FUSION_METHODS:
+        raise ValueError(f"Unknown fusion method: {method}")
+
+    slots = {}
+    properties = []
+    modality_slots = []
+    modality_scores = []
+    for result in (result_image, result_text):
+        props = result.get("property", []) or []
+        idx = np.empty(len(props), dtype=np.int64)
+        for i, prop in enumerate(props):
+            fid = extract_frame_id(prop)
+            slot = slots.get(fid)
+            if slot is None:
+                slot = slots[fid] = len(properties)
+                properties.append(prop)
+            elif not properties[slot]:
+                properties[slot] = prop
+            idx[i] = slot
+        modality_slots.append(idx)
+        modality_scores.append(_scores_array(result, len(props)))
+
+    n = len(properties)
+    raw = np.zeros((2, n), dtype=np.float64)
+    total = np.zeros(n, dtype=np.float64)
+    for m, (idx, scores, weight) in enumerate(
+        zip(modality_slots, modality_scores, (image_weight, text_weight))
+    ):
+        if len(idx) == 0:
+            continue
+        # Duplicate frame_ids within one modality keep their best score
+        np.maximum.at(raw[m], idx, scores)
+        normalized = _normalize(scores, method)
+        contrib = np.full(n, -np.inf)
+        np.maximum.at(contrib, idx, normalized)
+        # Frames missing from a modality get 0, or its worst z-score (0 would mean "average")
+        contrib[np.isneginf(contrib)] = normalized.min() if method == "zscore" else 0.0
+        total += weight * contrib
+
+    frame_ids = list(slots.keys())
+    return [
+        {
+            "frame_id": frame_ids[i],
+            "property": properties[i],
+            "image_score": float(raw[0, i]),
+            "text_score": float(raw[1, i]),
+            "total_score": float(total[i]),
+        }
+        for i in _topk_order(total, top_k)
+    ]
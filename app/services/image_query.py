@@ -0,0 +1,192 @@
+# app/services/image_query.py
+"""
+Query-by-example: image bytes (upload or URL) -> CLIP image embedding.
+
+- URLs are fetched with a shared httpx.AsyncClient, streamed and cut off at
+  IMAGE_QUERY_MAX_BYTES. Every hop (redirects are followed by hand) must
+  resolve to public addresses only, and to IMAGE_QUERY_ALLOWED_HOSTS when set,
+  so a query cannot make the server call metadata endpoints or internal
+  services.
+- Embeddings are cached in the embedding cache under the sha256 of the raw
+  bytes, so dragging the same frame back in skips decode and inference.
+- On a miss, decode + resize + normalize run in a process pool (PIL work never
+  holds the API process' GIL), then the CLIP image tower runs in the
+  retrieval thread pool.
+"""
+import asyncio
+import hashlib
+import ipaddress
+import logging
+import multiprocessing
+import os
+import socket
+from concurrent.futures import ProcessPoolExecutor
+
+import httpx
+import numpy as np
+from dotenv import load_dotenv
+
+from app.ai.model.clip_model import CLIP_MODEL_ID, embed_clip_pixels
+from app.ai.model.embedding_cache import get_embedding_cache
+from app.ai.model.image_preprocess import preprocess_clip_image
+from app.services.retrieval_service import run_in_pool
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+IMAGE_QUERY_MAX_BYTES = int(os.getenv("IMAGE_QUERY_MAX_BYTES", 10 * 1024 * 1024))
+IMAGE_QUERY_FETCH_TIMEOUT = float(os.getenv("IMAGE_QUERY_FETCH_TIMEOUT", 10))
+IMAGE_DECODE_WORKERS = int(os.getenv("IMAGE_DECODE_WORKERS", 2))
+IMAGE_QUERY_MAX_REDIRECTS = int(os.getenv("IMAGE_QUERY_MAX_REDIRECTS", 3))
+# Comma-separated host names (e.g. storage.googleapis.com); "*.example.com" matches subdomains. Empty = any public host
+IMAGE_QUERY_ALLOWED_HOSTS = [
+    h.strip().lower() for h in os.getenv("IMAGE_QUERY_ALLOWED_HOSTS", "").split(",") if h.strip()
+]
+
+# Cache namespace for image embeddings (keys are content hashes, not text)
+IMAGE_EMBED_MODEL_ID = f"{CLIP_MODEL_ID}|image"
+
+
+class ImageQueryError(ValueError):
+    """Bad image input; `status_code` is what the API should answer."""
+
+    def __init__(self, detail: str, status_code: int = 400):
+        super().__init__(detail)
+        self.detail = detail
+        self.status_code = status_code
+
+
+_http_client = None
+_decode_pool = None
+
+
+def get_http_client() -> httpx.AsyncClient:
+    global _http_client
+    if _http_client is None:
+        _http_client = httpx.AsyncClient(timeout=IMAGE_QUERY_FETCH_TIMEOUT, follow_redirects=False)
+    return _http_client
+
+
+def get_decode_pool() -> ProcessPoolExecutor:
+    """Process pool for image decoding; spawned so workers do not inherit torch state."""
+    global _decode_pool
+    if _decode_pool is None:
+        _decode_pool = ProcessPoolExecutor(
+            max_workers=IMAGE_DECODE_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+        logger.info(f"Image decode process pool created with {IMAGE_DECODE_WORKERS} workers")
+    return _decode_pool
+
+
+async def close_image_query():
+    global _http_client, _decode_pool
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+    if _decode_pool is not None:
+        _decode_pool.shutdown(wait=True)
+        _decode_pool = None
+        logger.info("Image decode process pool closed")
+
+
+def content_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def is_public_address(address: str) -> bool:
+    """False for private, loopback, link-local (169.254.169.254), reserved and other non-global addresses."""
+    ip = ipaddress.ip_address(address.split("%", 1)[0])
+    if isinstance(ip, ipaddress.IPv6Address) and ip.ipv4_mapped is not None:
+        ip = ip.ipv4_mapped
+    return ip.is_global and not ip.is_multicast
+
+
+def host_allowed(host: str) -> bool:
+    if not IMAGE_QUERY_ALLOWED_HOSTS:
+        return True
+    host = host.lower()
+    return any(
+        host == allowed or (allowed.startswith("*.") and host.endswith(allowed[1:]))
+        for allowed in IMAGE_QUERY_ALLOWED_HOSTS
+    )
+
+
+async def check_image_url(url: httpx.URL):
+    """Refuse URLs that are not http(s), not allowed, or resolve to a non-public address."""
+    if url.scheme not in ("http", "https") or not url.host:
+        raise ImageQueryError("image_url must be http(s)")
+    if not host_allowed(url.host):
+        raise ImageQueryError(f"Image host {url.host} is not allowed", 403)
+    port = url.port or (443 if url.scheme == "https" else 80)
+    try:
+        infos = await asyncio.get_running_loop().getaddrinfo(url.host, port, type=socket.SOCK_STREAM)
+    except socket.gaierror:
+        raise ImageQueryError(f"Could not resolve image host {url.host}", 502)
+    if not infos or not all(is_public_address(info[4][0]) for info in infos):
+        raise ImageQueryError(f"Image host {url.host} resolves to a non-public address", 403)
+
+
+async def fetch_image(url: str, max_bytes: int = IMAGE_QUERY_MAX_BYTES) -> bytes:
+    """Download an image, refusing anything larger than `max_bytes` or hosted on a non-public address."""
+    try:
+        target = httpx.URL(url)
+    except httpx.InvalidURL:
+        raise ImageQueryError("image_url must be http(s)")
+    try:
+        for _ in range(IMAGE_QUERY_MAX_REDIRECTS + 1):
+            await check_image_url(target)
+            async with get_http_client().stream("GET", target) as response:
+                if response.is_redirect:
+                    # Follow by hand so every hop goes through check_image_url
+                    target = target.join(response.headers["location"])
+                    continue
+                if response.status_code != 200:
+                    raise ImageQueryError(f"Image fetch failed with HTTP {response.status_code}", 502)
+                length = response.headers.get("content-length")
+                if length is not None and length.isdigit() and int(length) > max_bytes:
+                    raise ImageQueryError("Image too large", 413)
+                chunks, size = [], 0
+                async for chunk in response.aiter_bytes():
+                    size += len(chunk)
+                    if size > max_bytes:
+                        raise ImageQueryError("Image too large", 413)
+                    chunks.append(chunk)
+                return b"".join(chunks)
+    except httpx.HTTPError as e:
+        raise ImageQueryError(f"Image fetch failed: {e}", 502)
+    raise ImageQueryError("Image fetch failed: too many redirects", 502)
+
+
+async def read_upload(upload, max_bytes: int = IMAGE_QUERY_MAX_BYTES) -> bytes:
+    """Read an UploadFile in chunks, refusing anything larger than `max_bytes`."""
+    chunks, size = [], 0
+    while True:
+        chunk = await upload.read(1024 * 1024)
+        if not chunk:
+            break
+        size += len(chunk)
+        if size > max_bytes:
+            raise ImageQueryError("Image too large", 413)
+        chunks.append(chunk)
+    return b"".join(chunks)
+
+
+async def embed_image_bytes(data: bytes):
+    """(content hash, L2-normalized CLIP image embedding); cached by content hash."""
+    if not data:
+        raise ImageQueryError("Empty image")
+    digest = content_hash(data)
+    cache = get_embedding_cache()
+    vector = cache.get(IMAGE_EMBED_MODEL_ID, digest)
+    if vector is not None:
+        return digest, vector
+
+    loop = asyncio.get_running_loop()
+    try:
+        pixels = await loop.run_in_executor(get_decode_pool(), preprocess_clip_image, data)
+    except Exception as e:
+        raise ImageQueryError(f"Could not decode image: {e}")
+    embedding = await run_in_pool(embed_clip_pixels, pixels)
+    return digest, cache.put(IMAGE_EMBED_MODEL_ID, digest, np.asarray(embedding)[0])
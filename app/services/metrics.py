@@ -0,0 +1,220 @@
+# app/services/metrics.py
+"""
+Lightweight in-process metrics: latency histograms per stage, counters, and
+the per-request stage timings behind the Server-Timing header.
+
+    with metrics.timer("fusion"):
+        ...
+    metrics.inc("http_requests_total", route="/api/query-img", status="200")
+
+Every timer observes the `stage_duration_seconds` histogram and, when called
+inside a request (the middleware in app/main.py sets a contextvar), appends
+(stage, ms) to that request's timings. The contextvar is copied into the
+retrieval thread pool by retrieval_service.run_in_pool, so stages timed in
+worker threads are attributed to the request too.
+
+Recording is a perf_counter pair, a bisect and a dict update under one lock,
+cheap enough to leave on. /api/metrics renders the Prometheus text format.
+"""
+import asyncio
+import bisect
+import contextvars
+import functools
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+COUNT_BUCKETS = (0, 1, 10, 50, 100, 200, 300, 500, 1000, 2000)
+
+_HELP = {
+    "stage_duration_seconds": "Time spent per pipeline stage",
+    "http_request_duration_seconds": "HTTP request latency by route",
+    "http_requests_total": "HTTP requests by route and status",
+    "search_candidates": "Candidates returned per vector search",
+}
+
+_request_timings: contextvars.ContextVar[Optional[List[Tuple[str, float]]]] = contextvars.ContextVar(
+    "request_timings", default=None
+)
+# Set by the profiler: (stage, start, end, thread name) per timed block, perf_counter clock
+_request_spans: contextvars.ContextVar[Optional[list]] = contextvars.ContextVar("request_spans", default=None)
+
+
+class _Histogram:
+    __slots__ = ("buckets", "counts", "total", "count")
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.total += value
+        self.count += 1
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms: Dict[Tuple[str, tuple], _Histogram] = {}
+        self._counters: Dict[Tuple[str, tuple], float] = {}
+
+    def observe(self, name: str, value: float, buckets=LATENCY_BUCKETS, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            hist = self._histograms.get(key)
+            if hist is None:
+                hist = self._histograms[key] = _Histogram(buckets)
+            hist.observe(value)
+
+    def inc(self, name: str, value: float = 1.0, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0.0) + value
+
+    def render(self, gauges: Dict[str, Dict[tuple, float]] = None) -> str:
+        """Prometheus text exposition (version 0.0.4)."""
+        with self._lock:
+            histograms = [(k, list(h.counts), h.total, h.count, h.buckets) for k, h in self._histograms.items()]
+            counters = list(self._counters.items())
+
+        lines = []
+        seen = set()
+
+        def header(name, kind):
+            if name not in seen:
+                seen.add(name)
+                if name in _HELP:
+                    lines.append(f"# HELP {name} {_HELP[name]}")
+                lines.append(f"# TYPE {name} {kind}")
+
+        for (name, labels), value in sorted(counters):
+            header(name, "counter")
+            lines.append(f"{name}{_labels(labels)} {value:g}")
+        for (name, labels), counts, total, count, buckets in sorted(histograms, key=lambda h: h[0]):
+            header(name, "histogram")
+            cumulative = 0
+            for bound, n in zip(buckets, counts):
+                cumulative += n
+                lines.append(f"{name}_bucket{_labels(labels + (('le', f'{bound:g}'),))} {cumulative}")
+            lines.append(f"{name}_bucket{_labels(labels + (('le', '+Inf'),))} {count}")
+            lines.append(f"{name}_sum{_labels(labels)} {total:g}")
+            lines.append(f"{name}_count{_labels(labels)} {count}")
+        for name, values in sorted((gauges or {}).items()):
+            header(name, "gauge")
+            for labels, value in values.items():
+                lines.append(f"{name}{_labels(labels)} {float(value):g}")
+        return "\n".join(lines) + "\n"
+
+
+def _labels(labels: tuple) -> str:
+    if not labels:
+        return ""
+    escaped = (
+        f'{k}="' + str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") + '"'
+        for k, v in labels
+    )
+    return "{" + ",".join(escaped) + "}"
+
+
+_registry = MetricsRegistry()
+
+
+def get_registry() -> MetricsRegistry:
+    return _registry
+
+
+def inc(name: str, value: float = 1.0, **labels):
+    _registry.inc(name, value, **labels)
+
+
+def observe(name: str, value: float, buckets=LATENCY_BUCKETS, **labels):
+    _registry.observe(name, value, buckets, **labels)
+
+
+class _Timer:
+    __slots__ = ("stage", "start", "seconds")
+
+    @property
+    def ms(self) -> float:
+        return round(self.seconds * 1000, 3)
+
+
+@contextmanager
+def timer(stage: str):
+    """Time a block as `stage`: histogram + the current request's Server-Timing entries."""
+    t = _Timer()
+    t.stage = stage
+    t.start = time.perf_counter()
+    try:
+        yield t
+    finally:
+        t.seconds = time.perf_counter() - t.start
+        _record(stage, t.start, t.seconds)
+
+
+def timed(stage: str):
+    """Decorator form of `timer` for sync and async functions."""
+    def decorator(fn):
+        if asyncio.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                with timer(stage):
+                    return await fn(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with timer(stage):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def record_stage(stage: str, seconds: float):
+    """Record an already measured duration that ended now (e.g. a wait that started elsewhere)."""
+    _record(stage, time.perf_counter() - seconds, seconds)
+
+
+def _record(stage: str, start: float, seconds: float):
+    _registry.observe("stage_duration_seconds", seconds, stage=stage)
+    timings = _request_timings.get()
+    if timings is not None:
+        timings.append((stage, seconds * 1000))
+    spans = _request_spans.get()
+    if spans is not None:
+        spans.append((stage, start, start + seconds, threading.current_thread().name))
+
+
+def start_request() -> contextvars.Token:
+    return _request_timings.set([])
+
+
+def end_request(token: contextvars.Token) -> List[Tuple[str, float]]:
+    timings = _request_timings.get() or []
+    _request_timings.reset(token)
+    return timings
+
+
+def start_spans() -> contextvars.Token:
+    return _request_spans.set([])
+
+
+def end_spans(token: contextvars.Token) -> list:
+    spans = _request_spans.get() or []
+    _request_spans.reset(token)
+    return spans
+
+
+def server_timing_header(timings: List[Tuple[str, float]], total_ms: float) -> str:
+    """`Server-Timing` value; repeated stages (e.g. two searches) are summed."""
+    merged: Dict[str, float] = {}
+    for stage, ms in timings:
+        merged[stage] = merged.get(stage, 0.0) + ms
+    parts = [f"{stage};dur={ms:.1f}" for stage, ms in merged.items()]
+    parts.append(f"total;dur={total_ms:.1f}")
+    return ", ".join(parts)
@@ -0,0 +1,244 @@
+# app/services/profiler.py
+"""
+On-demand sampling profiler for single requests.
+
+An admin sends `X-Profile: 1` (or `?profile=1`) together with
+`X-Admin-Token: $PROFILE_ADMIN_TOKEN` to a profiled route. The request then
+runs while a background thread samples `sys._current_frames()` every
+PROFILE_INTERVAL_MS for the threads doing its work:
+  - the event loop thread (shared with concurrent requests),
+  - retrieval pool threads while they run this request's functions
+    (registered by retrieval_service.run_in_pool),
+  - the embedding batcher threads while a forward pass is running (they mark
+    it with `shared_work`, so time parked waiting for the next batch is not
+    sampled).
+Stacks are aggregated in collapsed format ("a;b;c count", the input of
+flamegraph.pl / speedscope). The stage spans of app/services/metrics.py
+(forward passes, Weaviate calls, fusion, ...) are stored alongside.
+
+Profiles are written as JSON to PROFILE_DIR, a ring buffer keeping the newest
+PROFILE_MAX_FILES files, and listed / downloaded via /api/profiles.
+"""
+import contextvars
+import hmac
+import json
+import logging
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Optional
+
+from dotenv import load_dotenv
+
+from app.services import metrics
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+PROFILE_ADMIN_TOKEN = os.getenv("PROFILE_ADMIN_TOKEN", "")   # empty -> profiling disabled
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+PROFILE_MAX_FILES = int(os.getenv("PROFILE_MAX_FILES", 50))
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", 5))
+PROFILE_MAX_DEPTH = 128
+
+PROFILED_ROUTES = ("/api/query-img", "/api/query-text")
+# Idents of threads currently doing work for queued requests (batcher forward passes)
+_busy_shared_threads = set()
+_busy_lock = threading.Lock()
+
+_current_profile: contextvars.ContextVar[Optional["SamplingProfiler"]] = contextvars.ContextVar(
+    "current_profile", default=None
+)
+
+
+def is_authorized(token: Optional[str]) -> bool:
+    return bool(PROFILE_ADMIN_TOKEN) and token is not None and hmac.compare_digest(token, PROFILE_ADMIN_TOKEN)
+
+
+def profile_requested(request) -> bool:
+    return (
+        request.headers.get("x-profile") == "1" or request.query_params.get("profile") == "1"
+    ) and request.url.path in PROFILED_ROUTES
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def _collapse(frame) -> str:
+    labels = []
+    while frame is not None and len(labels) < PROFILE_MAX_DEPTH:
+        labels.append(_frame_label(frame))
+        frame = frame.f_back
+    labels.reverse()
+    return ";".join(labels)
+
+
+class SamplingProfiler:
+    def __init__(self, interval_ms: float = PROFILE_INTERVAL_MS):
+        self.interval = interval_ms / 1000.0
+        self.stacks = Counter()
+        self.samples = 0
+        self._threads = {threading.get_ident()}  # the event loop thread that starts the profile
+        self._threads_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self.started = None
+        self.finished = None
+
+    def add_thread(self, ident):
+        with self._threads_lock:
+            self._threads.add(ident)
+
+    def remove_thread(self, ident):
+        with self._threads_lock:
+            self._threads.discard(ident)
+
+    def start(self):
+        self.started = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.finished = time.perf_counter()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frames = sys._current_frames()
+            names = {t.ident: t.name for t in threading.enumerate()}
+            with self._threads_lock:
+                idents = set(self._threads)
+            with _busy_lock:
+                idents.update(_busy_shared_threads)
+            for ident in idents:
+                frame = frames.get(ident)
+                if frame is not None:
+                    self.stacks[f"{names.get(ident, ident)};{_collapse(frame)}"] += 1
+            self.samples += 1
+
+    def collapsed(self) -> str:
+        return "\n".join(f"{stack} {count}" for stack, count in self.stacks.most_common())
+
+
+@contextmanager
+def shared_work():
+    """Mark the current thread as working for queued requests (e.g. a batcher forward pass)."""
+    ident = threading.get_ident()
+    with _busy_lock:
+        _busy_shared_threads.add(ident)
+    try:
+        yield
+    finally:
+        with _busy_lock:
+            _busy_shared_threads.discard(ident)
+
+
+@contextmanager
+def track_thread():
+    """Mark the current (pool) thread as working for the profiled request, if any."""
+    profile = _current_profile.get()
+    if profile is None:
+        yield
+        return
+    ident = threading.get_ident()
+    profile.add_thread(ident)
+    try:
+        yield
+    finally:
+        profile.remove_thread(ident)
+
+
+async def run_profiled(request, call_next):
+    """Run one request under the sampler, store the profile, and tag the response with its id."""
+    profile = SamplingProfiler()
+    started_at = datetime.now(timezone.utc)
+    profile_token = _current_profile.set(profile)
+    spans_token = metrics.start_spans()
+    profile.start()
+    try:
+        response = await call_next(request)
+    finally:
+        profile.stop()
+        spans = metrics.end_spans(spans_token)
+        _current_profile.reset(profile_token)
+
+    profile_id = f"{started_at:%Y%m%dT%H%M%S%f}-{uuid.uuid4().hex[:6]}"
+    record = {
+        "id": profile_id,
+        "route": request.url.path,
+        "query": str(request.query_params),
+        "status": response.status_code,
+        "started_at": started_at.isoformat(),
+        "duration_ms": (profile.finished - profile.started) * 1000,
+        "interval_ms": profile.interval * 1000,
+        "samples": profile.samples,
+        "spans": [
+            {
+                "stage": stage,
+                "start_ms": (start - profile.started) * 1000,
+                "end_ms": (end - profile.started) * 1000,
+                "thread": thread,
+            }
+            for stage, start, end, thread in spans
+        ],
+        "collapsed": profile.collapsed(),
+    }
+    try:
+        save_profile(record)
+        response.headers["X-Profile-Id"] = profile_id
+    except OSError as e:
+        logger.exception(f"Could not store profile {profile_id}: {e}")
+    return response
+
+
+def _profile_path(profile_id: str) -> str:
+    return os.path.join(PROFILE_DIR, f"{profile_id}.json")
+
+
+def save_profile(record: dict):
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    path = _profile_path(record["id"])
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(record, f, ensure_ascii=False)
+    os.replace(tmp, path)
+    # Ring buffer: ids start with a UTC timestamp, so name order is age order
+    files = sorted(name for name in os.listdir(PROFILE_DIR) if name.endswith(".json"))
+    for name in files[:-PROFILE_MAX_FILES] if PROFILE_MAX_FILES > 0 else []:
+        try:
+            os.remove(os.path.join(PROFILE_DIR, name))
+        except OSError:
+            pass
+    logger.info(f"Stored profile {record['id']} ({record['samples']} samples)")
+
+
+def list_profiles():
+    if not os.path.isdir(PROFILE_DIR):
+        return []
+    profiles = []
+    for name in sorted(os.listdir(PROFILE_DIR), reverse=True):
+        if name.endswith(".json"):
+            path = os.path.join(PROFILE_DIR, name)
+            profiles.append({"id": name[:-5], "bytes": os.path.getsize(path)})
+    return profiles
+
+
+def load_profile(profile_id: str) -> Optional[dict]:
+    # ids are generated here; refuse anything that could escape PROFILE_DIR
+    if not profile_id or os.path.basename(profile_id) != profile_id or profile_id.startswith("."):
+        return None
+    path = _profile_path(profile_id)
+    if not os.path.isfile(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
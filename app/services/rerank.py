@@ -0,0 +1,112 @@
+# app/services/rerank.py
+"""
+Second-stage re-ranking of fused candidates against their stored CLIP vectors.
+
+The candidates' image embeddings are read from the memory-mapped local vector
+store (LOCAL_INDEX_DIR/<image collection>, built with
+`python -m app.ai.vectordatabase.localsearch export image`), scored against
+one or more CLIP query vectors with a single matrix product, and blended with
+the fusion score. Both are min-max normalized over the candidate set first
+(raw CLIP cosines sit in a narrow band), so the weight really splits them:
+
+    total = RERANK_WEIGHT * minmax(similarity) + (1 - RERANK_WEIGHT) * minmax(fused)
+
+The store is opened once by warm-up (load_vector_store, off the event loop);
+until then re-ranking is skipped and the remote top_k is not reduced.
+
+Several query vectors (the query plus expansions / alternative phrasings) are
+combined per candidate with `mean` (query expansion) or `max` (multi-vector,
+any phrasing may match).
+"""
+import logging
+import os
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from dotenv import load_dotenv
+
+from app.ai.tools.image_retrieval import embed_text
+from app.ai.vectordatabase import localsearch
+from app.ai.vectordatabase.vectorsearch import get_image_collection_name
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+RERANK_WEIGHT = float(os.getenv("RERANK_WEIGHT", 0.7))
+# Remote top_k per modality when re-ranking: the local stage recovers precision
+RERANK_REMOTE_TOP_K = int(os.getenv("RERANK_REMOTE_TOP_K", 100))
+RERANK_AGGREGATES = ("mean", "max")
+
+
+_vector_store = None
+
+
+def load_vector_store() -> Optional[localsearch.LocalCollection]:
+    """Blocking: open the local collection holding the image vectors, or None if it was never exported."""
+    global _vector_store
+    if _vector_store is None:
+        name = get_image_collection_name()
+        if os.path.isdir(os.path.join(localsearch.LOCAL_INDEX_DIR, name)):
+            _vector_store = localsearch.get_collection(name)
+            logger.info(f"Re-rank vector store loaded: {name} ({len(_vector_store)} vectors)")
+    return _vector_store
+
+
+def get_vector_store() -> Optional[localsearch.LocalCollection]:
+    """The store opened by load_vector_store(), or None; never loads, so it is safe on the event loop."""
+    return _vector_store
+
+
+def _min_max(values):
+    if len(values) == 0:
+        return values
+    low, high = values.min(), values.max()
+    return np.ones_like(values) if high == low else (values - low) / (high - low)
+
+
+def rerank(
+    results: List[Dict[str, Any]],
+    query_texts: List[str],
+    weight: float = RERANK_WEIGHT,
+    aggregate: str = "mean",
+    top_k: Optional[int] = None,
+) -> List[Dict[str, Any]]:
+    """Re-score fused results against the CLIP vectors of `query_texts`; returns a new ranked list."""
+    if aggregate not in RERANK_AGGREGATES:
+        raise ValueError(f"Unknown rerank aggregate: {aggregate}")
+    query_texts = [q for q in query_texts if q]
+    if not results or not query_texts:
+        return results[:top_k] if top_k else results
+
+    store = get_vector_store()
+    if store is None:
+        logger.warning("Re-rank skipped: local vector store for the image collection not loaded")
+        return results[:top_k] if top_k else results
+
+    rows = np.array([store.frame_rows.get(r["frame_id"], -1) for r in results], dtype=np.int64)
+    found = rows >= 0
+
+    queries = np.vstack([np.asarray(embed_text(q), dtype=np.float32).reshape(-1) for q in query_texts])
+    queries /= np.maximum(np.linalg.norm(queries, axis=1, keepdims=True), 1e-12)
+
+    # (n_found, dim) @ (dim, n_queries): one gather from the mmap, one BLAS call
+    candidate_rows = rows[found]
+    vectors = np.asarray(store.vectors[candidate_rows], dtype=np.float32)
+    sims = (vectors @ queries.T) * store.inv_norms[candidate_rows][:, None]
+    similarity = np.zeros(len(results), dtype=np.float64)
+    similarity[found] = sims.max(axis=1) if aggregate == "max" else sims.mean(axis=1)
+    if not found.all():
+        # Frames missing from the store fall back to the weakest similarity seen
+        similarity[~found] = similarity[found].min() if found.any() else 0.0
+
+    fused = _min_max(np.array([r.get("total_score") or 0.0 for r in results], dtype=np.float64))
+    total = weight * _min_max(similarity) + (1 - weight) * fused
+
+    order = np.argsort(-total, kind="stable")
+    if top_k:
+        order = order[:top_k]
+    return [
+        {**results[i], "rerank_score": float(similarity[i]), "total_score": float(total[i])}
+        for i in order
+    ]
@@ -0,0 +1,131 @@
+# app/services/result_cache.py
+import logging
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+RESULT_CACHE_TTL_SECONDS = float(os.getenv("RESULT_CACHE_TTL_SECONDS", 600))
+RESULT_CACHE_MAX_BYTES = int(os.getenv("RESULT_CACHE_MAX_BYTES", 256 * 1024 * 1024))
+# Initial version; after re-indexing bump it with /api/query-cache/invalidate, which
+# reaches every worker through the shared version row (app/db/cache_version.py)
+COLLECTION_VERSION = os.getenv("COLLECTION_VERSION", "")
+# Fixed cost charged per cached result (dict, scores, frame id) on top of its property values
+RESULT_ITEM_OVERHEAD_BYTES = 256
+
+
+def _estimate_size(value: Any) -> int:
+    """Rough footprint of a result list: a fixed cost per item plus its top-level property lengths, no serializing."""
+    if not isinstance(value, list):
+        return RESULT_ITEM_OVERHEAD_BYTES
+    size = 0
+    for item in value:
+        size += RESULT_ITEM_OVERHEAD_BYTES
+        prop = item.get("property") if isinstance(item, dict) else None
+        if isinstance(prop, dict):
+            for v in prop.values():
+                size += len(v) if isinstance(v, (str, bytes, list, dict)) else 8
+    return size
+
+
+def _copy(value: Any) -> Any:
+    """New list of new result dicts; nested `property` dicts stay shared and must be treated as read-only."""
+    if isinstance(value, list):
+        return [dict(item) if isinstance(item, dict) else item for item in value]
+    return value
+
+
+class ResultCache:
+    """
+    TTL + byte-bounded LRU of fused search results.
+    Keys are prefixed with the collection version, so `invalidate` makes every
+    entry written against an older index unreachable.
+    `put` and `get` copy the result list and its dicts, so callers may re-rank
+    or annotate what they get back; `property` dicts are shared, do not mutate them.
+    Only touched from the event loop, so no locking is needed. The cache is per
+    process; app/db/cache_version.py keeps the workers' versions in step.
+    """
+
+    def __init__(self, ttl_seconds: float = RESULT_CACHE_TTL_SECONDS,
+                 max_bytes: int = RESULT_CACHE_MAX_BYTES, version: str = COLLECTION_VERSION):
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.version = version
+        self._entries = OrderedDict()  # key -> (expires_at, size, value)
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def _full_key(self, key: Hashable):
+        return (self.version, key)
+
+    def _drop(self, full_key):
+        _, size, _ = self._entries.pop(full_key)
+        self._bytes -= size
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        full_key = self._full_key(key)
+        entry = self._entries.get(full_key)
+        if entry is None:
+            self.misses += 1
+            return None
+        expires_at, _, value = entry
+        if expires_at < time.monotonic():
+            self._drop(full_key)
+            self.misses += 1
+            return None
+        self._entries.move_to_end(full_key)
+        self.hits += 1
+        return _copy(value)
+
+    def put(self, key: Hashable, value: Any):
+        size = _estimate_size(value)
+        if size > self.max_bytes:
+            return
+        full_key = self._full_key(key)
+        if full_key in self._entries:
+            self._drop(full_key)
+        self._entries[full_key] = (time.monotonic() + self.ttl_seconds, size, _copy(value))
+        self._bytes += size
+        while self._bytes > self.max_bytes and self._entries:
+            self._drop(next(iter(self._entries)))
+
+    def invalidate(self, version: Optional[str] = None):
+        """Drop every entry; optionally switch to a new collection version / ingestion timestamp."""
+        if version is not None:
+            self.version = version
+        self._entries.clear()
+        self._bytes = 0
+        self.invalidations += 1
+        logger.info(f"Result cache invalidated (collection version={self.version!r})")
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "ttl_seconds": self.ttl_seconds,
+            "version": self.version,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "invalidations": self.invalidations,
+        }
+
+
+_result_cache = None
+
+
+def get_result_cache() -> ResultCache:
+    global _result_cache
+    if _result_cache is None:
+        _result_cache = ResultCache()
+    return _result_cache
@@ -0,0 +1,107 @@
+# app/services/retrieval_service.py
+import asyncio
+import contextvars
+import logging
+import os
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+from dotenv import load_dotenv
+
+from app.models.query import QueryRequest
+from app.ai.tools.image_retrieval import image_retrieval
+from app.ai.tools.text_retrieval import text_retrieval
+from app.ai.vectordatabase.vectorsearch import resolve_return_properties
+from app.services.rerank import RERANK_REMOTE_TOP_K, get_vector_store
+from app.services import metrics, profiler
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Torch inference and the Weaviate round-trip are blocking calls, so they run in
+# a bounded thread pool instead of on the event loop.
+RETRIEVAL_MAX_WORKERS = int(os.getenv("RETRIEVAL_MAX_WORKERS", 8))
+RETRIEVAL_TOP_K = int(os.getenv("RETRIEVAL_TOP_K", 300))
+
+EMPTY_RESULT = {"property": [], "score": []}
+
+_executor = None
+
+
+def retrieval_top_k(query_data: QueryRequest) -> int:
+    """Per-modality remote top_k; smaller only when the local re-rank store is loaded (cached check)."""
+    if query_data.rerank and get_vector_store() is not None:
+        return RERANK_REMOTE_TOP_K
+    return RETRIEVAL_TOP_K
+
+
+def get_executor() -> ThreadPoolExecutor:
+    """Return the shared retrieval thread pool (created on first use)."""
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=RETRIEVAL_MAX_WORKERS,
+            thread_name_prefix="retrieval",
+        )
+        logger.info(f"Retrieval thread pool created with {RETRIEVAL_MAX_WORKERS} workers")
+    return _executor
+
+
+def shutdown_executor():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=True)
+        _executor = None
+        logger.info("Retrieval thread pool closed")
+
+
+async def run_in_pool(fn, *args, **kwargs):
+    """
+    Run a blocking function in the retrieval pool without blocking the event loop.
+    The caller's contextvars go along (request stage timings, an active profile),
+    and the time spent queued for a free worker is recorded as `pool_wait`.
+    """
+    loop = asyncio.get_running_loop()
+    context = contextvars.copy_context()
+    submitted = time.perf_counter()
+
+    def call():
+        metrics.record_stage("pool_wait", time.perf_counter() - submitted)
+        with profiler.track_thread():
+            return fn(*args, **kwargs)
+
+    return await loop.run_in_executor(get_executor(), context.run, call)
+
+
+async def run_image_retrieval(query_data: QueryRequest, query_type: str = "both"):
+    if query_type in ["image", "both"] and query_data.image_query:
+        return await run_in_pool(
+            image_retrieval,
+            image_query=query_data.image_query,
+            top_k=retrieval_top_k(query_data),
+            return_properties=resolve_return_properties(query_data.fields),
+            explain=query_data.explain,
+        )
+    return dict(EMPTY_RESULT)
+
+
+async def run_text_retrieval(query_data: QueryRequest, query_type: str = "both"):
+    if query_type in ["text", "both"] and query_data.text_query:
+        return await run_in_pool(
+            text_retrieval,
+            query_text=query_data.text_query,
+            top_k=retrieval_top_k(query_data),
+            return_properties=resolve_return_properties(query_data.fields),
+            explain=query_data.explain,
+        )
+    return dict(EMPTY_RESULT)
+
+
+async def retrieve(query_data: QueryRequest, query_type: str = "both"):
+    """Run image and text retrieval concurrently, return (image_result, text_result)."""
+    image_result, text_result = await asyncio.gather(
+        run_image_retrieval(query_data, query_type),
+        run_text_retrieval(query_data, query_type),
+    )
+    return image_result, text_result
@@ -0,0 +1,156 @@
+# app/services/temporal.py
+"""
+Temporal join of several sub-query rankings: "event A, then event B within N
+seconds, in the same video".
+
+Hits of every event are grouped per video_id and sorted by time once. The
+chain score is built event by event with a dynamic program whose inner max
+runs over a sliding window: a two-pointer sweep over the (sorted) previous
+event's hits plus a monotonic deque gives, for each hit of event j, the best
+chain ending at event j-1 within [t - max_gap, t - min_gap] in O(1) amortized.
+Total cost is O(sum of hits) per event pair instead of the pairwise product.
+"""
+from collections import deque
+from typing import Any, Dict, List
+
+import numpy as np
+
+from app.db.query_results import frame_position, parse_int, parse_timestamp_ms
+
+
+def hit_time_seconds(prop: Dict[str, Any]):
+    """Keyframe time in seconds: `timestamp` / `pts_time`, else frame_idx / fps; None if unknown."""
+    if not isinstance(prop, dict):
+        return None
+    if prop.get("timestamp") is not None or prop.get("pts_time") is not None:
+        return parse_timestamp_ms(prop) / 1000.0
+    frame_idx, fps = parse_int(prop.get("frame_idx")), prop.get("fps")
+    try:
+        fps = float(fps or 0)
+    except (TypeError, ValueError):
+        return None
+    if frame_idx is not None and fps > 0:
+        return frame_idx / fps
+    return None
+
+
+def _normalized_scores(results):
+    scores = np.array([r.get("total_score") or 0.0 for r in results], dtype=np.float64)
+    if len(scores) == 0:
+        return scores
+    low, high = scores.min(), scores.max()
+    return np.ones_like(scores) if high == low else (scores - low) / (high - low)
+
+
+def group_by_video(results: List[Dict[str, Any]]):
+    """{video_id: (times, scores, result indices)} with each video's hits sorted by time."""
+    scores = _normalized_scores(results)
+    videos, times, keep = [], [], []
+    for i, r in enumerate(results):
+        prop = r.get("property") or {}
+        t = hit_time_seconds(prop)
+        # Stored objects have no video_id property; it comes from the frame key
+        video_id, _ = frame_position(r.get("frame_id"), prop)
+        if t is None or not video_id:
+            continue
+        videos.append(video_id)
+        times.append(t)
+        keep.append(i)
+
+    grouped = {}
+    if not keep:
+        return grouped
+    keep = np.asarray(keep, dtype=np.int64)
+    times = np.asarray(times, dtype=np.float64)
+    codes, video_ids = {}, []
+    video_codes = np.empty(len(videos), dtype=np.int64)
+    for i, v in enumerate(videos):
+        code = codes.get(v)
+        if code is None:
+            code = codes[v] = len(video_ids)
+            video_ids.append(v)
+        video_codes[i] = code
+
+    order = np.lexsort((times, video_codes))
+    bounds = np.flatnonzero(np.diff(video_codes[order])) + 1
+    for chunk in np.split(order, bounds):
+        video_id = video_ids[video_codes[chunk[0]]]
+        grouped[video_id] = (times[chunk], scores[keep[chunk]], keep[chunk])
+    return grouped
+
+
+def _chain(events, max_gap, min_gap):
+    """
+    DP over one video's events. `events` is a list of (times, scores, idx),
+    times sorted. Returns (best score, backpointer) arrays per event.
+    """
+    best = [events[0][1].copy()]
+    back = [np.full(len(events[0][0]), -1, dtype=np.int64)]
+    for j in range(1, len(events)):
+        prev_times, prev_best = events[j - 1][0], best[j - 1]
+        times, scores = events[j][0], events[j][1]
+        cur_best = np.full(len(times), -np.inf)
+        cur_back = np.full(len(times), -1, dtype=np.int64)
+        window = deque()  # indices into prev, prev_best decreasing
+        hi = 0
+        for h, t in enumerate(times):
+            # admit previous hits that happened at least min_gap before t
+            while hi < len(prev_times) and prev_times[hi] <= t - min_gap:
+                while window and prev_best[window[-1]] <= prev_best[hi]:
+                    window.pop()
+                window.append(hi)
+                hi += 1
+            # drop those more than max_gap before t
+            while window and prev_times[window[0]] < t - max_gap:
+                window.popleft()
+            if window and np.isfinite(prev_best[window[0]]):
+                cur_best[h] = prev_best[window[0]] + scores[h]
+                cur_back[h] = window[0]
+        best.append(cur_best)
+        back.append(cur_back)
+    return best, back
+
+
+def temporal_join(
+    event_results: List[List[Dict[str, Any]]],
+    max_gap: float,
+    min_gap: float = 0.0,
+    top_k: int = 100,
+) -> List[Dict[str, Any]]:
+    """
+    Best event sequences across all videos. Each event's scores are min-max
+    normalized first, so a sequence score is the sum of per-event scores in [0, n_events].
+    """
+    if not event_results:
+        return []
+    grouped = [group_by_video(results) for results in event_results]
+    common_videos = set(grouped[0])
+    for g in grouped[1:]:
+        common_videos &= set(g)
+
+    candidates = []  # (score, video_id, end hit, best, back)
+    for video_id in common_videos:
+        events = [g[video_id] for g in grouped]
+        best, back = _chain(events, max_gap, min_gap)
+        final = best[-1]
+        for h in np.flatnonzero(np.isfinite(final)):
+            candidates.append((float(final[h]), video_id, int(h), events, back))
+
+    candidates.sort(key=lambda c: c[0], reverse=True)
+    sequences = []
+    for score, video_id, h, events, back in candidates[:top_k]:
+        hits = []
+        for j in range(len(events) - 1, -1, -1):
+            times, scores, idx = events[j]
+            r = event_results[j][idx[h]]
+            hits.append({
+                "event": j,
+                "frame_id": r.get("frame_id"),
+                "time_seconds": float(times[h]),
+                "score": float(scores[h]),
+                "property": r.get("property"),
+            })
+            h = int(back[j][h])
+        hits.reverse()
+        sequences.append({"video_id": video_id, "score": score, "hits": hits})
+    return sequences
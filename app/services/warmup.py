@@ -0,0 +1,91 @@
+# app/services/warmup.py
+import asyncio
+import logging
+import os
+import time
+
+from dotenv import load_dotenv
+
+from app.ai.model.clip_model import get_clip_model_cached
+from app.ai.model.gemma_model import get_gemma_model_cached
+from app.ai.model.onnx_backend import EMBEDDING_BACKEND, select_clip_text_encoder, select_gemma_text_encoder
+from app.ai.vectordatabase import vectorsearch
+from app.services import rerank
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Failed warm-ups are retried with exponential backoff; 0 attempts = keep retrying
+WARMUP_MAX_ATTEMPTS = int(os.getenv("WARMUP_MAX_ATTEMPTS", 0))
+WARMUP_RETRY_BASE_SECONDS = float(os.getenv("WARMUP_RETRY_BASE_SECONDS", 2))
+WARMUP_RETRY_MAX_SECONDS = float(os.getenv("WARMUP_RETRY_MAX_SECONDS", 60))
+
+_WARMUP_TEXTS = ["warm up", "khởi động mô hình"]
+
+_ready = False
+_warmup_error = None
+_warmup_seconds = None
+_warmup_attempts = 0
+
+
+def preload_weights():
+    """
+    Load torch weights without running inference (used by app/serve.py before
+    forking, so workers share the pages). CLIP is always loaded since the
+    query-by-image path needs its image tower even with the ONNX text backend.
+    """
+    get_clip_model_cached()
+    if EMBEDDING_BACKEND == "torch":
+        get_gemma_model_cached()
+
+
+def warm_up():
+    """Load the query encoders, run a dummy forward pass, open the re-rank store and the Weaviate clients (blocking)."""
+    # First call loads weights (torch) or exports/opens the ONNX session
+    select_clip_text_encoder()(_WARMUP_TEXTS)
+    select_gemma_text_encoder()(_WARMUP_TEXTS)
+    # Norms over the mmap, property rows and BM25 are built here, never on the event loop
+    rerank.load_vector_store()
+    clients = vectorsearch.init_clients()
+    failed = [name for name, ok in clients.items() if not ok]
+    if failed:
+        raise RuntimeError(f"Weaviate clients not connected: {', '.join(failed)}")
+
+
+async def run_warmup():
+    """Run warm-up off the event loop so /api/health keeps answering meanwhile; retry with backoff on failure."""
+    global _ready, _warmup_error, _warmup_seconds, _warmup_attempts
+    logger.info("🔥 Warming up models and Weaviate clients...")
+    start = time.perf_counter()
+    delay = WARMUP_RETRY_BASE_SECONDS
+    while True:
+        _warmup_attempts += 1
+        try:
+            await asyncio.to_thread(warm_up)
+            break
+        except Exception as e:
+            _warmup_error = str(e)
+            if WARMUP_MAX_ATTEMPTS and _warmup_attempts >= WARMUP_MAX_ATTEMPTS:
+                logger.exception(f"Warm-up failed after {_warmup_attempts} attempts: {e}")
+                return
+            logger.warning(f"⚠️ Warm-up attempt {_warmup_attempts} failed ({e}), retrying in {delay:.0f}s")
+        await asyncio.sleep(delay)
+        delay = min(delay * 2, WARMUP_RETRY_MAX_SECONDS)
+    _warmup_error = None
+    _warmup_seconds = time.perf_counter() - start
+    _ready = True
+    logger.info(f"✅ Warm-up finished in {_warmup_seconds:.1f}s ({_warmup_attempts} attempts)")
+
+
+def is_ready() -> bool:
+    return _ready
+
+
+def status():
+    return {
+        "ready": _ready,
+        "warmup_seconds": _warmup_seconds,
+        "attempts": _warmup_attempts,
+        "error": _warmup_error,
+    }
@@ -0,0 +1,90 @@
+# app/submit.py
+"""
+Submission run against a running server: send every query in one
+/api/query-batch request and write one `video_id,frame_idx` CSV per query.
+
+    python -m app.submit queries.txt --out submission/
+    python -m app.submit queries.jsonl --out submission/ --top-k 100 --url http://localhost:8000
+
+Input: a .txt file with one text query per line, or a .jsonl file with one
+QueryRequest object per line (text_query / image_query / fusion / ...).
+Output: <out>/<prefix><n>.csv with n = 1-based line number of the query.
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+
+def load_queries(path):
+    queries = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            if path.endswith(".jsonl"):
+                queries.append(json.loads(line))
+            else:
+                # Plain text: the same phrasing drives both the CLIP and the Gemma search
+                queries.append({"text_query": line, "image_query": line})
+    return queries
+
+
+def main():
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser()
+    parser.add_argument("queries", help=".txt (one query per line) or .jsonl (QueryRequest per line)")
+    parser.add_argument("--out", default="submission")
+    parser.add_argument("--prefix", default="query-", help="CSV file name prefix")
+    parser.add_argument("--url", default=os.getenv("API_URL", "http://localhost:8000"))
+    parser.add_argument("--top-k", type=int, default=100, help="rows per query")
+    parser.add_argument("--concurrency", type=int, default=None, help="default: server BATCH_QUERY_CONCURRENCY")
+    parser.add_argument("--session", help="log the queries to this session")
+    args = parser.parse_args()
+
+    queries = load_queries(args.queries)
+    os.makedirs(args.out, exist_ok=True)
+    body = {"queries": queries, "top_k": args.top_k, "concurrency": args.concurrency}
+    params = {"format": "ndjson"}
+    if args.session:
+        params["session"] = args.session
+
+    start = time.perf_counter()
+    written = 0
+    errors = []
+    with httpx.stream("POST", f"{args.url}/api/query-batch", json=body, params=params, timeout=None) as resp:
+        if resp.status_code != 200:
+            resp.read()
+            logger.error(f"Batch request failed ({resp.status_code}): {resp.text}")
+            return 1
+        for line in resp.iter_lines():
+            if not line:
+                continue
+            event = json.loads(line)
+            if event["event"] == "batch":
+                logger.info(f"{event['queries']} queries, embedded in {event['embed_ms']:.0f} ms {event['encoded']}")
+            elif event["event"] == "result":
+                path = os.path.join(args.out, f"{args.prefix}{event['index'] + 1}.csv")
+                with open(path, "w", encoding="utf-8", newline="") as f:
+                    f.writelines(f"{video_id},{frame_idx}\n" for video_id, frame_idx in event["rows"])
+                written += 1
+                logger.info(f"[{written}/{len(queries)}] {path} ({event['ms']:.0f} ms)")
+            elif event["event"] == "error":
+                errors.append(event["index"] + 1)
+                logger.error(f"Query {event['index'] + 1} failed: {event['detail']}")
+
+    logger.info(f"Wrote {written} files to {args.out} in {time.perf_counter() - start:.1f}s")
+    if errors:
+        logger.error(f"Failed queries (numbers as in the output files): {sorted(errors)}")
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,96 @@
+"""
+Compare query-encoding throughput: per-call forward passes vs the micro-batcher.
+
+    python -m benchmarks.bench_embedding_batcher --model clip --concurrency 16 --requests 256
+
+Both paths run `--concurrency` client threads that each encode queries until
+`--requests` encodes are done, and report QPS and p50/p95 latency.
+"""
+import argparse
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from app.ai.model.batcher import EmbeddingBatcher
+from app.ai.model.clip_model import embed_clip_texts, get_clip_model_cached
+from app.ai.model.gemma_model import embed_gemma_texts, get_gemma_model_cached
+
+QUERIES = [
+    "a man riding a motorbike in the rain",
+    "hai người phụ nữ đang nấu ăn trong bếp",
+    "news anchor in a blue suit",
+    "fireworks over the river at night",
+    "cầu thủ ghi bàn trên sân vận động",
+    "a red car parked next to a tree",
+    "children playing football on the beach",
+    "người đàn ông phát biểu tại hội nghị",
+]
+
+
+def _run(encode_one, concurrency, total):
+    latencies = []
+    lock = threading.Lock()
+    counter = iter(range(total))
+
+    def worker():
+        while True:
+            with lock:
+                i = next(counter, None)
+            if i is None:
+                return
+            start = time.perf_counter()
+            encode_one(QUERIES[i % len(QUERIES)] + f" #{i}")
+            elapsed = time.perf_counter() - start
+            with lock:
+                latencies.append(elapsed)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for _ in range(concurrency):
+            pool.submit(worker)
+    wall = time.perf_counter() - start
+    latencies.sort()
+    return {
+        "qps": total / wall,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p95_ms": latencies[int(0.95 * (len(latencies) - 1))] * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--model", choices=["clip", "gemma"], default="clip")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=256)
+    parser.add_argument("--max-batch", type=int, default=16)
+    parser.add_argument("--max-wait-ms", type=float, default=5)
+    args = parser.parse_args()
+
+    if args.model == "clip":
+        get_clip_model_cached()
+        encode_batch = embed_clip_texts
+    else:
+        get_gemma_model_cached()
+        encode_batch = embed_gemma_texts
+
+    # Warm-up so neither path pays first-call allocation costs
+    encode_batch(QUERIES)
+
+    per_call = _run(lambda text: encode_batch([text])[0], args.concurrency, args.requests)
+
+    batcher = EmbeddingBatcher(
+        f"bench-{args.model}", encode_batch,
+        max_batch_size=args.max_batch, max_wait_ms=args.max_wait_ms, enabled=True,
+    )
+    batched = _run(batcher.encode, args.concurrency, args.requests)
+    batcher.close()
+
+    print(f"model={args.model} concurrency={args.concurrency} requests={args.requests}")
+    for name, res in (("per-call", per_call), ("batched", batched)):
+        print(f"{name:>9}: {res['qps']:8.1f} QPS  p50={res['p50_ms']:7.1f} ms  p95={res['p95_ms']:7.1f} ms")
+    print(f"speedup: {batched['qps'] / per_call['qps']:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
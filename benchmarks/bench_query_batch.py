@@ -0,0 +1,90 @@
+"""
+Wall time of an evaluation run against a running server: N queries one by one
+through /api/query-text versus one /api/query-batch request.
+
+    python -m benchmarks.bench_query_batch --queries queries.txt --n 500
+    python -m benchmarks.bench_query_batch --n 100 --skip-sequential
+
+Queries are taken from --queries (one per line) or generated. Every query gets
+a unique suffix per mode so neither run is served from the result or
+embedding cache of the other.
+"""
+import argparse
+import json
+import time
+import uuid
+
+import httpx
+
+from app.submit import load_queries
+
+TEMPLATES = [
+    "a man riding a bicycle on the street",
+    "people dancing at a festival at night",
+    "a red car parked next to a tree",
+    "news anchor talking in a studio",
+    "children playing football on a field",
+]
+
+
+def make_queries(args, tag):
+    base = load_queries(args.queries) if args.queries else [
+        {"text_query": t, "image_query": t} for t in TEMPLATES
+    ]
+    queries = []
+    for i in range(args.n):
+        q = dict(base[i % len(base)])
+        for key in ("text_query", "image_query"):
+            if q.get(key):
+                q[key] = f"{q[key]} ({tag} {i})"
+        queries.append(q)
+    return queries
+
+
+def run_sequential(client, url, session, queries, top_k):
+    start = time.perf_counter()
+    for q in queries:
+        resp = client.post(f"{url}/api/query-text", params={"session": session, "format": "compact"},
+                           json={**q, "top_k": top_k})
+        resp.raise_for_status()
+    return time.perf_counter() - start
+
+
+def run_batch(client, url, queries, top_k, concurrency):
+    start = time.perf_counter()
+    results = failed = 0
+    body = {"queries": queries, "top_k": top_k, "concurrency": concurrency}
+    with client.stream("POST", f"{url}/api/query-batch", json=body) as resp:
+        resp.raise_for_status()
+        for line in resp.iter_lines():
+            if line:
+                event = json.loads(line)["event"]
+                results += event == "result"
+                failed += event == "error"
+    return time.perf_counter() - start, results, failed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--queries", help="query file (.txt / .jsonl), default: built-in templates")
+    parser.add_argument("--n", type=int, default=500)
+    parser.add_argument("--top-k", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=None)
+    parser.add_argument("--skip-sequential", action="store_true")
+    args = parser.parse_args()
+
+    tag = uuid.uuid4().hex[:6]
+    with httpx.Client(timeout=None) as client:
+        if not args.skip_sequential:
+            session = client.post(f"{args.url}/api/session").json()["session_id"]
+            seconds = run_sequential(client, args.url, session, make_queries(args, f"seq-{tag}"), args.top_k)
+            print(f"sequential /query-text: {args.n} queries in {seconds:.1f}s ({seconds / args.n * 1000:.0f} ms/query)")
+        seconds, results, failed = run_batch(client, args.url, make_queries(args, f"batch-{tag}"),
+                                             args.top_k, args.concurrency)
+        print(f"/query-batch:           {results} queries in {seconds:.1f}s "
+              f"({seconds / max(results, 1) * 1000:.0f} ms/query, {failed} failed)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Compare the current search response (list of dicts through jsonable_encoder +
+json) against the compact columnar format encoded with orjson.
+
+    python -m benchmarks.bench_response_format --results 300 --iterations 200
+    python -m benchmarks.bench_response_format --results 300 --with-text   # full properties (ASR/OCR text)
+
+Reports encoded bytes and mean / p95 encode time per response.
+"""
+import argparse
+import json
+import random
+import statistics
+import time
+import uuid
+
+from fastapi.encoders import jsonable_encoder
+
+from app.services.compact import CompactJSONResponse, compact_search_results
+
+WORDS = "người đàn ông phụ nữ xe máy trời mưa bản tin thời sự sân vận động a man riding news anchor".split()
+
+
+def make_results(n, with_text, n_videos=40, seed=0):
+    rng = random.Random(seed)
+    results = []
+    for i in range(n):
+        video_id = f"L{rng.randint(1, 30):02d}_V{rng.randint(1, n_videos):03d}"
+        frame_idx = rng.randint(1, 400)
+        prop = {
+            "frame_id": f"{video_id}_F{frame_idx:03}",
+            "video_id": video_id,
+            "frame_idx": frame_idx,
+            "n_keyframe": frame_idx,
+            "timestamp": f"00:{rng.randint(0, 59):02d}:{rng.randint(0, 59):02d}",
+            "fps": 25.0,
+            "image_url": f"https://storage.example.com/keyframes/{video_id}/{frame_idx:03}.jpg",
+            "video_url": f"https://storage.example.com/videos/{video_id}.mp4",
+        }
+        if with_text:
+            prop["text"] = " ".join(rng.choice(WORDS) for _ in range(120))
+            prop["explain_score"] = "(hybrid) Document " + str(uuid.uuid4()) + " contributed " * 6
+        image_score = rng.random()
+        text_score = rng.random()
+        results.append({
+            "frame_id": prop["frame_id"],
+            "property": prop,
+            "image_score": image_score,
+            "text_score": text_score,
+            "total_score": image_score + text_score,
+        })
+    return results
+
+
+def encode_full(payload):
+    # What FastAPI does for a plain dict return value
+    return json.dumps(jsonable_encoder(payload), ensure_ascii=False).encode("utf-8")
+
+
+def encode_compact(payload):
+    body = dict(payload, results=compact_search_results(payload["results"]))
+    return CompactJSONResponse(body).body
+
+
+def measure(fn, payload, iterations):
+    timings = []
+    body = b""
+    for _ in range(iterations):
+        start = time.perf_counter()
+        body = fn(payload)
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+    return {
+        "bytes": len(body),
+        "mean_ms": statistics.mean(timings) * 1000,
+        "p95_ms": timings[int(0.95 * (len(timings) - 1))] * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--results", type=int, default=300)
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--with-text", action="store_true", help="include long text/explain properties")
+    args = parser.parse_args()
+
+    payload = {
+        "query_id": uuid.uuid4(),
+        "session_id": uuid.uuid4(),
+        "results": make_results(args.results, args.with_text),
+    }
+    full = measure(encode_full, payload, args.iterations)
+    compact = measure(encode_compact, payload, args.iterations)
+
+    print(f"{'format':<10} {'bytes':>10} {'mean ms':>10} {'p95 ms':>10}")
+    for name, stats in (("full", full), ("compact", compact)):
+        print(f"{name:<10} {stats['bytes']:>10} {stats['mean_ms']:>10.3f} {stats['p95_ms']:>10.3f}")
+    print(
+        f"compact: {compact['bytes'] / full['bytes']:.1%} of the bytes, "
+        f"{full['mean_ms'] / compact['mean_ms']:.1f}x faster to encode"
+    )
+
+
+if __name__ == "__main__":
+    main()
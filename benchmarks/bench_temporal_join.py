@@ -0,0 +1,70 @@
+"""
+Time the temporal join on synthetic sub-query rankings and check it against a
+brute-force pairwise search.
+
+    python -m benchmarks.bench_temporal_join --events 3 --hits 1000 --videos 50 --max-gap 30
+"""
+import argparse
+import itertools
+import random
+import time
+
+from app.services.temporal import group_by_video, temporal_join
+
+
+def make_hits(n, n_videos, seed, duration=1200):
+    rng = random.Random(seed)
+    hits = []
+    for i in range(n):
+        video_id = f"L01_V{rng.randint(1, n_videos):03d}"
+        second = rng.randint(0, duration)
+        hits.append({
+            "frame_id": f"{video_id}_F{i:04}",
+            "property": {"video_id": video_id, "timestamp": f"00:{second // 60:02d}:{second % 60:02d}"},
+            "total_score": rng.random(),
+        })
+    return hits
+
+
+def brute_force_best(event_results, max_gap, min_gap):
+    grouped = [group_by_video(r) for r in event_results]
+    best = None
+    for video_id in set.intersection(*(set(g) for g in grouped)):
+        events = [g[video_id] for g in grouped]
+        for chain in itertools.product(*(range(len(e[0])) for e in events)):
+            times = [events[j][0][h] for j, h in enumerate(chain)]
+            if all(min_gap <= b - a <= max_gap for a, b in zip(times, times[1:])):
+                score = sum(events[j][1][h] for j, h in enumerate(chain))
+                best = score if best is None else max(best, score)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--events", type=int, default=3)
+    parser.add_argument("--hits", type=int, default=1000)
+    parser.add_argument("--videos", type=int, default=50)
+    parser.add_argument("--max-gap", type=float, default=30.0)
+    parser.add_argument("--min-gap", type=float, default=0.0)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--check", action="store_true", help="compare with brute force (slow for many hits)")
+    args = parser.parse_args()
+
+    event_results = [make_hits(args.hits, args.videos, seed) for seed in range(args.events)]
+    timings = []
+    for _ in range(args.repeat):
+        start = time.perf_counter()
+        sequences = temporal_join(event_results, args.max_gap, args.min_gap, top_k=100)
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    print(f"{args.events} events x {args.hits} hits: median {timings[len(timings) // 2]:.2f} ms, "
+          f"max {timings[-1]:.2f} ms, {len(sequences)} sequences")
+
+    if args.check:
+        expected = brute_force_best(event_results, args.max_gap, args.min_gap)
+        got = sequences[0]["score"] if sequences else None
+        print(f"best score: join={got} brute_force={expected}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+RSS / PSS / USS per worker process for the two serving modes.
+
+    python -m benchmarks.memory_report --workers 4            # runs both modes, one after the other
+    python -m benchmarks.memory_report --mode preload --workers 4
+    python -m benchmarks.memory_report --pid 12345            # report an already running server tree
+
+Modes:
+  uvicorn   `uvicorn app.main:app --workers N` (spawned workers, one weight copy each)
+  preload   `python -m app.serve` (weights loaded once, workers forked)
+
+The server is started on --port, the report is taken once /api/ready answers
+200 in every worker (polled --ready-probes times) and the models are loaded.
+PSS splits shared pages between the processes that map them, so the PSS total
+is the real footprint; RSS double-counts shared weights.
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+import psutil
+
+MB = 1024 * 1024
+
+
+def wait_ready(port, timeout, probes):
+    """Wait until /api/ready answers 200 `probes` times in a row (hits several workers)."""
+    deadline = time.time() + timeout
+    ok = 0
+    while time.time() < deadline:
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}/api/ready", timeout=2) as resp:
+                ok = ok + 1 if resp.status == 200 else 0
+        except (urllib.error.URLError, OSError):
+            ok = 0
+        if ok >= probes:
+            return True
+        time.sleep(0.5)
+    return False
+
+
+def process_tree(pid):
+    root = psutil.Process(pid)
+    return [root] + root.children(recursive=True)
+
+
+def report(pid, label):
+    rows = []
+    for proc in process_tree(pid):
+        try:
+            info = proc.memory_full_info()
+        except (psutil.NoSuchProcess, psutil.AccessDenied):
+            continue
+        role = "master" if proc.pid == pid else "worker"
+        rows.append((proc.pid, role, info.rss, getattr(info, "pss", 0), getattr(info, "uss", 0)))
+
+    print(f"\n== {label} ==")
+    print(f"{'pid':>8} {'role':<8} {'rss MB':>10} {'pss MB':>10} {'uss MB':>10}")
+    for pid_, role, rss, pss, uss in rows:
+        print(f"{pid_:>8} {role:<8} {rss / MB:>10.1f} {pss / MB:>10.1f} {uss / MB:>10.1f}")
+    totals = [sum(r[i] for r in rows) for i in (2, 3, 4)]
+    print(f"{'total':>8} {'':<8} {totals[0] / MB:>10.1f} {totals[1] / MB:>10.1f} {totals[2] / MB:>10.1f}")
+    return totals
+
+
+def launch(mode, workers, port):
+    env = dict(os.environ)
+    if mode == "uvicorn":
+        cmd = [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1",
+               "--port", str(port), "--workers", str(workers)]
+    else:
+        cmd = [sys.executable, "-m", "app.serve"]
+        env.update(SERVE_HOST="127.0.0.1", SERVE_PORT=str(port), SERVE_WORKERS=str(workers))
+    return subprocess.Popen(cmd, env=env)
+
+
+def run_mode(mode, workers, port, timeout):
+    proc = launch(mode, workers, port)
+    try:
+        if not wait_ready(port, timeout, probes=workers * 3):
+            print(f"{mode}: server not ready after {timeout}s")
+            return None
+        time.sleep(2)  # let post-warm-up allocations settle
+        return report(proc.pid, f"{mode} ({workers} workers)")
+    finally:
+        proc.terminate()
+        try:
+            proc.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--mode", choices=["uvicorn", "preload", "both"], default="both")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--timeout", type=float, default=600)
+    parser.add_argument("--pid", type=int, help="report an existing server process tree instead")
+    args = parser.parse_args()
+
+    if args.pid:
+        report(args.pid, f"pid {args.pid}")
+        return
+
+    modes = ["uvicorn", "preload"] if args.mode == "both" else [args.mode]
+    results = {mode: run_mode(mode, args.workers, args.port, args.timeout) for mode in modes}
+    if all(results.get(m) for m in ("uvicorn", "preload")):
+        old, new = results["uvicorn"][1], results["preload"][1]
+        print(f"\nPSS total: uvicorn {old / MB:.0f} MB -> preload {new / MB:.0f} MB ({new / old:.0%})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""
+Parity + latency/memory report of the ONNX Runtime encoders against the torch encoders.
+
+    python -m benchmarks.onnx_parity --model clip --quantize
+    python -m benchmarks.onnx_parity --model gemma
+
+Reports per-query cosine similarity between torch and ONNX embeddings, p50/p95
+latency at batch size 1 and --batch, and the RSS growth of loading each engine
+(each measured in a fresh spawned process, so the torch model loaded by the
+export, or by the other engine, does not hide in the numbers).
+Exits non-zero if the minimum cosine similarity is below --min-cosine.
+"""
+import argparse
+import gc
+import multiprocessing
+import statistics
+import sys
+import time
+
+import numpy as np
+import psutil
+
+from app.ai.model import onnx_backend
+from app.ai.model.clip_model import CLIP_MODEL_ID, embed_clip_texts, get_clip_model_cached
+from app.ai.model.gemma_model import GEMMA_MODEL_NAME, embed_gemma_texts, get_gemma_model_cached
+
+QUERIES = [
+    "a man riding a motorbike in the rain",
+    "hai người phụ nữ đang nấu ăn trong bếp",
+    "news anchor in a blue suit reading the evening news",
+    "fireworks over the river at night",
+    "cầu thủ ghi bàn trên sân vận động",
+    "a red car parked next to a tree",
+    "children playing football on the beach at sunset",
+    "người đàn ông phát biểu tại hội nghị",
+    "close-up of a cat sleeping on a sofa",
+    "xe cứu hỏa chạy trên đường phố đông người",
+    "an aerial view of rice fields",
+    "bản tin thời tiết với bản đồ Việt Nam",
+]
+
+
+def _rss_mb():
+    return psutil.Process().memory_info().rss / (1024 * 1024)
+
+
+def _load(load_fn):
+    gc.collect()
+    before = _rss_mb()
+    load_fn()
+    return _rss_mb() - before
+
+
+def _engines(model):
+    """(name, model id, torch loader, torch encoder, onnx encoder, export fn) for --model."""
+    if model == "clip":
+        return (
+            "clip-text", CLIP_MODEL_ID, get_clip_model_cached, embed_clip_texts,
+            onnx_backend.embed_clip_texts_onnx, onnx_backend.export_clip_text,
+        )
+    return (
+        "gemma", GEMMA_MODEL_NAME, get_gemma_model_cached, embed_gemma_texts,
+        onnx_backend.embed_gemma_texts_onnx, onnx_backend.export_gemma,
+    )
+
+
+def _measure_load(engine, model, quantize, results):
+    """Child process: RSS growth of loading one engine from scratch."""
+    name, model_id, torch_load, _, _, export_fn = _engines(model)
+    if engine == "torch":
+        results.put(_load(torch_load))
+    else:
+        results.put(_load(lambda: onnx_backend.get_session(name, model_id, export_fn, quantize)))
+
+
+def _load_in_subprocess(engine, model, quantize):
+    ctx = multiprocessing.get_context("spawn")
+    results = ctx.Queue()
+    proc = ctx.Process(target=_measure_load, args=(engine, model, quantize, results))
+    proc.start()
+    mem = results.get()
+    proc.join()
+    return mem
+
+
+def _latency(encode, texts, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        encode(texts)
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return statistics.median(samples), samples[int(0.95 * (len(samples) - 1))]
+
+
+def _cosine(a, b):
+    a = a / np.linalg.norm(a, axis=-1, keepdims=True)
+    b = b / np.linalg.norm(b, axis=-1, keepdims=True)
+    return (a * b).sum(axis=-1)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--model", choices=["clip", "gemma"], default="clip")
+    parser.add_argument("--quantize", action="store_true", help="compare the int8 ONNX model")
+    parser.add_argument("--batch", type=int, default=8)
+    parser.add_argument("--repeat", type=int, default=30)
+    parser.add_argument("--min-cosine", type=float, default=0.99)
+    args = parser.parse_args()
+
+    name, model_id, torch_load, torch_encode, onnx_encode, export_fn = _engines(args.model)
+
+    # Export before measuring: the export loads the torch model in this process
+    onnx_backend.ensure_model(name, model_id, export_fn, args.quantize)
+    torch_mem = _load_in_subprocess("torch", args.model, args.quantize)
+    onnx_mem = _load_in_subprocess("onnx", args.model, args.quantize)
+    torch_load()
+    onnx_backend.get_session(name, model_id, export_fn, args.quantize)
+
+    def run_onnx(texts):
+        return onnx_encode(texts, quantized=args.quantize)
+
+    torch_vectors = torch_encode(QUERIES)
+    onnx_vectors = run_onnx(QUERIES)
+    cosine = _cosine(torch_vectors, onnx_vectors)
+
+    batch = (QUERIES * (args.batch // len(QUERIES) + 1))[: args.batch]
+    engine = onnx_backend.backend_tag("onnx", args.quantize)
+    print(f"model={args.model} engine={engine}")
+    print(f"cosine vs torch: min={cosine.min():.5f} mean={cosine.mean():.5f}")
+    print(f"{'engine':>10} {'rss MB':>8} {'b1 p50':>8} {'b1 p95':>8} {'b' + str(args.batch) + ' p50':>8} {'b' + str(args.batch) + ' p95':>8}")
+    for label, encode, mem in (("torch", torch_encode, torch_mem), (engine, run_onnx, onnx_mem)):
+        encode(QUERIES[:1])  # warm-up
+        b1 = _latency(encode, QUERIES[:1], args.repeat)
+        bn = _latency(encode, batch, args.repeat)
+        print(f"{label:>10} {mem:8.0f} {b1[0]:8.1f} {b1[1]:8.1f} {bn[0]:8.1f} {bn[1]:8.1f}")
+
+    if cosine.min() < args.min_cosine:
+        print(f"FAIL: min cosine {cosine.min():.5f} < {args.min_cosine}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
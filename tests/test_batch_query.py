@@ -0,0 +1,17 @@
+import pytest
+
+batch_query = pytest.importorskip("app.services.batch_query")
+
+
+def result(frame_id, **prop):
+    return {"frame_id": frame_id, "property": prop, "total_score": 1.0}
+
+
+def test_submission_rows_use_frame_idx_property():
+    rows = batch_query.submission_rows([result("L01_V001_F043", frame_idx=1290)], top_k=10)
+    assert rows == [("L01_V001", 1290)]
+
+
+def test_submission_rows_reject_missing_frame_idx():
+    with pytest.raises(ValueError, match="frame_idx"):
+        batch_query.submission_rows([result("L01_V001_F043", n_keyframe=43)], top_k=10)
@@ -0,0 +1,40 @@
+import pytest
+
+pytest.importorskip("sqlalchemy")
+pytest.importorskip("asyncpg")
+
+from app.db import cache_version  # noqa: E402
+from app.services.result_cache import ResultCache  # noqa: E402
+
+
+def results():
+    return [{"frame_id": "L01_V001_F001", "property": {}, "total_score": 1.0}]
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    cache = ResultCache(version="v1")
+    monkeypatch.setattr(cache_version, "get_result_cache", lambda: cache)
+    monkeypatch.setattr(cache_version, "_generation", None)
+    return cache
+
+
+def test_first_sync_keeps_entries_when_version_matches(cache):
+    cache.put("q", results())
+    cache_version._apply(None, 3)
+    assert cache.get("q") is not None
+
+
+def test_generation_change_clears_other_workers(cache):
+    cache_version._apply(None, 3)
+    cache.put("q", results())
+    cache_version._apply(None, 4)
+    assert cache.get("q") is None
+    assert cache.version == "v1"
+
+
+def test_shared_version_is_adopted(cache):
+    cache.put("q", results())
+    cache_version._apply("v2", 0)
+    assert cache.get("q") is None
+    assert cache.version == "v2"
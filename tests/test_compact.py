@@ -0,0 +1,41 @@
+import pytest
+
+pytest.importorskip("fastapi")
+
+from app.services.compact import compact_search_results, split_columns  # noqa: E402
+
+
+def test_split_columns_fills_missing_values_and_moves_video_properties(monkeypatch):
+    monkeypatch.setattr("app.services.compact.VIDEO_PROPERTIES", ["fps"])
+    props = [{"a": 1, "fps": 25}, {"b": 2, "fps": 25}, "not a dict"]
+    columns, videos = split_columns(props, ["v1", "v1", "v2"])
+    assert columns == {"a": [1, None, None], "b": [None, 2, None]}
+    assert videos == {"v1": {"fps": 25}}
+
+
+def test_split_columns_skips_keys():
+    columns, _ = split_columns([{"frame_id": "f", "a": 1}], ["v"], skip=("frame_id",))
+    assert columns == {"a": [1]}
+
+
+def test_compact_search_results_derives_video_ids():
+    results = [
+        {"frame_id": "L01_V001_F003", "property": {"id": "L01_V001_F003", "frame_idx": 3}, "total_score": 1.0},
+        {"frame_id": "L01_V002_F004", "property": {"id": "L01_V002_F004", "frame_idx": 4}, "total_score": 0.5},
+    ]
+    out = compact_search_results(results)
+    assert out["count"] == 2
+    assert out["video_ids"] == ["L01_V001", "L01_V002"]
+    assert out["columns"] == {"frame_idx": [3, 4]}
+
+
+def test_compact_search_results_always_has_timestamps(monkeypatch):
+    monkeypatch.setattr("app.services.compact.VIDEO_PROPERTIES", ["fps"])
+    results = [
+        {"frame_id": "L01_V001_F001", "property": {"timestamp": "00:01:02.5"}},
+        {"frame_id": "L01_V001_F002", "property": {"frame_idx": 50, "fps": 25}},
+        {"frame_id": "L01_V001_F003", "property": {"frame_idx": 50}},
+    ]
+    out = compact_search_results(results)
+    assert out["timestamps"] == [62.5, 2.0, None]
+    assert "fps" not in out["columns"]
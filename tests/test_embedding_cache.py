@@ -0,0 +1,34 @@
+import sqlite3
+
+import numpy as np
+
+from app.ai.model.embedding_cache import EmbeddingCache
+
+
+def disk_rows(tmp_path):
+    with sqlite3.connect(tmp_path / "embeddings.sqlite") as db:
+        return db.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+
+def test_disk_tier_is_capped_oldest_first(tmp_path):
+    cache = EmbeddingCache(cache_dir=str(tmp_path), disk_max_rows=3, commit_every=1)
+    for i in range(5):
+        cache.put("m", f"query {i}", np.full(4, i))
+    cache.close()
+    assert disk_rows(tmp_path) == 3
+    reopened = EmbeddingCache(cache_dir=str(tmp_path))
+    assert reopened.get("m", "query 0") is None
+    assert reopened.get("m", "query 4")[0] == 4.0
+    reopened.close()
+
+
+def test_disk_writes_are_committed_in_batches(tmp_path):
+    cache = EmbeddingCache(cache_dir=str(tmp_path), commit_every=3)
+    cache.put("m", "a", np.ones(4))
+    cache.put("m", "b", np.ones(4))
+    assert disk_rows(tmp_path) == 0
+    cache.put("m", "c", np.ones(4))
+    assert disk_rows(tmp_path) == 3
+    cache.put("m", "d", np.ones(4))
+    cache.close()
+    assert disk_rows(tmp_path) == 4
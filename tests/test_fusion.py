@@ -0,0 +1,62 @@
+import pytest
+
+from app.services.fusion import extract_frame_id, fuse
+
+
+def packed(*rows):
+    """Retrieval result in the packed {"property": [...], "score": [...]} form."""
+    return {"property": [{"id": fid} for fid, _ in rows], "score": [score for _, score in rows]}
+
+
+def test_extract_frame_id_reads_the_frame_key():
+    assert extract_frame_id({"id": "L01_V001_F001"}) == "L01_V001_F001"
+    assert extract_frame_id({"frame_id": "a", "id": "b"}) == "a"
+    assert extract_frame_id(["L01_V001_F001", 3]) == "L01_V001_F001"
+    assert extract_frame_id({}) is None
+
+
+def test_sum_merges_frames_found_by_both_modalities():
+    image = packed(("f1", 0.9), ("f2", 0.5))
+    text = packed(("f2", 0.7), ("f3", 0.1))
+    fused = fuse(image, text)
+    assert [(r["frame_id"], round(r["total_score"], 6)) for r in fused] == [("f2", 1.2), ("f1", 0.9), ("f3", 0.1)]
+    assert fused[0]["image_score"] == 0.5 and fused[0]["text_score"] == 0.7
+
+
+def test_duplicate_frame_in_one_modality_keeps_best_score():
+    fused = fuse(packed(("f1", 0.2), ("f1", 0.8)), packed())
+    assert len(fused) == 1
+    assert fused[0]["total_score"] == pytest.approx(0.8)
+
+
+def test_weights_and_top_k():
+    fused = fuse(packed(("f1", 1.0)), packed(("f2", 1.0)), image_weight=2.0, top_k=1)
+    assert [r["frame_id"] for r in fused] == ["f1"]
+
+
+def test_minmax_puts_modalities_on_one_scale():
+    image = packed(("f1", 100.0), ("f2", 50.0))
+    text = packed(("f3", 0.02), ("f1", 0.01))
+    fused = fuse(image, text, method="minmax")
+    assert fused[0]["frame_id"] == "f1"
+    assert fused[0]["total_score"] == pytest.approx(1.0)
+
+
+def test_rrf_scores_by_rank():
+    fused = fuse(packed(("f1", 0.1), ("f2", 0.9)), packed(("f2", 0.3)), method="rrf")
+    assert fused[0]["frame_id"] == "f2"
+    assert fused[0]["total_score"] == pytest.approx(1 / 62 + 1 / 61)
+
+
+def test_zscore_missing_modality_gets_worst_score():
+    image = packed(("f1", 1.0), ("f2", 0.0))
+    text = packed(("f1", 1.0), ("f3", 0.0))
+    fused = {r["frame_id"]: r["total_score"] for r in fuse(image, text, method="zscore")}
+    assert fused["f1"] == pytest.approx(2.0)
+    assert fused["f2"] == pytest.approx(-2.0)
+
+
+def test_empty_inputs_and_unknown_method():
+    assert fuse({"property": [], "score": []}, {}) == []
+    with pytest.raises(ValueError):
+        fuse(packed(), packed(), method="max")
@@ -0,0 +1,13 @@
+import pytest
+
+onnx_backend = pytest.importorskip("app.ai.model.onnx_backend")
+
+
+def test_model_path_depends_on_model_id_and_quantization():
+    paths = {
+        onnx_backend._model_path("clip-text", model_id, quantized)
+        for model_id in ("openai/clip-vit-base-patch32", "openai/clip-vit-large-patch14")
+        for quantized in (False, True)
+    }
+    assert len(paths) == 4
+    assert onnx_backend._model_path("clip-text", "m", False) == onnx_backend._model_path("clip-text", "m", False)
@@ -0,0 +1,22 @@
+import pytest
+
+pytest.importorskip("pydantic")
+
+from pydantic import ValidationError  # noqa: E402
+
+from app.models.query import QueryRequest  # noqa: E402
+
+
+def test_top_k_bounds():
+    assert QueryRequest(text_query="x").top_k is None
+    assert QueryRequest(text_query="x", top_k=100).top_k == 100
+    for bad in (0, -1, 1001):
+        with pytest.raises(ValidationError):
+            QueryRequest(text_query="x", top_k=bad)
+
+
+def test_rerank_weight_bounds():
+    assert QueryRequest(text_query="x", rerank_weight=0.5).rerank_weight == 0.5
+    for bad in (-0.1, 1.5):
+        with pytest.raises(ValidationError):
+            QueryRequest(text_query="x", rerank_weight=bad)
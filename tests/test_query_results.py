@@ -0,0 +1,56 @@
+import json
+
+from app.db.query_results import build_rows, frame_position, keyframe_row, parse_int, parse_timestamp_ms
+
+
+def test_parse_int_accepts_numeric_strings_and_floats():
+    assert parse_int(12) == 12
+    assert parse_int("12") == 12
+    assert parse_int("12.5") == 12
+    assert parse_int(12.9) == 12
+
+
+def test_parse_int_rejects_non_numbers():
+    assert parse_int(None) is None
+    assert parse_int("abc") is None
+    assert parse_int(float("nan")) is None
+    assert parse_int(float("inf")) is None
+    assert parse_int(True) is None
+
+
+def test_frame_position_prefers_frame_idx():
+    assert frame_position("L30_V001_F043", {"frame_idx": 2200}) == ("L30_V001", 2200)
+    assert frame_position("L30_V001_F043", {"frame_idx": "2200.0"}) == ("L30_V001", 2200)
+
+
+def test_frame_position_falls_back_to_frame_id():
+    assert frame_position("L30_V001_F043", {"frame_idx": "n/a"}) == ("L30_V001", 43)
+    assert frame_position("L30_V001_F043", None) == ("L30_V001", 43)
+    assert frame_position(None, {}) == ("", 0)
+
+
+def test_parse_timestamp_ms():
+    assert parse_timestamp_ms({"timestamp": "00:01:28"}) == 88000
+    assert parse_timestamp_ms({"pts_time": 1.5}) == 1500
+    assert parse_timestamp_ms({"timestamp": "bad"}) == 0
+    assert parse_timestamp_ms({"timestamp": float("inf")}) == 0
+
+
+def test_build_rows_survives_bad_frame_idx():
+    results = [
+        {"frame_id": "L01_V001_F003", "property": {"frame_idx": "12.5"}, "total_score": 1.0},
+        {"frame_id": "L01_V001_F004", "property": {"frame_idx": "x"}, "total_score": 0.5},
+        {"frame_id": None, "property": {}, "total_score": 0.1},
+    ]
+    keyframes, query_results = build_rows("q", results)
+    assert [k[1:3] for k in keyframes] == [("L01_V001", 12), ("L01_V001", 4)]
+    assert [r[2] for r in query_results] == [1, 2]
+
+
+def test_keyframe_row_drops_per_query_properties_and_marks_completeness():
+    prop = {"id": "L01_V001_F003", "frame_idx": 3, "image_url": "u", "explain_score": "long explain text"}
+    row = keyframe_row("L01_V001_F003", prop)
+    assert json.loads(row[5]) == {"id": "L01_V001_F003", "frame_idx": 3, "image_url": "u"}
+    assert row[6] is True
+    keyframes, _ = build_rows("q", [{"frame_id": "L01_V001_F003", "property": {"frame_idx": 3}}], complete=False)
+    assert keyframes[0][6] is False
@@ -0,0 +1,42 @@
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+rerank = pytest.importorskip("app.services.rerank")
+
+
+@pytest.fixture
+def store(monkeypatch):
+    # Two candidates: f1 is the best fused hit, f2 the best visual match
+    vectors = np.array([[0.20, 0.98], [0.35, 0.94]], dtype=np.float32)
+    fake = SimpleNamespace(
+        frame_rows={"f1": 0, "f2": 1},
+        vectors=vectors,
+        inv_norms=(1.0 / np.linalg.norm(vectors, axis=1)).astype(np.float32),
+    )
+    monkeypatch.setattr(rerank, "_vector_store", fake)
+    monkeypatch.setattr(rerank, "embed_text", lambda text: np.array([1.0, 0.0], dtype=np.float32))
+    return fake
+
+
+def candidates():
+    return [{"frame_id": "f1", "total_score": 1.0}, {"frame_id": "f2", "total_score": 0.8}]
+
+
+def test_high_similarity_low_fused_candidate_is_promoted(store):
+    # Raw cosines are 0.2 vs 0.35: without normalizing similarity, fused would win at weight 0.7
+    ranked = rerank.rerank(candidates(), ["query"], weight=0.7)
+    assert [r["frame_id"] for r in ranked] == ["f2", "f1"]
+    assert ranked[0]["total_score"] == pytest.approx(0.7)
+    assert ranked[1]["total_score"] == pytest.approx(0.3)
+
+
+def test_weight_zero_keeps_fused_order(store):
+    ranked = rerank.rerank(candidates(), ["query"], weight=0.0)
+    assert [r["frame_id"] for r in ranked] == ["f1", "f2"]
+
+
+def test_skipped_without_loaded_store(monkeypatch):
+    monkeypatch.setattr(rerank, "_vector_store", None)
+    assert rerank.rerank(candidates(), ["query"], top_k=1) == candidates()[:1]
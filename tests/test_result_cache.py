@@ -0,0 +1,55 @@
+from app.services.result_cache import RESULT_ITEM_OVERHEAD_BYTES, ResultCache, _estimate_size
+
+
+def results(n, text="x"):
+    return [{"frame_id": f"L01_V001_F{i:03d}", "property": {"asr_text": text}, "total_score": 1.0} for i in range(n)]
+
+
+def test_get_returns_a_copy():
+    cache = ResultCache()
+    cache.put("q", results(2))
+    first = cache.get("q")
+    first[0]["total_score"] = 99.0
+    first.pop()
+    second = cache.get("q")
+    assert len(second) == 2
+    assert second[0]["total_score"] == 1.0
+
+
+def test_put_keeps_its_own_copy():
+    cache = ResultCache()
+    value = results(1)
+    cache.put("q", value)
+    value[0]["total_score"] = 5.0
+    assert cache.get("q")[0]["total_score"] == 1.0
+
+
+def test_estimate_size_counts_items_and_property_lengths():
+    assert _estimate_size(results(3, "abcd")) == 3 * (RESULT_ITEM_OVERHEAD_BYTES + 4)
+    assert _estimate_size([]) == 0
+
+
+def test_byte_bound_evicts_least_recently_used():
+    size = _estimate_size(results(1))
+    cache = ResultCache(max_bytes=2 * size)
+    cache.put("a", results(1))
+    cache.put("b", results(1))
+    cache.get("a")
+    cache.put("c", results(1))
+    assert cache.get("b") is None
+    assert cache.get("a") is not None and cache.get("c") is not None
+
+
+def test_expired_entries_miss():
+    cache = ResultCache(ttl_seconds=-1)
+    cache.put("q", results(1))
+    assert cache.get("q") is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_invalidate_switches_version():
+    cache = ResultCache(version="v1")
+    cache.put("q", results(1))
+    cache.invalidate("v2")
+    assert cache.get("q") is None
+    assert cache.stats()["version"] == "v2"
@@ -0,0 +1,45 @@
+from app.services.temporal import hit_time_seconds, temporal_join
+
+
+def hit(frame_id, seconds, score=1.0):
+    return {"frame_id": frame_id, "property": {"pts_time": seconds}, "total_score": score}
+
+
+def test_hit_time_seconds():
+    assert hit_time_seconds({"timestamp": "00:01:05"}) == 65.0
+    assert hit_time_seconds({"frame_idx": 250, "fps": 25}) == 10.0
+    assert hit_time_seconds({"frame_idx": "x", "fps": 25}) is None
+    assert hit_time_seconds({"frame_idx": 250, "fps": 0}) is None
+    assert hit_time_seconds(None) is None
+
+
+def test_joins_events_in_order_within_the_same_video():
+    first = [hit("L01_V001_F001", 10.0), hit("L01_V002_F001", 10.0, 0.5)]
+    second = [hit("L01_V001_F050", 20.0), hit("L01_V002_F050", 100.0)]
+    sequences = temporal_join([first, second], max_gap=30.0)
+    assert [s["video_id"] for s in sequences] == ["L01_V001"]
+    assert [h["frame_id"] for h in sequences[0]["hits"]] == ["L01_V001_F001", "L01_V001_F050"]
+    assert sequences[0]["score"] == 2.0
+
+
+def test_second_event_must_come_after_the_first():
+    first = [hit("L01_V001_F050", 20.0)]
+    second = [hit("L01_V001_F001", 10.0)]
+    assert temporal_join([first, second], max_gap=30.0) == []
+
+
+def test_min_gap_and_best_predecessor():
+    first = [hit("L01_V001_F001", 0.0, 1.0), hit("L01_V001_F010", 9.0, 0.0), hit("L01_V001_F005", 5.0, 0.5)]
+    second = [hit("L01_V001_F020", 10.0)]
+    sequences = temporal_join([first, second], max_gap=30.0, min_gap=2.0)
+    assert sequences[0]["hits"][0]["frame_id"] == "L01_V001_F001"
+    sequences = temporal_join([first, second], max_gap=6.0, min_gap=2.0)
+    assert sequences[0]["hits"][0]["frame_id"] == "L01_V001_F005"
+
+
+def test_top_k_and_hits_without_time():
+    first = [hit(f"L01_V00{i}_F001", 1.0, i) for i in range(1, 4)] + [{"frame_id": "L01_V009_F001", "property": {}}]
+    second = [hit(f"L01_V00{i}_F002", 2.0) for i in range(1, 4)] + [hit("L01_V009_F002", 2.0)]
+    sequences = temporal_join([first, second], max_gap=5.0, top_k=2)
+    assert [s["video_id"] for s in sequences] == ["L01_V003", "L01_V002"]
+    assert temporal_join([], max_gap=5.0) == []
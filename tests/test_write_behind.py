@@ -0,0 +1,125 @@
+import asyncio
+import uuid
+
+import pytest
+
+pytest.importorskip("sqlalchemy")
+pytest.importorskip("asyncpg")
+
+from app.db import database, write_behind  # noqa: E402
+from app.db.write_behind import WriteBehindLogger  # noqa: E402
+
+BAD_SESSION = uuid.uuid4()
+
+
+class FakeTransaction:
+    def __init__(self, conn):
+        self.conn = conn
+
+    async def __aenter__(self):
+        self.conn.pending = []
+
+    async def __aexit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.conn.committed.extend(self.conn.pending)
+        self.conn.pending = []
+        return False
+
+
+class FakeConnection:
+    """Records rows per committed transaction; rows for BAD_SESSION fail like a foreign-key error."""
+
+    def __init__(self):
+        self.committed = []
+        self.pending = []
+        self.transactions = 0
+
+    def transaction(self):
+        self.transactions += 1
+        return FakeTransaction(self)
+
+    async def executemany(self, sql, rows):
+        for row in rows:
+            if BAD_SESSION in row:
+                raise ValueError("foreign key violation")
+            self.pending.append(row)
+
+    async def copy_records_to_table(self, table, records, columns):
+        self.pending.extend(records)
+
+    async def fetchval(self, sql, session):
+        return None if session == BAD_SESSION else 1
+
+
+class FakePool:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def acquire(self):
+        pool = self
+
+        class Acquire:
+            async def __aenter__(self):
+                return pool.conn
+
+            async def __aexit__(self, *exc):
+                return False
+
+        return Acquire()
+
+
+@pytest.fixture
+def conn(monkeypatch):
+    conn = FakeConnection()
+    monkeypatch.setattr(database, "get_async_pool", lambda: FakePool(conn))
+    return conn
+
+
+def query_record(session):
+    return "query", (uuid.uuid4(), session, "text", None, None)
+
+
+def test_flush_writes_batch_in_one_transaction(conn):
+    writer = WriteBehindLogger()
+    asyncio.run(writer._flush([query_record(uuid.uuid4()), query_record(uuid.uuid4())]))
+    assert conn.transactions == 1
+    assert len(conn.committed) == 2
+    assert writer.stats()["flushed_records"] == 2
+
+
+def test_flush_falls_back_per_record_on_batch_failure(conn):
+    writer = WriteBehindLogger()
+    batch = [query_record(uuid.uuid4()), query_record(BAD_SESSION), query_record(uuid.uuid4())]
+    asyncio.run(writer._flush(batch))
+    assert len(conn.committed) == 2
+    stats = writer.stats()
+    assert stats["failed_flushes"] == 1
+    assert stats["failed_records"] == 1
+    assert stats["flushed_records"] == 2
+
+
+def test_flush_skips_malformed_results_record(conn):
+    writer = WriteBehindLogger()
+    query_id = uuid.uuid4()
+    good = [{"frame_id": "L01_V001_F003", "property": {}, "total_score": 1.0}]
+    batch = [("results", (query_id, good, True)), ("results", "not a tuple"), ("results", (query_id, [None], True))]
+    asyncio.run(writer._flush(batch))
+    assert writer.stats()["skipped_records"] == 2
+    assert [row[2] for row in conn.committed if len(row) == 4] == [1]
+
+
+def test_session_exists_is_cached(conn, monkeypatch):
+    writer = WriteBehindLogger()
+    session = uuid.uuid4()
+    assert asyncio.run(writer.session_exists(session))
+    assert not asyncio.run(writer.session_exists(BAD_SESSION))
+    monkeypatch.setattr(database, "get_async_pool", lambda: pytest.fail("known session hit the database"))
+    assert asyncio.run(writer.session_exists(session))
+
+
+def test_known_sessions_are_bounded(conn, monkeypatch):
+    monkeypatch.setattr(write_behind, "KNOWN_SESSIONS_MAX", 2)
+    writer = WriteBehindLogger()
+    for _ in range(5):
+        asyncio.run(writer.session_exists(uuid.uuid4()))
+    assert len(writer._known_sessions) <= 2